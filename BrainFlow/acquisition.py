@@ -0,0 +1,115 @@
+"""
+Adaptive acquisition scheduler for one BrainFlow board.
+
+Instead of calling get_board_data in a tight 1 ms loop, the scheduler asks
+how many samples are buffered per preset (get_board_data_count), only pulls
+a preset once it holds about chunk_sec worth of samples at its nominal rate,
+and sleeps until the next chunk is due. Per-device CPU, chunk-size and
+latency counters are kept in AcquisitionStats.
+"""
+import time
+
+from brainflow.board_shim import BoardShim
+
+
+class AcquisitionStats:
+    """Counters for one device: chunks, samples, latency and CPU time."""
+
+    def __init__(self, names):
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.thread_time()
+        self.chunks = {n: 0 for n in names}
+        self.samples = {n: 0 for n in names}
+        self.max_chunk = {n: 0 for n in names}
+        self.latency_sum = {n: 0.0 for n in names}
+        self.latency_max = {n: 0.0 for n in names}
+        self.polls = 0
+
+    def record(self, name, n_samples, latency):
+        self.chunks[name] += 1
+        self.samples[name] += n_samples
+        self.max_chunk[name] = max(self.max_chunk[name], n_samples)
+        self.latency_sum[name] += latency
+        self.latency_max[name] = max(self.latency_max[name], latency)
+
+    def report(self):
+        """Snapshot as a plain dict (CPU counts the calling thread only)."""
+        wall = time.perf_counter() - self.started_wall
+        cpu = time.thread_time() - self.started_cpu
+        presets = {}
+        for n, chunks in self.chunks.items():
+            presets[n] = {
+                "chunks": chunks,
+                "samples": self.samples[n],
+                "mean_chunk": self.samples[n] / chunks if chunks else 0.0,
+                "max_chunk": self.max_chunk[n],
+                "mean_latency_ms": 1000 * self.latency_sum[n] / chunks if chunks else 0.0,
+                "max_latency_ms": 1000 * self.latency_max[n],
+            }
+        return {
+            "wall_sec": wall,
+            "cpu_sec": cpu,
+            "cpu_percent": 100 * cpu / wall if wall > 0 else 0.0,
+            "polls": self.polls,
+            "presets": presets,
+        }
+
+
+class AcquisitionScheduler:
+    """
+    Pull chunks of roughly chunk_sec from several presets of one board.
+
+    presets maps a short name ("aux", "anc") to a BrainFlowPresets value.
+    A preset is flushed early if its oldest buffered sample has waited
+    max_wait_sec, so slow or bursty presets still arrive promptly.
+    """
+
+    def __init__(self, board, presets, chunk_sec=0.1, max_wait_sec=None, min_sleep_sec=0.002):
+        board_id = board.get_board_id()
+        self.board = board
+        self.presets = dict(presets)
+        self.rates = {n: BoardShim.get_sampling_rate(board_id, p) for n, p in self.presets.items()}
+        self.ts_rows = {n: BoardShim.get_timestamp_channel(board_id, p) for n, p in self.presets.items()}
+        self.chunk_sec = chunk_sec
+        self.max_wait_sec = 2 * chunk_sec if max_wait_sec is None else max_wait_sec
+        self.min_sleep_sec = min_sleep_sec
+        self.pending_since = {n: None for n in self.presets}
+        self.next_due = 0.0
+        self.stats = AcquisitionStats(self.presets)
+
+    def poll(self):
+        """Return {name: data} for every preset that has a chunk ready."""
+        now = time.perf_counter()
+        self.stats.polls += 1
+        ready = {}
+        due_in = self.chunk_sec
+
+        for name, preset in self.presets.items():
+            count = self.board.get_board_data_count(preset)
+            if count == 0:
+                self.pending_since[name] = None
+                continue
+            if self.pending_since[name] is None:
+                self.pending_since[name] = now
+            target = max(1, int(self.rates[name] * self.chunk_sec))
+            waited = now - self.pending_since[name]
+
+            if count >= target or waited >= self.max_wait_sec:
+                data = self.board.get_board_data(count, preset)
+                self.pending_since[name] = None
+                latency = max(0.0, time.time() - data[self.ts_rows[name], -1])
+                self.stats.record(name, data.shape[1], latency)
+                ready[name] = data
+            else:
+                due_in = min(due_in,
+                             (target - count) / self.rates[name],
+                             self.max_wait_sec - waited)
+
+        self.next_due = now + max(due_in, self.min_sleep_sec)
+        return ready
+
+    def wait(self):
+        """Sleep until the next chunk is expected (never longer than chunk_sec)."""
+        delay = self.next_due - time.perf_counter()
+        if delay > 0:
+            time.sleep(min(delay, self.chunk_sec))
@@ -1,79 +1,289 @@
-from pylsl import StreamInfo, StreamOutlet
+from pylsl import StreamInfo, StreamOutlet, local_clock
 from brainflow.board_shim import (
     BoardShim,
     BrainFlowInputParams,
     BoardIds,
     BrainFlowPresets,
 )
+import argparse
+import importlib.util
+import multiprocessing
+import sys
 import time
 import threading
+from pathlib import Path
 
-# global stop flag shared by all threads
-stop_flag = False
+import numpy as np
 
+from acquisition import AcquisitionScheduler
+from online_dsp import DeviceDSP
 
-def stream_emotibit(serial, name_suffix):
-    """Create and stream LSL data from one EmotiBit."""
-    global stop_flag
+# stage spans (off unless EMOTIBIT_TRACE is set) come from the repository's
+# emotibit/trace.py; it needs only the standard library, so it is loaded by
+# path and sys.path is left alone
+_trace = sys.modules.get("emotibit.trace")
+if _trace is None:
+    _spec = importlib.util.spec_from_file_location(
+        "emotibit_trace", Path(__file__).resolve().parent.parent / "emotibit" / "trace.py")
+    _trace = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_trace)
+span = _trace.span
 
-    # initialize board
-    params = BrainFlowInputParams()
-    params.serial_number = serial
-    board = BoardShim(BoardIds.EMOTIBIT_BOARD, params)
+# stop event shared by all device threads (process mode uses its own)
+stop_event = threading.Event()
 
-    try:
-        board.prepare_session()
-        board.start_stream()
-        print(f"{serial} streaming started...")
+# latest AcquisitionStats.report() per serial
+device_stats = {}
 
-        # create LSL outlets
-        ppg_info = StreamInfo(
-            f"PPG_{name_suffix}", "PPG", 3, 100, "float32", f"ppg_{serial}"
-        )
-        eda_info = StreamInfo(
-            f"EDA_{name_suffix}", "EDA", 1, 15, "float32", f"eda_{serial}"
-        )
-        temp_info = StreamInfo(
-            f"TEMP_{name_suffix}", "TEMP", 1, 15, "float32", f"temp_{serial}"
-        )
 
-        ppg_outlet = StreamOutlet(ppg_info)
-        eda_outlet = StreamOutlet(eda_info)
-        temp_outlet = StreamOutlet(temp_info)
+# BrainFlow presets streamed by every device
+PRESETS = {
+    "aux": BrainFlowPresets.AUXILIARY_PRESET,   # PPG
+    "anc": BrainFlowPresets.ANCILLARY_PRESET,   # EDA, temperature
+}
+
+# a chunk counts as evenly spaced if no interval is off by a quarter period
+JITTER_TOLERANCE = 0.25
+
+
+def preset_rates(board_id=BoardIds.EMOTIBIT_BOARD):
+    """Nominal sampling rate of each preset, as reported by BrainFlow."""
+    return {name: BoardShim.get_sampling_rate(board_id, preset) for name, preset in PRESETS.items()}
+
+
+def push_block(outlet, block, timestamps, fs):
+    """Push a (channels, samples) block as one contiguous float32 chunk.
+
+    timestamps holds the LSL (local_clock) capture time of every sample. When
+    they are evenly spaced at fs (the outlet's nominal rate) only the last one
+    is passed and LSL back-dates the others, so no per-sample list is built.
+    Chunks with jitter or dropped packets pay for that list, so the gaps show
+    up in the stream instead of being smoothed over by the nominal rate.
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    regular = ts.size < 2 or np.abs(np.diff(ts) * fs - 1).max() <= JITTER_TOLERANCE
+    outlet.push_chunk(np.ascontiguousarray(block.T, dtype=np.float32),
+                      timestamp=float(ts[-1]) if regular else ts.tolist())
+
+
+def create_outlets(serial, name_suffix, online, rates):
+    """LSL outlets of one device; the *_FILT/METRICS ones only when online.
+
+    rates maps the preset names to their nominal rates (see preset_rates).
+    """
+    ppg_fs, anc_fs = rates["aux"], rates["anc"]
+    outlets = {
+        "ppg": StreamOutlet(StreamInfo(
+            f"PPG_{name_suffix}", "PPG", 3, ppg_fs, "float32", f"ppg_{serial}"
+        )),
+        "eda": StreamOutlet(StreamInfo(
+            f"EDA_{name_suffix}", "EDA", 1, anc_fs, "float32", f"eda_{serial}"
+        )),
+        "temp": StreamOutlet(StreamInfo(
+            f"TEMP_{name_suffix}", "TEMP", 1, anc_fs, "float32", f"temp_{serial}"
+        )),
+    }
+    if online:
+        outlets["ppg_filt"] = StreamOutlet(StreamInfo(
+            f"PPG_FILT_{name_suffix}", "PPG", 3, ppg_fs, "float32", f"ppg_filt_{serial}"
+        ))
+        outlets["eda_filt"] = StreamOutlet(StreamInfo(
+            f"EDA_FILT_{name_suffix}", "EDA", 1, anc_fs, "float32", f"eda_filt_{serial}"
+        ))
+        outlets["temp_filt"] = StreamOutlet(StreamInfo(
+            f"TEMP_FILT_{name_suffix}", "TEMP", 1, anc_fs, "float32", f"temp_filt_{serial}"
+        ))
+        outlets["metrics"] = StreamOutlet(StreamInfo(
+            f"METRICS_{name_suffix}", "Metrics", len(DeviceDSP.METRICS), 0,
+            "float32", f"metrics_{serial}"
+        ))
+    return outlets
+
+
+def stream_loop(serial, scheduler, outlets, dsp, stop, heartbeat, stats_every, stall_sec):
+    """Pull chunks from one prepared board and push them until stop is set.
+
+    Raises RuntimeError if the board delivers nothing for stall_sec.
+    """
+    last_report = last_data = time.perf_counter()
+    aux_fs, anc_fs = scheduler.rates["aux"], scheduler.rates["anc"]
+
+    while not stop.is_set():
+        with span("stream.poll", serial=serial) as s:
+            chunks = scheduler.poll()
+            s.note(rows=sum(c.shape[1] for c in chunks.values()))
+        aux_data = chunks.get("aux")
+        anc_data = chunks.get("anc")
+        # BrainFlow stamps samples in Unix time; LSL expects local_clock()
+        clock_offset = local_clock() - time.time()
+        if heartbeat is not None:
+            heartbeat.value = time.time()
+
+        # push PPGs
+        if aux_data is not None:
+            aux_ts = aux_data[scheduler.ts_rows["aux"]] + clock_offset
+            with span("stream.push", serial=serial, preset="aux", rows=aux_data.shape[1]):
+                push_block(outlets["ppg"], aux_data[1:4, :], aux_ts, aux_fs)
+            if dsp is not None:
+                with span("stream.dsp", serial=serial, preset="aux", rows=aux_data.shape[1]):
+                    ppg_filt, metrics = dsp.process_ppg(aux_data[1:4, :])
+                push_block(outlets["ppg_filt"], ppg_filt, aux_ts, aux_fs)
+                outlets["metrics"].push_sample([float(m) for m in metrics], float(aux_ts[-1]))
+
+        # push EDA + Temp
+        if anc_data is not None:
+            anc_ts = anc_data[scheduler.ts_rows["anc"]] + clock_offset
+            with span("stream.push", serial=serial, preset="anc", rows=anc_data.shape[1]):
+                push_block(outlets["eda"], anc_data[1:2, :], anc_ts, anc_fs)
+                push_block(outlets["temp"], anc_data[2:3, :], anc_ts, anc_fs)
+            if dsp is not None:
+                with span("stream.dsp", serial=serial, preset="anc", rows=anc_data.shape[1]):
+                    eda_filt = dsp.process_eda(anc_data[1:2, :])
+                    temp_filt = dsp.process_temp(anc_data[2:3, :])
+                push_block(outlets["eda_filt"], eda_filt, anc_ts, anc_fs)
+                push_block(outlets["temp_filt"], temp_filt, anc_ts, anc_fs)
+
+        now = time.perf_counter()
+        if chunks:
+            last_data = now
+        elif now - last_data > stall_sec:
+            raise RuntimeError(f"no data for {stall_sec:.0f} s")
 
-        print(f"{serial} → LSL outlets ready ({name_suffix})")
+        if stats_every and now - last_report >= stats_every:
+            print(format_stats(serial, scheduler.stats.report()))
+            last_report = now
 
-        # main streaming loop
-        while not stop_flag:
-            aux_data = board.get_board_data(preset=BrainFlowPresets.AUXILIARY_PRESET)
-            anc_data = board.get_board_data(preset=BrainFlowPresets.ANCILLARY_PRESET)
-            
-            # push PPGs
-            if aux_data.shape[1] > 0:
-                ppg_outlet.push_chunk(aux_data[1:4, :].T.tolist())
+        scheduler.wait()
 
 
-            # push EDA + Temp
-            if anc_data.shape[1] > 0:
-                eda_outlet.push_chunk(anc_data[1:2, :].T.tolist())
-                temp_outlet.push_chunk(anc_data[2:3, :].T.tolist())
+def stream_emotibit(serial, name_suffix, online=False, chunk_sec=0.1, stats_every=0,
+                    stop=None, heartbeat=None, reconnect=True, retry_sec=2, stall_sec=5):
+    """Create and stream LSL data from one EmotiBit.
 
-            time.sleep(0.001)
+    With online=True the chunks also go through a causal DSP stage
+    (see online_dsp.DeviceDSP) published on extra *_FILT and METRICS outlets.
+    Chunks of about chunk_sec are pulled by an AcquisitionScheduler; its
+    counters are printed every stats_every seconds (0 = only at the end).
 
-    except Exception as e:
-        print(f"Error with {serial}: {e}")
+    stop is a threading or multiprocessing Event (stop_event by default) and
+    heartbeat an optional shared double updated with time.time() every poll.
+    With reconnect=True a failed prepare_session or a stalled stream releases
+    the board and retries every retry_sec, keeping the same LSL outlets.
+    """
+    stop = stop_event if stop is None else stop
+    rates = preset_rates()
+    outlets = create_outlets(serial, name_suffix, online, rates)
+    dsp = DeviceDSP(ppg_fs=rates["aux"], anc_fs=rates["anc"]) if online else None
+    print(f"{serial} → LSL outlets ready ({name_suffix})")
+
+    while not stop.is_set():
+        # initialize board
+        params = BrainFlowInputParams()
+        params.serial_number = serial
+        board = BoardShim(BoardIds.EMOTIBIT_BOARD, params)
+        scheduler = None
 
-    finally:
-        print(f"Stopping {serial}...")
         try:
-            board.stop_stream()
-            board.release_session()
-        except Exception:
-            pass
-        print(f"{serial} safely disconnected.")
+            with span("stream.connect", serial=serial):
+                board.prepare_session()
+                board.start_stream()
+            print(f"{serial} streaming started...")
+
+            scheduler = AcquisitionScheduler(board, PRESETS, chunk_sec=chunk_sec)
+            stream_loop(serial, scheduler, outlets, dsp, stop, heartbeat, stats_every, stall_sec)
+
+        except Exception as e:
+            print(f"Error with {serial}: {e}")
+
+        finally:
+            print(f"Stopping {serial}...")
+            if scheduler is not None:
+                device_stats[serial] = scheduler.stats.report()
+                print(format_stats(serial, device_stats[serial]))
+            try:
+                board.stop_stream()
+            except Exception:
+                pass
+            try:
+                board.release_session()
+            except Exception:
+                pass
+            print(f"{serial} safely disconnected.")
+
+        if not reconnect or stop.is_set():
+            break
+        print(f"{serial}: reconnecting in {retry_sec:g} s...")
+        stop.wait(retry_sec)
+
+
+def format_stats(serial, report):
+    """One-line summary of an AcquisitionStats.report()."""
+    parts = [f"{serial}: cpu={report['cpu_percent']:.1f}%"]
+    for name, p in report["presets"].items():
+        parts.append(
+            f"{name} chunks={p['chunks']} mean={p['mean_chunk']:.1f} max={p['max_chunk']} "
+            f"latency={p['mean_latency_ms']:.1f}/{p['max_latency_ms']:.1f} ms"
+        )
+    return " | ".join(parts)
+
+
+def start_worker(ctx, serial, name, kwargs):
+    """Start stream_emotibit for one serial in a thread (ctx None) or a process."""
+    if ctx is None:
+        worker = threading.Thread(target=stream_emotibit, args=(serial, name), kwargs=kwargs)
+    else:
+        worker = ctx.Process(target=stream_emotibit, args=(serial, name), kwargs=kwargs,
+                             name=f"emotibit-{serial}")
+    worker.start()
+    return worker
+
+
+def watch_devices(ctx, workers, heartbeats, stop, launch, stale_sec=5, reconnect=True):
+    """Report devices whose heartbeat went stale and handle workers that ended.
+
+    With reconnect a process that crashed (nonzero exit code) is restarted;
+    any other worker that ended is reported and dropped from workers.
+    """
+    stale = set()
+    while not stop.wait(1):
+        now = time.time()
+        for serial, worker in list(workers.items()):
+            if not worker.is_alive() and not stop.is_set():
+                # threads have no exit code; stream_emotibit returning is a clean exit
+                code = getattr(worker, "exitcode", 0)
+                if ctx is not None and reconnect and code != 0:
+                    print(f"⚠️ {serial}: process exited ({code}), restarting...")
+                    workers[serial] = launch(serial)
+                else:
+                    print(f"⚠️ {serial}: worker exited ({code}), dropping the device")
+                    del workers[serial]
+                    stale.discard(serial)
+                continue
+
+            beat = heartbeats[serial].value
+            if beat and now - beat > stale_sec:
+                if serial not in stale:
+                    print(f"⚠️ {serial}: no heartbeat for {now - beat:.0f} s")
+                    stale.add(serial)
+            elif serial in stale:
+                print(f"{serial}: heartbeat back")
+                stale.discard(serial)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream EmotiBits to LSL.")
+    parser.add_argument("--online", action="store_true",
+                        help="also publish filtered streams and live SNR/HR metrics")
+    parser.add_argument("--chunk-ms", type=float, default=100,
+                        help="target chunk duration pulled from each board (default 100 ms)")
+    parser.add_argument("--stats-every", type=float, default=0,
+                        help="print per-device CPU/chunk/latency counters every N seconds")
+    parser.add_argument("--processes", action="store_true",
+                        help="run each device in its own process instead of a thread")
+    parser.add_argument("--reconnect", action=argparse.BooleanOptionalAction, default=True,
+                        help="reopen a board after connection or stream failures (default on)")
+    args = parser.parse_args()
+
     BoardShim.enable_dev_board_logger()
 
     # device serials
@@ -83,12 +293,35 @@ if __name__ == "__main__":
         # "EM-V6-0000335",
     ]
 
-    threads = []
-    for i, serial in enumerate(serials):
-        name = f"EmotiBit_{i+1}"
-        t = threading.Thread(target=stream_emotibit, args=(serial, name))
-        t.start()
-        threads.append(t)
+    if args.processes:
+        ctx = multiprocessing.get_context("spawn")
+        stop = ctx.Event()
+    else:
+        ctx = None
+        stop = stop_event
+    heartbeats = {
+        serial: multiprocessing.Value("d", 0.0, lock=False) if ctx is None
+        else ctx.Value("d", 0.0, lock=False)
+        for serial in serials
+    }
+    names = {serial: f"EmotiBit_{i+1}" for i, serial in enumerate(serials)}
+
+    def launch(serial):
+        return start_worker(ctx, serial, names[serial], dict(
+            online=args.online,
+            chunk_sec=args.chunk_ms / 1000,
+            stats_every=args.stats_every,
+            stop=stop,
+            heartbeat=heartbeats[serial],
+            reconnect=args.reconnect,
+        ))
+
+    workers = {serial: launch(serial) for serial in serials}
+    watcher = threading.Thread(
+        target=watch_devices, args=(ctx, workers, heartbeats, stop, launch),
+        kwargs={"reconnect": args.reconnect}, daemon=True
+    )
+    watcher.start()
 
     time.sleep(2)
     print("\nStreaming started for all devices.")
@@ -97,12 +330,13 @@ if __name__ == "__main__":
     while True:
         user_input = input().strip().lower()
         if user_input == "s":
-            stop_flag = True
+            stop.set()
             print("Stopping all devices...")
             break
 
-    # wait for all threads to finish
-    for t in threads:
-        t.join()
+    # wait for all devices to finish
+    watcher.join()
+    for worker in workers.values():
+        worker.join()
 
     print("All EmotiBits stopped and released cleanly.")
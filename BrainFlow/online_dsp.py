@@ -0,0 +1,137 @@
+"""
+Causal, chunk-by-chunk DSP for live EmotiBit streams.
+
+Every stage keeps its state between chunks, so feeding a recording in
+arbitrary chunk sizes gives the same output as feeding it in one go.
+Chunks are (channels, samples) arrays as returned by get_board_data.
+"""
+import time
+from collections import deque
+
+import numpy as np
+from scipy.signal import butter, find_peaks, sosfilt, sosfilt_zi
+
+
+class OnlineFilter:
+    """Butterworth filter in SOS form with its state (zi) carried across chunks."""
+
+    def __init__(self, fs, cutoff, btype="band", order=3, n_channels=1):
+        nyquist = 0.5 * fs
+        wn = [c / nyquist for c in np.atleast_1d(cutoff)]
+        self.sos = butter(order, wn if len(wn) > 1 else wn[0], btype=btype, output="sos")
+        self.n_channels = n_channels
+        self.zi = None
+
+    def process(self, chunk):
+        chunk = np.atleast_2d(np.asarray(chunk, dtype=np.float64))
+        if chunk.shape[1] == 0:
+            return chunk
+        if self.zi is None:
+            # start in steady state at the first sample to avoid a step transient
+            base = sosfilt_zi(self.sos)                      # (sections, 2)
+            self.zi = base[:, None, :] * chunk[None, :, :1]  # (sections, channels, 2)
+        out, self.zi = sosfilt(self.sos, chunk, axis=-1, zi=self.zi)
+        return out
+
+
+class RingBuffer:
+    """Last `size` samples of a (channels, samples) stream."""
+
+    def __init__(self, size, n_channels=1):
+        self.data = np.zeros((n_channels, size))
+        self.size = size
+        self.count = 0
+
+    def extend(self, chunk):
+        n = chunk.shape[1]
+        if n >= self.size:
+            self.data[:] = chunk[:, -self.size:]
+        else:
+            self.data[:, :-n] = self.data[:, n:]
+            self.data[:, -n:] = chunk
+        self.count = min(self.count + n, self.size)
+
+    def view(self):
+        return self.data[:, self.size - self.count:]
+
+
+class RollingSNR:
+    """SNR (dB) over the last window_sec seconds, per channel.
+
+    Same definition as the offline compute_snr: signal power against the
+    residual from a moving-average baseline.
+    """
+
+    def __init__(self, fs, window_sec=10, kernel=5, n_channels=1):
+        self.buffer = RingBuffer(int(window_sec * fs), n_channels)
+        self.kernel = np.ones(kernel) / kernel
+
+    def update(self, chunk):
+        self.buffer.extend(chunk)
+        win = self.buffer.view()
+        if win.shape[1] < len(self.kernel) * 2:
+            return np.full(win.shape[0], np.nan)
+        win = win - win.mean(axis=1, keepdims=True)
+        snr = np.empty(win.shape[0])
+        for i, sig in enumerate(win):
+            noise = sig - np.convolve(sig, self.kernel, mode="same")
+            p_sig, p_noise = np.mean(sig**2), np.mean(noise**2)
+            snr[i] = 10 * np.log10(p_sig / p_noise) if p_noise > 0 else -np.inf
+        return snr
+
+
+class RunningHR:
+    """Heart rate (bpm) from peaks of a filtered PPG channel over a sliding window."""
+
+    def __init__(self, fs, window_sec=8, min_bpm=40, max_bpm=180):
+        self.fs = fs
+        self.buffer = RingBuffer(int(window_sec * fs))
+        self.min_distance = max(1, int(fs * 60 / max_bpm))
+        self.max_ibi = 60 / min_bpm
+
+    def update(self, chunk):
+        self.buffer.extend(np.atleast_2d(chunk))
+        sig = self.buffer.view()[0]
+        if sig.size < self.fs * 2:
+            return np.nan
+        peaks, _ = find_peaks(sig, distance=self.min_distance, prominence=0.5 * np.std(sig))
+        ibi = np.diff(peaks) / self.fs
+        ibi = ibi[ibi <= self.max_ibi]
+        return 60 / np.median(ibi) if ibi.size else np.nan
+
+
+class DeviceDSP:
+    """
+    Online stage for one EmotiBit: filtered PPG/EDA/TEMP plus live metrics.
+
+    PPG is band-passed 0.5–5 Hz, EDA 0.05–2 Hz and TEMP low-passed at 0.5 Hz,
+    matching the offline pipeline but causal. HR is taken from whichever PPG
+    channel currently has the best SNR.
+    """
+
+    METRICS = ["SNR_PI", "SNR_PG", "SNR_PR", "HR", "LatencyMs"]
+
+    def __init__(self, ppg_fs=25, anc_fs=15):
+        self.ppg_filter = OnlineFilter(ppg_fs, (0.5, 5), "band", n_channels=3)
+        self.eda_filter = OnlineFilter(anc_fs, (0.05, 2), "band")
+        self.temp_filter = OnlineFilter(anc_fs, 0.5, "low")
+        self.snr = RollingSNR(ppg_fs, n_channels=3)
+        self.hr = [RunningHR(ppg_fs) for _ in range(3)]
+        self.latency_ms = deque(maxlen=100)
+
+    def process_ppg(self, ppg):
+        """Filter a (3, n) PPG chunk; returns (filtered, metrics row)."""
+        t0 = time.perf_counter()
+        filtered = self.ppg_filter.process(ppg)
+        snr = self.snr.update(filtered)
+        hrs = [hr.update(filtered[i:i + 1]) for i, hr in enumerate(self.hr)]
+        best = int(np.nanargmax(snr)) if np.isfinite(snr).any() else 1
+        latency = (time.perf_counter() - t0) * 1000
+        self.latency_ms.append(latency)
+        return filtered, [*snr, hrs[best], latency]
+
+    def process_eda(self, eda):
+        return self.eda_filter.process(eda)
+
+    def process_temp(self, temp):
+        return self.temp_filter.process(temp)
@@ -0,0 +1,311 @@
+"""
+Chunked, compressed recordings of BrainFlow presets, written while streaming.
+
+Chunks pulled from a board are gathered for flush_sec (1 s by default) and
+appended to one file per device and preset (<name>_<preset>.ebr), flushed
+and fsynced, so a crash loses at most the last flush_sec of data instead of
+the whole session. Layout:
+
+    "EBRF" version:u32 header_len:u32 header (JSON: board, preset, serial,
+                                              rows, timestamp_row, rate, ...)
+    chunk*: "EBC1" samples:u32 nbytes:u32 crc32:u32 t0:f64 t1:f64 payload
+
+A payload is the (rows, samples) float64 block of get_board_data, byte-
+shuffled (all first bytes, then all second bytes, ...) and zlib-compressed.
+The values are kept exactly. Shuffling puts the slowly changing high bytes
+of each channel side by side, which is what makes float data compress.
+
+<name>_<preset>.ebr.idx holds one INDEX_DTYPE record per chunk (offset,
+sizes, first sample, t0/t1 from the timestamp row). Recording memory-maps
+both files and decompresses only the chunks a time range touches; chunks
+written after the last index record (a crash between the two writes) are
+found by scanning their headers.
+
+    python recorder.py rec/emotibit_099_aux.ebr                  # summary
+    python recorder.py rec/emotibit_099_aux.ebr --csv aux.csv    # DataFilter.write_file layout
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"EBRF"
+VERSION = 1
+CHUNK_MAGIC = b"EBC1"
+CHUNK_HEADER = struct.Struct("<4sIIIdd")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("nbytes", "<u4"), ("samples", "<u4"),
+                        ("first", "<u8"), ("t0", "<f8"), ("t1", "<f8")])
+
+
+def _pack(block, level):
+    """Byte-shuffle and compress a (rows, samples) float64 block."""
+    raw = np.ascontiguousarray(block, dtype="<f8").view(np.uint8).reshape(-1, 8)
+    return zlib.compress(np.ascontiguousarray(raw.T).tobytes(), level)
+
+
+def _unpack(payload, rows, samples):
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(8, -1)
+    return np.ascontiguousarray(planes.T).view("<f8").reshape(rows, samples)
+
+
+class PresetWriter:
+    """Append-only .ebr file (plus .idx) of one preset of one device."""
+
+    def __init__(self, path, header, level=6, flush_sec=1.0):
+        self.path = Path(path)
+        self.header = dict(header, version=VERSION, created=time.time())
+        self.rows = int(header["rows"])
+        self.ts_row = header.get("timestamp_row")
+        self.level = level
+        self.flush_sec = flush_sec
+        self.samples = 0
+        self.chunks = 0
+        self.raw_bytes = 0
+        self._pending = []
+        self._pending_since = None
+        blob = json.dumps(self.header).encode()
+        self.f = open(self.path, "xb")
+        self.f.write(MAGIC + struct.pack("<II", VERSION, len(blob)) + blob)
+        self.idx = open(str(self.path) + ".idx", "xb")
+        self._sync()
+
+    def append(self, block):
+        """Queue a (rows, samples) block; written once the queue is flush_sec old."""
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim != 2 or block.shape[0] != self.rows:
+            raise ValueError(f"{self.path.name}: expected ({self.rows}, n) data, got {block.shape}")
+        if block.shape[1] == 0:
+            return
+        self._pending.append(block)
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        if now - self._pending_since >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        """Write the queued blocks as one chunk and its index record, then fsync both."""
+        if not self._pending:
+            return
+        block = np.concatenate(self._pending, axis=1)
+        self._pending, self._pending_since = [], None
+        n = block.shape[1]
+        ts = block[self.ts_row] if self.ts_row is not None else np.arange(self.samples, self.samples + n)
+        t0, t1 = float(np.min(ts)), float(np.max(ts))
+        payload = _pack(block, self.level)
+        offset = self.f.tell()
+        self.f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, n, len(payload), zlib.crc32(payload), t0, t1))
+        self.f.write(payload)
+        self.f.flush()
+        # the data goes first: an index record never points past the chunks on disk
+        os.fsync(self.f.fileno())
+        self.idx.write(np.array([(offset, len(payload), n, self.samples, t0, t1)], INDEX_DTYPE).tobytes())
+        self.idx.flush()
+        os.fsync(self.idx.fileno())
+        self.samples += n
+        self.chunks += 1
+        self.raw_bytes += block.nbytes
+
+    def _sync(self):
+        self.f.flush()
+        self.idx.flush()
+        os.fsync(self.f.fileno())
+        os.fsync(self.idx.fileno())
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.flush()
+        self._sync()
+        self.f.close()
+        self.idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def recording_paths(out_dir, name, presets):
+    """{preset: <out_dir>/<name>_<preset>.ebr} of the files a DeviceRecorder writes."""
+    return {preset: Path(out_dir) / f"{name}_{preset}.ebr" for preset in presets}
+
+
+class DeviceRecorder:
+    """
+    One PresetWriter per preset of an AcquisitionScheduler's board.
+
+    Files are <out_dir>/<name>_<preset>.ebr, each created with the first
+    chunk of its preset (its row count taken from the data); write() takes
+    the {preset: data} dict returned by scheduler.poll(). Existing files are
+    never overwritten (PresetWriter raises FileExistsError), so check
+    recording_paths() before starting the boards.
+    """
+
+    def __init__(self, scheduler, out_dir, name, serial=None, level=6, flush_sec=1.0):
+        from brainflow.board_shim import BoardShim
+
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.level = level
+        self.flush_sec = flush_sec
+        board_id = scheduler.board.get_board_id()
+        self.headers = {
+            preset: {
+                "board_id": board_id,
+                "preset": preset,
+                "serial": serial,
+                "timestamp_row": scheduler.ts_rows[preset],
+                "sampling_rate": scheduler.rates[preset],
+                "description": BoardShim.get_board_descr(board_id, value),
+            }
+            for preset, value in scheduler.presets.items()
+        }
+        self.paths = recording_paths(self.out_dir, name, self.headers)
+        self.writers = {}
+
+    def write(self, chunks):
+        for preset, data in chunks.items():
+            if preset not in self.writers:
+                header = dict(self.headers[preset], rows=data.shape[0])
+                self.writers[preset] = PresetWriter(self.paths[preset], header, self.level, self.flush_sec)
+            self.writers[preset].append(data)
+
+    def close(self):
+        for w in self.writers.values():
+            w.close()
+
+    def report(self):
+        """{preset: (samples, bytes on disk, bytes as float64)} written so far."""
+        return {p: (w.samples, w.path.stat().st_size, w.raw_bytes) for p, w in self.writers.items()}
+
+
+def _scan(buf, start, end):
+    """Index records of complete, intact chunks in buf[start:end]."""
+    records = []
+    pos = start
+    while pos + CHUNK_HEADER.size <= end:
+        magic, n, nbytes, crc, t0, t1 = CHUNK_HEADER.unpack_from(buf, pos)
+        stop = pos + CHUNK_HEADER.size + nbytes
+        if magic != CHUNK_MAGIC or stop > end or zlib.crc32(buf[pos + CHUNK_HEADER.size:stop]) != crc:
+            break
+        records.append((pos, nbytes, n, 0, t0, t1))
+        pos = stop
+    return records
+
+
+class Recording:
+    """Read side of an .ebr file: memory-mapped, chunks decompressed on demand."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:4] != MAGIC:
+            raise ValueError(f"{self.path} is not an .ebr recording")
+        _, header_len = struct.unpack_from("<II", self._buf, 4)
+        self.data_start = 12 + header_len
+        self.header = json.loads(self._buf[12:self.data_start])
+        self.rows = int(self.header["rows"])
+        self.index = self._load_index()
+
+    def _load_index(self):
+        idx_path = Path(str(self.path) + ".idx")
+        n = idx_path.stat().st_size // INDEX_DTYPE.itemsize if idx_path.exists() else 0
+        index = np.memmap(idx_path, INDEX_DTYPE, mode="r", shape=(n,)) if n else np.zeros(0, INDEX_DTYPE)
+        # a torn write can leave records for chunks that never reached the disk
+        ends = index["offset"] + CHUNK_HEADER.size + index["nbytes"]
+        n = int(np.count_nonzero(ends <= len(self._buf)))
+        index = index[:n]
+        indexed_end = (int(index["offset"][-1]) + CHUNK_HEADER.size + int(index["nbytes"][-1])
+                       if n else self.data_start)
+        tail = _scan(self._buf, indexed_end, len(self._buf))
+        if not tail:
+            return index
+        # chunks the index missed: append their records in memory
+        extra = np.array(tail, INDEX_DTYPE)
+        first = int(index["first"][-1]) + int(index["samples"][-1]) if n else 0
+        extra["first"] = first + np.concatenate(([0], np.cumsum(extra["samples"][:-1])))
+        return np.concatenate((np.asarray(index), extra))
+
+    def __len__(self):
+        return int(self.index["samples"].sum())
+
+    @property
+    def timestamp_row(self):
+        return self.header.get("timestamp_row")
+
+    def chunk(self, i):
+        """(rows, samples) data of chunk i."""
+        r = self.index[i]
+        start = int(r["offset"]) + CHUNK_HEADER.size
+        return _unpack(self._buf[start:start + int(r["nbytes"])], self.rows, int(r["samples"]))
+
+    def read(self, start=None, end=None):
+        """
+        (rows, samples) data with timestamps in [start, end] (Unix s; None = open).
+
+        Only the chunks whose [t0, t1] overlaps the range are decompressed.
+        """
+        t0, t1 = self.index["t0"], self.index["t1"]
+        keep = np.ones(len(self.index), dtype=bool)
+        if start is not None:
+            keep &= t1 >= start
+        if end is not None:
+            keep &= t0 <= end
+        blocks = [self.chunk(i) for i in np.flatnonzero(keep)]
+        data = np.concatenate(blocks, axis=1) if blocks else np.zeros((self.rows, 0))
+        if self.timestamp_row is not None and (start is not None or end is not None):
+            ts = data[self.timestamp_row]
+            mask = np.ones(ts.size, dtype=bool)
+            if start is not None:
+                mask &= ts >= start
+            if end is not None:
+                mask &= ts <= end
+            data = data[:, mask]
+        return data
+
+    def close(self):
+        self.index = None
+        self._buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export an .ebr recording.")
+    parser.add_argument("path")
+    parser.add_argument("--start", type=float, help="first timestamp (Unix s)")
+    parser.add_argument("--end", type=float, help="last timestamp (Unix s)")
+    parser.add_argument("--csv", help="write the samples like DataFilter.write_file")
+    args = parser.parse_args()
+
+    with Recording(args.path) as rec:
+        size = rec.path.stat().st_size
+        print(f"{rec.path.name}: {rec.header.get('serial') or '?'} {rec.header['preset']}, "
+              f"{rec.rows} rows x {len(rec)} samples in {len(rec.index)} chunks, {size / 1e6:.2f} MB")
+        if len(rec):
+            print(f"  {rec.index['t0'].min():.3f} .. {rec.index['t1'].max():.3f} "
+                  f"({rec.index['t1'].max() - rec.index['t0'].min():.1f} s), "
+                  f"{size / (8 * rec.rows * len(rec)):.0%} of the float64 size")
+        data = rec.read(args.start, args.end) if args.csv else None
+    if args.csv:
+        # DataFilter.write_file layout: one sample per line, tab separated
+        np.savetxt(args.csv, data.T, fmt="%.6f", delimiter="\t")
+        print(f"✅ Saved {data.shape[1]} samples to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,114 @@
+import argparse
+import threading
 import time
+from pathlib import Path
+
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds, BrainFlowPresets
 from brainflow.data_filter import DataFilter
 
+from acquisition import AcquisitionScheduler
+from recorder import DeviceRecorder, Recording, recording_paths
+
+PRESETS = {
+    "default": BrainFlowPresets.DEFAULT_PRESET,
+    "aux": BrainFlowPresets.AUXILIARY_PRESET,
+    "anc": BrainFlowPresets.ANCILLARY_PRESET,
+}
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Record two EmotiBits to compressed .ebr files.")
+    parser.add_argument("--out", type=Path, default=Path("."), help="folder for the recordings")
+    parser.add_argument("--chunk-ms", type=float, default=100,
+                        help="target chunk duration pulled from each board (default 100 ms)")
+    parser.add_argument("--flush-sec", type=float, default=1.0,
+                        help="seconds of data gathered per preset before it is written (default 1 s)")
+    parser.add_argument("--csv", action="store_true",
+                        help="also export emotibit_<n>_<preset>.csv with DataFilter.write_file at the end")
+    args = parser.parse_args()
+
     # enable detailed BrainFlow logs
     BoardShim.enable_dev_board_logger()
 
-    # emotibit serial numbers
-    SERIAL_1 = "EM-V6-0000099"
-    SERIAL_2 = "EM-V6-0000228"
+    # emotibit serial numbers, keyed by the name used in the file names
+    serials = {
+        "emotibit_099": "EM-V6-0000099",
+        "emotibit_228": "EM-V6-0000228",
+    }
 
-    # initialize connection parameters
-    params1 = BrainFlowInputParams()
-    params1.serial_number = SERIAL_1
-    params2 = BrainFlowInputParams()
-    params2.serial_number = SERIAL_2
+    # refuse to start rather than fail on the first chunk with the streams running
+    taken = [p for name in serials for p in recording_paths(args.out, name, PRESETS).values()
+             if p.exists() or p.with_name(p.name + ".idx").exists()]
+    if taken:
+        parser.error(f"{taken[0]} already exists; choose another --out or move the old recordings")
 
     board_id = BoardIds.EMOTIBIT_BOARD.value
     presets = BoardShim.get_board_presets(board_id)
     print("Available presets:", presets)
 
     # initialize both EmotiBits
-    board1 = BoardShim(board_id, params1)
-    board2 = BoardShim(board_id, params2)
+    boards = {}
+    for name, serial in serials.items():
+        params = BrainFlowInputParams()
+        params.serial_number = serial
+        boards[name] = BoardShim(board_id, params)
     print("🔌 Preparing EmotiBits...")
-    board1.prepare_session()
-    board2.prepare_session()
+    for board in boards.values():
+        board.prepare_session()
 
     # start streaming for both
+    for board in boards.values():
+        board.start_stream()
+    schedulers = {name: AcquisitionScheduler(board, PRESETS, chunk_sec=args.chunk_ms / 1000)
+                  for name, board in boards.items()}
+    recorders = {name: DeviceRecorder(schedulers[name], args.out, name, serials[name],
+                                      flush_sec=args.flush_sec)
+                 for name in boards}
     print("Recording started! Press ENTER anytime to stop...")
-    board1.start_stream()
-    board2.start_stream()
+
+    stop = threading.Event()
+    threading.Thread(target=lambda: (input(), stop.set()), daemon=True).start()
 
     try:
-        input()  # waits until you press ENTER manually
+        # chunks go to disk while recording instead of piling up in the boards' buffers
+        while not stop.is_set():
+            for name, scheduler in schedulers.items():
+                recorders[name].write(scheduler.poll())
+            next_due = min(s.next_due for s in schedulers.values())
+            stop.wait(max(next_due - time.perf_counter(), 0.002))
     finally:
         print("Stopping streams...")
-
-        # fetch data from both boards
-        data_default1 = board1.get_board_data(preset=BrainFlowPresets.DEFAULT_PRESET)
-        data_aux1 = board1.get_board_data(preset=BrainFlowPresets.AUXILIARY_PRESET)
-        data_anc1 = board1.get_board_data(preset=BrainFlowPresets.ANCILLARY_PRESET)
-
-        data_default2 = board2.get_board_data(preset=BrainFlowPresets.DEFAULT_PRESET)
-        data_aux2 = board2.get_board_data(preset=BrainFlowPresets.AUXILIARY_PRESET)
-        data_anc2 = board2.get_board_data(preset=BrainFlowPresets.ANCILLARY_PRESET)
-
-        # stop and release sessions
-        board1.stop_stream()
-        board2.stop_stream()
-        board1.release_session()
-        board2.release_session()
-
-        # save all presets to CSV
-        print("Saving data to CSV files...")
-        DataFilter.write_file(data_default1, "emotibit_099_default.csv", "w")
-        DataFilter.write_file(data_aux1, "emotibit_099_aux.csv", "w")
-        DataFilter.write_file(data_anc1, "emotibit_099_anc.csv", "w")
-
-        DataFilter.write_file(data_default2, "emotibit_228_default.csv", "w")
-        DataFilter.write_file(data_aux2, "emotibit_228_aux.csv", "w")
-        DataFilter.write_file(data_anc2, "emotibit_228_anc.csv", "w")
+        errors = []
+        for name, board in boards.items():
+            try:
+                # whatever is still buffered in the board
+                recorders[name].write({p: board.get_board_data(preset=v) for p, v in PRESETS.items()})
+            except Exception as e:
+                print(f"❌ {name}: could not write the last chunks: {e}")
+            # every step runs, and every board is released, even if one fails
+            for step, action in (("stop the stream", board.stop_stream),
+                                 ("release the session", board.release_session),
+                                 ("close the recording", recorders[name].close)):
+                try:
+                    action()
+                except Exception as e:
+                    print(f"❌ {name}: could not {step}: {e}")
+                    errors.append(e)
 
         print("Done! Files saved:")
-        print(" emotibit_099_default.csv / aux.csv / anc.csv")
-        print(" emotibit_228_default.csv / aux.csv / anc.csv")
+        for name, recorder in recorders.items():
+            for preset, (samples, size, raw) in recorder.report().items():
+                path = recorder.writers[preset].path
+                ratio = f", {size / raw:.0%} of float64" if raw else ""
+                print(f" {path} ({samples} samples, {size / 1e3:.0f} kB{ratio})")
+                if args.csv and samples:
+                    csv_path = args.out / f"{name}_{preset}.csv"
+                    with Recording(path) as rec:
+                        DataFilter.write_file(rec.read(), str(csv_path), "w")
+                    print(f" {csv_path}")
+        if errors:
+            raise errors[0]
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
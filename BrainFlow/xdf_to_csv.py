@@ -1,53 +1,180 @@
-import pyxdf
-import pandas as pd
+"""
+Convert LSL recordings (.xdf) into per-stream NPZ, Parquet or CSV files.
+
+    python xdf_to_csv.py recordings/ -o exports/ --format npz --type PPG --type Markers -j 4
+
+Every XDF file given (or found under a given directory) is converted in a
+process pool. Only streams matching --name/--type are loaded, numeric data
+is stored as float32 with float64 timestamps, and each file reports its
+sample count and throughput.
+"""
+import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pyxdf
+
+
+def stream_columns(name, n_channels):
+    """Column names used for the EmotiBit LSL streams."""
+    if "PPG" in name:
+        return ["PPG_1", "PPG_2", "PPG_3"][:n_channels]
+    elif "EDA" in name:
+        return ["EDA"]
+    elif "TEMP" in name:
+        return ["Temperature"]
+    return [f"Ch_{j}" for j in range(n_channels)]
+
+
+def find_xdf_files(inputs):
+    """Expand files and directories (searched recursively) into .xdf paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".xdf"))
+        else:
+            paths.append(item)
+    return paths
+
+
+def select_stream_ids(xdf_path, names=None, types=None):
+    """Stream ids matching any of names/types (None = every stream).
+
+    Only the stream headers are read, so unselected streams are never
+    materialized by load_xdf.
+    """
+    if not names and not types:
+        return None
+    query = [{"name": n} for n in names or []] + [{"type": t} for t in types or []]
+    return pyxdf.match_streaminfos(pyxdf.resolve_streams(xdf_path), query)
+
+
+def output_dir(xdf_path, out_root=None):
+    """Folder the streams of one XDF file are written to."""
+    stem = os.path.splitext(os.path.basename(xdf_path))[0]
+    return os.path.join(out_root or os.path.join(os.path.dirname(xdf_path), "exports"), stem)
+
 
-# path to your XDF file
-xdf_path = "/Users/sabirthapa/Documents/CurrentStudy/sub-P001/ses-S001/eeg/sub-P001_ses-S001_task-Default_run-001_eeg.xdf"
-
-print(f"Loading XDF file: {xdf_path}")
-streams, fileheader = pyxdf.load_xdf(xdf_path)
-print(f"Loaded {len(streams)} streams.")
-
-# create an output folder for CSVs
-output_dir = os.path.join(os.path.dirname(xdf_path), "csv_exports")
-os.makedirs(output_dir, exist_ok=True)
-
-# convert each stream to CSV
-for i, stream in enumerate(streams):
-    name = stream["info"]["name"][0]
-    source_id = stream["info"].get("source_id", ["unknown"])[0]
-    serial = source_id.split("_")[-1] 
-    stype = stream["info"]["type"][0]
-    data = stream["time_series"]
-    timestamps = stream["time_stamps"]
-
-    print(f"Processing stream {i+1}: {name} ({stype}) with {len(timestamps)} samples")
-
-    # marker streams (contain strings)
-    if stype.lower() == "markers" or isinstance(data[0][0], str):
-        df = pd.DataFrame({"Marker": [d[0] for d in data], "Timestamp": timestamps})
-    else:
-        # numeric data streams
-        import numpy as np
-
-        data = np.array(data)
-
-        if "PPG" in name:
-            cols = ["PPG_1", "PPG_2", "PPG_3"]
-        elif "EDA" in name:
-            cols = ["EDA"]
-        elif "TEMP" in name:
-            cols = ["Temperature"]
+def check_collisions(paths, out_root=None):
+    """Raise ValueError if two inputs would be written to the same folder.
+
+    With a common out_root the output folder is named after the file stem
+    only, so e.g. a/session.xdf and b/session.xdf would overwrite each other.
+    """
+    seen = {}
+    for path in paths:
+        out = os.path.normpath(output_dir(path, out_root))
+        if out in seen:
+            raise ValueError(f"{seen[out]} and {path} would both be written to {out}")
+        seen[out] = path
+
+
+def write_stream(out_base, fmt, columns, data, timestamps):
+    """Write one stream; data is a 2-D float32 array or a 1-D array of strings."""
+    if fmt == "npz":
+        np.savez(out_base + ".npz", data=data, timestamps=timestamps, columns=np.array(columns))
+        return out_base + ".npz"
+
+    import pandas as pd
+
+    df = pd.DataFrame(data if data.ndim == 2 else {columns[0]: data}, columns=columns)
+    df["Timestamp"] = timestamps
+    if fmt == "parquet":
+        df.to_parquet(out_base + ".parquet", index=False)
+        return out_base + ".parquet"
+    df.to_csv(out_base + ".csv", index=False)
+    return out_base + ".csv"
+
+
+def convert_file(xdf_path, out_root=None, fmt="npz", names=None, types=None):
+    """Convert one XDF file; returns a summary dict for progress reporting."""
+    t0 = time.perf_counter()
+    out_dir = output_dir(xdf_path, out_root)
+    os.makedirs(out_dir, exist_ok=True)
+
+    summary = {"file": xdf_path, "streams": 0, "samples": 0, "outputs": [],
+               "bytes": os.path.getsize(xdf_path)}
+    stream_ids = select_stream_ids(xdf_path, names, types)
+    if stream_ids == []:
+        summary["seconds"] = time.perf_counter() - t0
+        return summary
+    streams, _ = pyxdf.load_xdf(xdf_path, select_streams=stream_ids)
+
+    for stream in streams:
+        name = stream["info"]["name"][0]
+        source_id = stream["info"].get("source_id", ["unknown"])[0] or "unknown"
+        serial = source_id.split("_")[-1]
+        stype = stream["info"]["type"][0]
+        timestamps = np.asarray(stream["time_stamps"], dtype=np.float64)
+        series = stream["time_series"]
+
+        # marker streams (contain strings)
+        if stype.lower() == "markers" or stream["info"]["channel_format"][0] == "string":
+            data = np.array([s[0] for s in series], dtype=str)
+            columns = ["Marker"]
         else:
-            cols = [f"Ch_{j}" for j in range(data.shape[1])]
+            # the channel count comes from the header: pyxdf returns
+            # (0, n) for a stream without samples, which -1 cannot reshape
+            n_channels = int(stream["info"]["channel_count"][0])
+            data = np.asarray(series, dtype=np.float32).reshape(len(timestamps), n_channels)
+            columns = stream_columns(name, data.shape[1])
+
+        out_base = os.path.join(out_dir, f"{name}_{serial}")
+        summary["outputs"].append(write_stream(out_base, fmt, columns, data, timestamps))
+        summary["streams"] += 1
+        summary["samples"] += len(timestamps)
+
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert XDF recordings to columnar files.")
+    parser.add_argument("inputs", nargs="+", help=".xdf files or directories to search")
+    parser.add_argument("-o", "--out", help="output root (default: <xdf dir>/exports)")
+    parser.add_argument("--format", choices=["npz", "parquet", "csv"], default="npz")
+    parser.add_argument("--name", action="append", help="only streams with this name (repeatable)")
+    parser.add_argument("--type", action="append", help="only streams of this type (repeatable)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    paths = find_xdf_files(args.inputs)
+    try:
+        check_collisions(paths, args.out)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Converting {len(paths)} XDF file(s) with {args.jobs} worker(s)...")
+    t0 = time.perf_counter()
+    total_bytes = total_samples = failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(convert_file, p, args.out, args.format, args.name, args.type): p
+            for p in paths
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                s = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(paths)}] {path}: failed -> {e}")
+                continue
+            total_bytes += s["bytes"]
+            total_samples += s["samples"]
+            rate = s["bytes"] / 1e6 / s["seconds"] if s["seconds"] > 0 else 0.0
+            print(f"[{done}/{len(paths)}] {path}: {s['streams']} streams, "
+                  f"{s['samples']} samples in {s['seconds']:.2f} s ({rate:.1f} MB/s)")
 
-        df = pd.DataFrame(data, columns=cols)
-        df["Timestamp"] = timestamps
+    elapsed = time.perf_counter() - t0
+    print(f"\nDone: {len(paths) - failed}/{len(paths)} files, {total_samples} samples, "
+          f"{total_bytes / 1e6:.1f} MB in {elapsed:.2f} s "
+          f"({total_bytes / 1e6 / elapsed if elapsed > 0 else 0:.1f} MB/s)")
 
-    # save as CSV
-    out_path = os.path.join(output_dir, f"{name}_{serial}.csv")
-    df.to_csv(out_path, index=False)
-    print(f"Saved: {out_path}")
 
-print("\nAll streams exported successfully to:", output_dir)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,196 @@
-import pandas as pd
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-import csv
-from utils_emotibit import parse_lm_file, safe_float
+
+from utils_emotibit import PPG_TAGS, align_ppg, parse_lm_file, read_ppg_channel, write_ppg_csv
+
+# stage spans (off unless EMOTIBIT_TRACE is set) come from the repository's
+# emotibit/trace.py; it needs only the standard library, so it is loaded by
+# path and sys.path is left alone
+_trace = sys.modules.get("emotibit.trace")
+if _trace is None:
+    _spec = importlib.util.spec_from_file_location(
+        "emotibit_trace", Path(__file__).resolve().parent.parent / "emotibit" / "trace.py")
+    _trace = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_trace)
+span = _trace.span
+
+# bump when the outputs change for the same inputs, to force a rebuild
+PIPELINE_VERSION = 2
+INPUT_TAGS = ["PI", "PG", "PR", "LM"]
 
 # Define paths
 script_dir = Path(__file__).resolve().parent
 data_root  = script_dir.parent            # contains subject1, subject2, ...
 output_dir = script_dir / "output"        # output inside EmotiBitProcessing/
-output_dir.mkdir(exist_ok=True)
 
-# subject folders like subject1, subject2, ...
-subject_dirs = [p for p in data_root.iterdir() if p.is_dir() and p.name.startswith("subject")]
 
-for subject_dir in subject_dirs:
+def file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def input_fingerprints(subject_dir, previous=None):
+    """size/mtime/hash of each input; hashes are reused while size and mtime match."""
+    previous = previous or {}
+    prints = {}
+    for tag in INPUT_TAGS:
+        path = subject_dir / f"{subject_dir.name}_{tag}.csv"
+        if not path.exists():
+            continue
+        st = path.stat()
+        old = previous.get(path.name, {})
+        if old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            digest = old["blake2b"]
+        else:
+            digest = file_hash(path)
+        prints[path.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": digest}
+    return prints
+
+
+def is_current(entry, prints, out_dir):
+    """True if a manifest entry was built from the same inputs and its outputs exist."""
+    if not entry or entry.get("version") != PIPELINE_VERSION:
+        return False
+    old = {name: p["blake2b"] for name, p in entry.get("inputs", {}).items()}
+    new = {name: p["blake2b"] for name, p in prints.items()}
+    return old == new and all((out_dir / name).exists() for name in entry.get("outputs", []))
+
+
+def process_subject(subject_dir, out_dir):
+    """Combine PI/PG/PR and clean the LM markers of one subject; returns output names."""
+    subject_dir, out_dir = Path(subject_dir), Path(out_dir)
     subject_name = subject_dir.name
     print(f"\nProcessing {subject_name}...")
 
-    try:
-        # load PPG CSVs 
-        pi = pd.read_csv(subject_dir / f"{subject_name}_PI.csv")
-        pg = pd.read_csv(subject_dir / f"{subject_name}_PG.csv")
-        pr = pd.read_csv(subject_dir / f"{subject_name}_PR.csv")
-
-        # merge PPG files on timestamps
-        combined_ppg = (
-            pi[["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "PI"]]
-            .merge(
-                pg[["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "PG"]],
-                on=["LslMarkerSourceTimestamp", "EmotiBitTimestamp"], how="outer"
-            )
-            .merge(
-                pr[["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "PR"]],
-                on=["LslMarkerSourceTimestamp", "EmotiBitTimestamp"], how="outer"
-            )
-            .sort_values("LslMarkerSourceTimestamp")
-        )
-
-        # format numeric columns
-        # Keep EmotiBitTimestamp with 3 decimal places
-        if "EmotiBitTimestamp" in combined_ppg.columns:
-            combined_ppg["EmotiBitTimestamp"] = combined_ppg["EmotiBitTimestamp"].apply(
-                lambda x: f"{float(x):.3f}" if pd.notna(x) else ""
-            )
-
-        # Format PI, PG, PR as integers (remove .0)
-        for col in ["PI", "PG", "PR"]:
-            if col in combined_ppg.columns:
-                combined_ppg[col] = combined_ppg[col].apply(
-                    lambda x: str(int(x)) if pd.notna(x) and float(x).is_integer() else ("" if pd.isna(x) else str(x))
-                )
-
-        # save combined PPG file
-        ppg_outfile = output_dir / f"{subject_name}_PPG_combined.csv"
-        combined_ppg.to_csv(ppg_outfile, index=False)
-        print(f"Combined PPG saved to: {ppg_outfile}")
-
-        # parse LM robustly 
-        lm_path = subject_dir / f"{subject_name}_LM.csv"
+    # load PPG CSVs and align them packet by packet
+    channels = {}
+    for tag in PPG_TAGS:
+        with span("combine.read", subject=subject_name, tag=tag) as s:
+            channels[tag] = read_ppg_channel(subject_dir / f"{subject_name}_{tag}.csv", tag)
+            s.note(rows=len(channels[tag][tag]))
+    with span("combine.align", subject=subject_name) as s:
+        combined_ppg = align_ppg(channels)
+        s.note(rows=len(combined_ppg["EmotiBitTimestamp"]))
+
+    # save combined PPG file
+    ppg_outfile = out_dir / f"{subject_name}_PPG_combined.csv"
+    with span("combine.write_ppg", subject=subject_name, rows=len(combined_ppg["EmotiBitTimestamp"])):
+        write_ppg_csv(combined_ppg, ppg_outfile)
+    print(f"Combined PPG saved to: {ppg_outfile}")
+
+    # parse LM robustly
+    lm_path = subject_dir / f"{subject_name}_LM.csv"
+    with span("combine.parse_lm", subject=subject_name) as s:
         lm_clean = parse_lm_file(lm_path)
+        s.note(rows=len(lm_clean))
+
+    lm_outfile = out_dir / f"{subject_name}_LM_cleaned.csv"
+    with span("combine.write_lm", subject=subject_name, rows=len(lm_clean)):
+        lm_clean[["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "Marker"]].to_csv(lm_outfile, index=False)
+    print(f"Cleaned LM file saved to: {lm_outfile}")
+
+    if not lm_clean.empty:
+        head = lm_clean.head(3).to_string(index=False)
+        print("LM preview:\n" + head)
 
-        lm_outfile = output_dir / f"{subject_name}_LM_cleaned.csv"
-        lm_clean.to_csv(lm_outfile, index=False)
-        print(f"Cleaned LM file saved to: {lm_outfile}")
+    return [ppg_outfile.name, lm_outfile.name]
 
-        if not lm_clean.empty:
-            head = lm_clean.head(3).to_string(index=False)
-            print("LM preview:\n" + head)
 
+def run_subject(subject_dir, out_dir):
+    """process_subject with timing; never raises, so one subject can't stop the batch."""
+    t0 = time.perf_counter()
+    result = {"subject": Path(subject_dir).name, "status": "processed", "outputs": []}
+    try:
+        result["outputs"] = process_subject(subject_dir, out_dir)
     except FileNotFoundError as e:
-        print(f"Skipping {subject_name}: Missing file -> {e}")
+        result.update(status="failed", error=f"Missing file -> {e}")
     except Exception as e:
-        print(f"Error processing {subject_name}: {e}")
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine PPG channels and clean LM markers per subject.")
+    parser.add_argument("--data-root", type=Path, default=data_root,
+                        help="folder containing subject1, subject2, ...")
+    parser.add_argument("--out", type=Path, default=output_dir)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="rebuild subjects even if current")
+    parser.add_argument("--summary", type=Path,
+                        help="where to write the JSON run summary (default: <out>/batch_summary.json)")
+    args = parser.parse_args()
+
+    args.out.mkdir(exist_ok=True)
+    manifest_path = args.out / "manifest.json"
+    summary_path = args.summary or args.out / "batch_summary.json"
+    manifest = load_manifest(manifest_path)
+
+    # subject folders like subject1, subject2, ...
+    subject_dirs = sorted(p for p in args.data_root.iterdir() if p.is_dir() and p.name.startswith("subject"))
+
+    t0 = time.perf_counter()
+    results, todo, prints = [], [], {}
+    for subject_dir in subject_dirs:
+        entry = manifest.get(subject_dir.name)
+        prints[subject_dir.name] = input_fingerprints(subject_dir, entry and entry.get("inputs"))
+        if not args.force and is_current(entry, prints[subject_dir.name], args.out):
+            entry["inputs"] = prints[subject_dir.name]    # keep touched-only files cheap next time
+            results.append({"subject": subject_dir.name, "status": "skipped",
+                            "outputs": entry["outputs"], "seconds": 0.0})
+        else:
+            todo.append(subject_dir)
+
+    print(f"{len(todo)} subject(s) to process, {len(results)} up to date.")
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(todo) or 1))) as pool:
+        futures = [pool.submit(run_subject, d, args.out) for d in todo]
+        for future in as_completed(futures):
+            r = future.result()
+            results.append(r)
+            if r["status"] == "processed":
+                manifest[r["subject"]] = {"version": PIPELINE_VERSION,
+                                          "inputs": prints[r["subject"]],
+                                          "outputs": r["outputs"]}
+                print(f"{r['subject']}: processed in {r['seconds']:.2f} s")
+            else:
+                manifest.pop(r["subject"], None)
+                print(f"Error processing {r['subject']}: {r['error']}")
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    results.sort(key=lambda r: r["subject"])
+    summary = {
+        "seconds": time.perf_counter() - t0,
+        "processed": sum(r["status"] == "processed" for r in results),
+        "skipped": sum(r["status"] == "skipped" for r in results),
+        "failed": sum(r["status"] == "failed" for r in results),
+        "subjects": results,
+    }
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\nAll subjects processed: {summary['processed']} processed, "
+          f"{summary['skipped']} skipped, {summary['failed']} failed. Summary: {summary_path}")
+
 
-print("\nAll subjects processed.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+import warnings
+
+import numpy as np
 import pandas as pd
-import csv
 
 def safe_float(x):
     """Safely convert a string or value to float, or return None if it fails."""
@@ -9,39 +11,314 @@ def safe_float(x):
         return None
 
 
-def parse_lm_file(lm_path):
+CLOCK_FIELDS = ("LR", "LM", "LC")
+LM_COLUMNS = ["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "Marker", *CLOCK_FIELDS]
+CHUNK_BYTES = 8 * 1024 * 1024
+
+_SEP = np.array([ord(","), ord("\n"), ord("\r")], dtype=np.uint8)
+
+
+def _strip_fields(buf):
+    """Drop whitespace at the edges of every field of a CSV byte buffer.
+
+    Works on the (usually few) runs of blanks only.
     """
-    Parse EmotiBit *_LM.csv to extract only the LslMarkerSourceTimestamp,
-    EmotiBitTimestamp, and Marker columns.
+    ws = np.flatnonzero((buf == ord(" ")) | (buf == ord("\t")))
+    if ws.size == 0:
+        return buf
+    # group blanks into runs and look at the bytes around each run
+    breaks = np.flatnonzero(np.diff(ws) > 1)
+    run_start = ws[np.concatenate(([0], breaks + 1))]
+    run_end = ws[np.concatenate((breaks, [ws.size - 1]))]
+    padded = np.concatenate(([ord("\n")], buf, [ord("\n")]))
+    edge = np.isin(padded[run_start], _SEP) | np.isin(padded[run_end + 2], _SEP)
+
+    keep = np.ones(buf.size, dtype=bool)
+    lengths = run_end[edge] - run_start[edge] + 1
+    offsets = np.cumsum(lengths) - lengths
+    keep[np.repeat(run_start[edge] - offsets, lengths) + np.arange(lengths.sum())] = False
+    return buf[keep]
+
+
+def _gather(buf, starts, ends, sep):
+    """Join the byte ranges buf[starts[i]:ends[i]] with sep into one bytes object."""
+    if starts.size == 0:
+        return b""
+    lengths = ends - starts + 1                       # one extra byte for sep
+    offsets = np.cumsum(lengths) - lengths
+    out = buf[np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())]
+    out[offsets + lengths - 1] = sep
+    return out[:-1].tobytes()
+
+
+def _parse_floats(buf, starts, ends):
+    """float() of every byte range, NaN where the text is not a number."""
+    text = _gather(buf, starts, ends, ord(","))
+    if not text:
+        return np.full(starts.size, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(text, sep=",")
+            if values.size == starts.size:
+                return values
+        except (ValueError, DeprecationWarning):
+            pass
+    # slow path, only when some field is empty or not numeric
+    fields = text.decode("utf-8", errors="replace").split(",")
+    return pd.to_numeric(pd.Series(fields, dtype=object), errors="coerce").to_numpy(np.float64)
+
+
+def _parse_lm_chunk(buf):
+    """Parse a byte buffer of whole LM rows into a DataFrame with LM_COLUMNS.
+
+    Rows are ragged, so every field is located from the comma positions and
+    the KEY,value payload (LR, LM, LC, LD) is matched on the raw bytes; no
+    Python object is created per field.
     """
-    rows = []
-    with open(lm_path, newline="") as f:
-        reader = csv.reader(f)
-        header = next(reader, None)  # skip header row
-        for row in reader:
-            if not row or len(row) < 9:
-                continue
-            lsl_src = safe_float(row[0])
-            emo_ts  = safe_float(row[3])
-            marker  = None
+    buf = _strip_fields(buf)
+    nl = np.flatnonzero(buf == ord("\n"))
+    starts = np.concatenate(([0], nl[:-1] + 1))
+    ends = nl - ((nl > starts) & (buf[nl - 1] == ord("\r")))
+    commas = np.flatnonzero(buf == ord(","))
+    first = np.searchsorted(commas, starts)
+    n_fields = np.searchsorted(commas, ends) - first + 1
+
+    keep = n_fields >= 9                      # at least 9 fields
+    out_row = np.cumsum(keep) - 1
+    n = int(keep.sum())
+
+    def field_bounds(row, k):
+        """(start, end) of field k of the given rows."""
+        start = np.where(k == 0, starts[row], commas[np.maximum(first[row] + k - 1, 0)] + 1)
+        last = k >= n_fields[row] - 1
+        end = np.where(last, ends[row], commas[np.minimum(first[row] + k, commas.size - 1)])
+        return start, end
+
+    # every payload field that has a value after it is a key candidate
+    row_of = np.repeat(np.arange(starts.size), n_fields - 1)
+    k = np.arange(commas.size) - first[row_of] + 1          # field after each comma
+    cand = np.flatnonzero(keep[row_of] & (k >= 9) & (k <= n_fields[row_of] - 2))
+    key_start, key_end = field_bounds(row_of[cand], k[cand])
+    is_2 = key_end - key_start == 2
+    b0 = buf[np.minimum(key_start, buf.size - 1)]
+    b1 = buf[np.minimum(key_start + 1, buf.size - 1)]
+
+    values = {}
+    for name in ("LD", *CLOCK_FIELDS):
+        hit = cand[is_2 & (b0 == ord(name[0])) & (b1 == ord(name[1]))]
+        # first match wins
+        rows, idx = np.unique(row_of[hit], return_index=True)
+        v_start, v_end = field_bounds(rows, k[hit[idx]] + 1)
+        values[name] = (out_row[rows], v_start, v_end)
+
+    clocks = {}
+    for name in CLOCK_FIELDS:
+        rows, v_start, v_end = values[name]
+        clocks[name] = np.full(n, np.nan)
+        clocks[name][rows] = _parse_floats(buf, v_start, v_end)
+
+    marker = np.full(n, "", dtype=object)
+    rows, v_start, v_end = values["LD"]
+    labels = _gather(buf, v_start, v_end, ord("\n")).decode("utf-8", errors="replace")
+    if rows.size:
+        marker[rows] = labels.split("\n")
+
+    # Fallback if LD missing: last field, if it contains a letter
+    has_ld = np.zeros(n, dtype=bool)
+    has_ld[rows] = True
+    fallback = np.flatnonzero(keep & (n_fields > 9))
+    fallback = fallback[~has_ld[out_row[fallback]]]
+    if fallback.size:
+        letter = ((buf | 0x20) >= ord("a")) & ((buf | 0x20) <= ord("z")) | (buf >= 0x80)
+        n_letters = np.concatenate(([0], np.cumsum(letter)))
+        l_start, l_end = field_bounds(fallback, n_fields[fallback] - 1)
+        fallback = fallback[n_letters[l_end] > n_letters[l_start]]
+        if fallback.size:
+            l_start, l_end = field_bounds(fallback, n_fields[fallback] - 1)
+            labels = _gather(buf, l_start, l_end, ord("\n")).decode("utf-8", errors="replace")
+            marker[out_row[fallback]] = labels.split("\n")
+
+    kept = np.flatnonzero(keep)
+    df = pd.DataFrame({
+        "LslMarkerSourceTimestamp": _parse_floats(buf, *field_bounds(kept, np.zeros_like(kept))),
+        "EmotiBitTimestamp": _parse_floats(buf, *field_bounds(kept, np.full_like(kept, 3))),
+        "Marker": marker,
+        **clocks,
+    })
+    return df.dropna(subset=["LslMarkerSourceTimestamp", "EmotiBitTimestamp"])
+
+
+def parse_lm_file(lm_path, chunk_bytes=CHUNK_BYTES):
+    """
+    Parse EmotiBit *_LM.csv to extract the LslMarkerSourceTimestamp,
+    EmotiBitTimestamp and Marker (LD) columns, plus the LR/LM/LC clock
+    fields. The file is read in blocks of about chunk_bytes.
+    """
+    chunks = []
+    tail = b""
+    with open(lm_path, "rb") as f:
+        f.readline()  # skip header row
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            tail = block[cut:]
+            if cut:
+                chunks.append(_parse_lm_chunk(np.frombuffer(block[:cut], dtype=np.uint8)))
+    if tail.strip():
+        chunks.append(_parse_lm_chunk(np.frombuffer(tail + b"\n", dtype=np.uint8)))
+
+    if not chunks:
+        return pd.DataFrame(columns=LM_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+PPG_TAGS = ("PI", "PG", "PR")
+TIME_COLUMNS = ["LslMarkerSourceTimestamp", "EmotiBitTimestamp"]
+MAX_SKEW_MS = 8.0
+
 
-            # Find LD,<marker>
-            for i in range(9, len(row) - 1):
-                if row[i].strip() == "LD":
-                    marker = row[i + 1].strip()
-                    break
+def read_ppg_channel(path, tag):
+    """Load the columns align_ppg needs from one PPG CSV as NumPy arrays."""
+    df = pd.read_csv(path, usecols=TIME_COLUMNS + ["PacketNumber", tag], dtype=np.float64)
+    return {c: df[c].to_numpy() for c in df.columns}
 
-            # Fallback if LD missing
-            if marker is None and len(row) > 9 and any(c.isalpha() for c in row[-1]):
-                marker = row[-1].strip()
 
-            if lsl_src is None or emo_ts is None:
-                continue
+def _run_rank(x):
+    """Position of every element within its run of equal consecutive values."""
+    idx = np.arange(x.size)
+    new_run = np.ones(x.size, dtype=bool)
+    new_run[1:] = x[1:] != x[:-1]
+    return idx - np.maximum.accumulate(np.where(new_run, idx, 0))
 
-            rows.append({
-                "LslMarkerSourceTimestamp": lsl_src,
-                "EmotiBitTimestamp": emo_ts,
-                "Marker": marker if marker is not None else ""
-            })
 
-    return pd.DataFrame(rows)
\ No newline at end of file
+def _segment_ids(x):
+    """0, 1, 2, ... numbering runs of equal consecutive values."""
+    return np.concatenate(([0], np.cumsum(x[1:] != x[:-1])))
+
+
+def _ordinal_offset(a, b, packet):
+    """
+    Index shift k such that b[i] pairs with a[i + k], per element of b.
+
+    The wavelengths are sampled together, so while no packet is lost the
+    n-th sample of one channel is the n-th sample of the other and the shift
+    is constant. The nearest-timestamp shift is noisy by one sample (packets
+    of different channels can split the same samples differently), so it is
+    averaged per packet and only allowed to change where it jumps by two or
+    more samples, i.e. where packets were dropped.
+    """
+    right = np.searchsorted(a, b, side="right")
+    below = np.maximum(right - 1, 0)
+    above = np.minimum(right, a.size - 1)
+    nearest = np.where(np.abs(b - a[below]) <= np.abs(a[above] - b), below, above)
+    # repeated timestamps (the first packet of a recording) pair up in order
+    tied = a[below] == b
+    nearest[tied] = np.minimum(below - _run_rank(a)[below] + _run_rank(b), below)[tied]
+    shift = nearest - np.arange(b.size)
+
+    pid = _segment_ids(packet)
+    counts = np.bincount(pid)
+    per_packet = np.rint(np.bincount(pid, shift) / counts)
+    segment = np.concatenate(([0], np.cumsum(np.abs(np.diff(per_packet)) >= 2)))
+    per_segment = np.rint(np.bincount(segment, per_packet * counts) / np.bincount(segment, counts))
+    return per_segment[segment][pid].astype(np.int64)
+
+
+def _match_sorted(a, b, packet, tol):
+    """Index into a for every element of b, -1 where b has no partner within tol."""
+    if a.size == 0 or b.size == 0:
+        return np.full(b.size, -1, dtype=np.int64)
+    idx = np.arange(b.size) + _ordinal_offset(a, b, packet)
+    ok = (idx >= 0) & (idx < a.size)
+    ok[ok] = np.abs(a[idx[ok]] - b[ok]) <= tol
+    match = np.where(ok, idx, -1)
+
+    # where the shift steps back, two samples can claim one partner: keep the closer
+    hit = np.flatnonzero(ok)
+    if np.any(np.diff(match[hit]) <= 0):
+        dist = np.abs(a[match[hit]] - b[hit])
+        order = np.lexsort((dist, match[hit]))
+        claimed = match[hit][order]
+        losers = order[1:][claimed[1:] == claimed[:-1]]
+        match[hit[losers]] = -1
+    return match
+
+
+def align_ppg(channels, tol_ms=MAX_SKEW_MS):
+    """
+    Align PI/PG/PR samples into one table: {column: array}.
+
+    Each channel is merged into the table built so far, pairing samples by
+    their order in the recording (see _ordinal_offset) and accepting a pair
+    only if the EmotiBitTimestamps are within tol_ms. Samples without a
+    partner get their own row and NaN in the other channels.
+
+    channels maps tag -> {"LslMarkerSourceTimestamp", "EmotiBitTimestamp",
+    "PacketNumber", tag} arrays in time order. Time columns come from the
+    first channel holding the sample.
+    """
+    table = None
+    for tag, ch in channels.items():
+        if table is None:
+            table = {c: np.asarray(ch[c], dtype=np.float64) for c in TIME_COLUMNS}
+            table[tag] = np.asarray(ch[tag], dtype=np.float64)
+            continue
+        ts = table["EmotiBitTimestamp"]
+        match = _match_sorted(ts, ch["EmotiBitTimestamp"], ch["PacketNumber"], tol_ms)
+        extra = match < 0
+
+        values = np.full(ts.size, np.nan)
+        values[match[~extra]] = ch[tag][~extra]
+        table[tag] = values
+        if not extra.any():
+            continue
+
+        # unmatched samples become new rows; a stable sort merges the two sorted runs
+        added = {c: ch[c][extra] if c in ch else np.full(extra.sum(), np.nan) for c in table}
+        order = np.argsort(np.concatenate((ts, added["EmotiBitTimestamp"])), kind="stable")
+        table = {c: np.concatenate((table[c], added[c]))[order] for c in table}
+    return table
+
+
+def _format_column(x, decimals=0, trim=False):
+    """
+    Text of every value of x with a fixed number of decimals; NaN gives an
+    empty field.
+
+    With trim, trailing zero decimals are dropped (at least one is kept), which
+    reproduces repr() for values that were read with at most `decimals`
+    decimals.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    text = np.char.mod(f"%.{decimals}f", x)
+    if trim and decimals > 1:
+        text = np.char.rstrip(text, "0")
+        text = np.where(np.char.endswith(text, "."), np.char.add(text, "0"), text)
+    return np.where(np.isnan(x), "", text)
+
+
+def write_ppg_csv(table, path):
+    """
+    Write an align_ppg table like the original combine step did:
+    LslMarkerSourceTimestamp as read, EmotiBitTimestamp with 3 decimals and
+    integral PPG values without ".0". Empty fields for missing samples.
+
+    Integral data is formatted column by column with np.char.mod; a table
+    with fractional PPG values is written with pandas' float formatting.
+    """
+    columns = list(table)
+    values = {c: np.asarray(table[c], dtype=np.float64) for c in columns}
+    tags = columns[2:]
+    if not all(np.array_equal(v[~np.isnan(v)], np.round(v[~np.isnan(v)])) for v in (values[t] for t in tags)):
+        df = pd.DataFrame(table)
+        df["EmotiBitTimestamp"] = df["EmotiBitTimestamp"].map(lambda x: f"{x:.3f}" if pd.notna(x) else "")
+        df.to_csv(path, index=False)
+        return
+
+    formats = {"LslMarkerSourceTimestamp": (6, True), "EmotiBitTimestamp": (3, False)}
+    text = {c: _format_column(values[c], *formats.get(c, (0, False))) for c in columns}
+    pd.DataFrame(text).to_csv(path, index=False, lineterminator="\n")
@@ -0,0 +1,12 @@
+"""Shared helpers for analysing multi-site EmotiBit recordings."""
+from .parser import parse_raw_file
+
+__all__ = ["parse_raw_file", "Session"]
+
+
+def __getattr__(name):
+    # imported on first use, so `python -m emotibit.session` does not find it preloaded
+    if name == "Session":
+        from .session import Session
+        return Session
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
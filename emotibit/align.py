@@ -0,0 +1,205 @@
+"""
+Resample several sites x channels onto one shared time grid.
+
+    results = run(["PI", "EA", "T1", "HR"])
+    aligned = align(results, fs=10)
+    aligned.data                  # (sites * channels, len(grid)), NaN outside coverage
+    np.corrcoef(aligned.channel("PI"))   # site x site correlation in one call
+
+Uniform channels are brought to the grid rate with a polyphase filter at
+their measured rate (anti-aliased when going down), one gap-free segment at
+a time, event channels such as
+HR or the SCR features are held at their last value. The last step onto the
+grid goes through an AlignmentIndex: the searchsorted positions and weights
+are computed once per time axis and reused for every array on that axis.
+"""
+from dataclasses import dataclass
+from fractions import Fraction
+
+import numpy as np
+
+from .channels import CHANNELS
+from .dsp import common_window
+
+MAX_RATIO_DENOMINATOR = 64   # bounds the polyphase filter length
+GAP_PERIODS = 3              # a step longer than this many periods splits a channel
+
+
+class AlignmentIndex:
+    """
+    Where every grid time falls on a sorted time axis ts.
+
+    apply() then interpolates any array sampled on ts in O(len(grid)):
+    "linear" between neighbours, "hold" keeps the previous value. Grid points
+    outside [ts[0], ts[-1]], or inside a gap longer than max_gap, are NaN.
+    """
+
+    def __init__(self, ts, grid, max_gap=None):
+        ts = np.asarray(ts, dtype=np.float64)
+        grid = np.asarray(grid, dtype=np.float64)
+        right = np.searchsorted(ts, grid, side="right")
+        self.left = np.clip(right - 1, 0, max(ts.size - 2, 0))
+        self.hold = np.clip(right - 1, 0, max(ts.size - 1, 0))
+        self.valid = (right > 0) & (grid <= (ts[-1] if ts.size else -np.inf))
+        if ts.size >= 2:
+            t0, t1 = ts[self.left], ts[self.left + 1]
+            span = t1 - t0
+            self.weight = np.where(span > 0, (grid - t0) / np.where(span > 0, span, 1), 0.0)
+            if max_gap is not None:
+                self.valid &= span <= max_gap
+        else:
+            self.weight = np.zeros(grid.size)
+            self.valid &= grid == (ts[0] if ts.size else np.nan)
+
+    def apply(self, values, kind="linear"):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return np.full(self.valid.size, np.nan)
+        if kind == "hold":
+            out = values[self.hold]
+        elif values.size == 1:
+            out = np.full(self.valid.size, values[0])
+        else:
+            out = values[self.left] + self.weight * (values[self.left + 1] - values[self.left])
+        return np.where(self.valid, out, np.nan)
+
+
+def measured_rate(ts):
+    """Mean sampling rate of a time axis (samples per second)."""
+    return (len(ts) - 1) / (ts[-1] - ts[0]) if len(ts) > 1 and ts[-1] > ts[0] else np.nan
+
+
+def segments(ts, periods=None):
+    """
+    (start, stop) slices of ts split wherever a step exceeds periods times
+    the median sampling period (dropped packets, paused recordings).
+    """
+    periods = GAP_PERIODS if periods is None else periods
+    if len(ts) < 3:
+        return [(0, len(ts))]
+    step = np.diff(ts)
+    cuts = np.flatnonzero(step > periods * np.median(step)) + 1
+    bounds = np.concatenate(([0], cuts, [len(ts)]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def polyphase(ts, sig, fs):
+    """
+    Resample a uniformly sampled signal to fs with resample_poly.
+
+    ts is first split at its gaps (see segments) and every segment is
+    resampled on its own: the samples of a segment are taken as evenly
+    spaced, and the up/down ratio comes from the segment's measured rate, so
+    a channel whose real rate differs from its nominal one is not stretched
+    and a gap does not shift the samples after it. Returns (ts, sig) of the
+    resampled signal, spanning the same segments as ts; the gaps stay gaps.
+    """
+    from scipy.signal import resample_poly
+
+    out_ts, out_sig = [], []
+    for a, b in segments(ts):
+        seg_ts, seg = ts[a:b], sig[a:b]
+        rate = measured_rate(seg_ts)
+        ratio = Fraction(fs / rate).limit_denominator(MAX_RATIO_DENOMINATOR) if np.isfinite(rate) else 1
+        if ratio != 1:
+            seg = resample_poly(seg, ratio.numerator, ratio.denominator)
+            # output sample k sits at input position k * down / up
+            pos = np.arange(seg.size) * ratio.denominator / ratio.numerator
+            end = seg_ts[-1]
+            seg_ts = seg_ts[0] + pos / (b - a - 1) * (end - seg_ts[0])
+            if seg_ts[-1] < end:
+                # hold the last value up to the segment's last input sample,
+                # so the resampled segment covers the same time as the original
+                seg_ts = np.append(seg_ts, end)
+                seg = np.append(seg, seg[-1])
+        out_ts.append(seg_ts)
+        out_sig.append(seg)
+    if len(out_ts) == 1:
+        return out_ts[0], out_sig[0]
+    return np.concatenate(out_ts), np.concatenate(out_sig)
+
+
+def is_event_channel(tag):
+    """Event channels (HR, SCR features) are sampled per detected event, not on a clock."""
+    return tag in CHANNELS and not CHANNELS[tag].uniform
+
+
+def make_grid(time_axes, fs):
+    """Grid at fs over the window every time axis covers."""
+    start, end = common_window(time_axes)
+    if end <= start:
+        return np.zeros(0)
+    return start + np.arange(int(np.floor((end - start) * fs)) + 1) / fs
+
+
+@dataclass
+class Aligned:
+    """Sites x channels on one grid; row i of data is rows[i] = (site, tag)."""
+    grid: np.ndarray
+    data: np.ndarray
+    rows: list
+    sites: list
+    tags: list
+
+    def channel(self, tag):
+        """(sites, grid) block of one channel."""
+        return self.data.reshape(len(self.sites), len(self.tags), -1)[:, self.tags.index(tag)]
+
+    def site(self, site):
+        """(channels, grid) block of one site."""
+        return self.data.reshape(len(self.sites), len(self.tags), -1)[self.sites.index(site)]
+
+
+def _shared_index(indexes, site, ts, grid, max_gap):
+    """AlignmentIndex of ts, reused for channels of a site with the same time axis."""
+    key = (site, ts.size, ts[0], ts[-1]) if ts.size else (site, 0)
+    cached = indexes.get(key)
+    if cached is not None and np.array_equal(cached[0], ts):
+        return cached[1]
+    index = AlignmentIndex(ts, grid, max_gap)
+    if cached is None:
+        indexes[key] = (ts, index)
+    return index
+
+
+def align(results, fs=None, tags=None, sites=None, window="common", max_gap=None):
+    """
+    Put pipeline.run() results on one grid: an Aligned with data of shape
+    (len(sites) * len(tags), len(grid)).
+
+    fs defaults to the highest nominal rate among the uniform channels.
+    window="common" spans the time every (site, tag) covers, "union" the time
+    any of them covers (rows are NaN where they have no data). Grid points in
+    a gap longer than max_gap seconds of a channel's own timestamps are NaN.
+    """
+    tags = list(tags or results)
+    sites = list(sites or dict.fromkeys(s for t in tags for s in results[t]))
+    present = [(s, t) for s in sites for t in tags if s in results[t]]
+    if fs is None:
+        rates = [results[t][s]["fs"] for s, t in present if not is_event_channel(t) and results[t][s]["fs"]]
+        fs = max(rates, default=1.0)
+
+    axes = [results[t][s]["ts"] for s, t in present]
+    if window == "union":
+        start, end = min(a[0] for a in axes), max(a[-1] for a in axes)
+        grid = start + np.arange(int(np.floor((end - start) * fs)) + 1) / fs
+    else:
+        grid = make_grid(axes, fs) if axes else np.zeros(0)
+
+    data = np.full((len(sites) * len(tags), grid.size), np.nan)
+    rows = [(s, t) for s in sites for t in tags]
+    indexes = {}
+    for i, (s, t) in enumerate(rows):
+        if s not in results[t]:
+            continue
+        r = results[t][s]
+        if is_event_channel(t):
+            ts, sig, kind = r["ts"], r["signal"], "hold"
+        else:
+            ts, sig = polyphase(r["ts"], r["signal"], fs)
+            kind = "linear"
+        data[i] = _shared_index(indexes, s, ts, grid, max_gap).apply(sig, kind)
+        if max_gap is not None and ts is not r["ts"]:
+            # the resampled axis is uniform: find the gaps on the original one
+            data[i, ~_shared_index(indexes, s, r["ts"], grid, max_gap).valid] = np.nan
+    return Aligned(grid, data, rows, sites, tags)
@@ -0,0 +1,376 @@
+"""
+Benchmark and regression check of the parsing, filtering and combining stages.
+
+    python -m emotibit.bench                      # 10 min, 3 devices, default channels
+    python -m emotibit.bench --duration 3600 --devices 1 --tags PI PG PR EA
+    python -m emotibit.bench --threshold 0.3 --no-record
+
+Every run generates synthetic sessions laid out like DataParser output
+(subject-style folders with the LSL columns, <prefix>.json, timeSyncMap,
+timesyncs and LM markers) from a fixed seed, at the channel rates of a
+recorded session (--rates-from, the Wrist site by default), times each
+stage (best of --repeat), measures its peak traced memory in one extra run,
+and appends the result to a JSON history. A stage regresses when its throughput drops, or
+its peak memory grows, by more than --threshold against the median of the
+last runs with the same configuration on the same host; the exit status
+is then 1.
+
+Stages: cache_build (CSV tokenizing, what pd.read_csv used to do in the
+plot scripts), cache_load (memory-mapped reload), bandpass, pipeline
+(load + clock sync + filter of every channel), parse_lm, combine
+(combine_ppg_and_markers.process_subject) and hrv.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from .channels import CHANNELS, PPG_TAGS, SITES, nominal_rate
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY_FILE = ".emotibit_bench.json"
+DEFAULT_TAGS = ("PI", "PG", "PR", "EA", "T1", "HR", "AX", "AY", "AZ")
+BASELINE_RUNS = 5
+RATE_SESSION = ROOT / SITES["Wrist"]   # recorded session whose channel rates are mimicked
+
+# samples per packet, as the firmware groups them
+_PACKET = {"PI": 4, "PG": 4, "PR": 4, "EA": 2, "AX": 2, "AY": 2, "AZ": 2,
+           "GX": 2, "GY": 2, "GZ": 2, "MX": 2, "MY": 2, "MZ": 2}
+_UNIX0 = 1760462400.0       # host clock at the start of every synthetic session
+_LSL0 = 1032470.0           # LSL clock at the same instant
+_HEADER = ("LslMarkerSourceTimestamp,LslLocalTimestamp,LocalTimestamp,EmotiBitTimestamp,"
+           "PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability")
+
+
+def session_rates(tags, session_dir=RATE_SESSION):
+    """{tag: nominal rate} of a recorded session, registry rates where it has none."""
+    return {tag: nominal_rate(session_dir, tag) for tag in tags}
+
+
+def _values(tag, t, fs, rng):
+    """Plausible raw values of one channel sampled at fs, at times t."""
+    if tag in PPG_TAGS:
+        from .hrv import synthetic_ppg
+        pulse = synthetic_ppg(t[-1] - t[0] + 1, fs=fs, n_channels=1,
+                              seed=int(rng.integers(1 << 31)))[0][:t.size]
+        return np.round(170000 + 800 * pulse + 5 * t)
+    if tag == "EA":
+        scr = np.zeros(t.size)
+        for onset in rng.uniform(t[0], t[-1], max(1, int((t[-1] - t[0]) / 20))):
+            dt = np.maximum(t - onset, 0)
+            scr += 0.02 * (1 - np.exp(-dt / 0.7)) * np.exp(-dt / 4)
+        return np.round(0.08 + 0.01 * np.sin(t / 300) + scr + 1e-4 * rng.standard_normal(t.size), 6)
+    if tag == "T1":
+        return np.round(31 + 0.5 * np.sin(t / 600) + 0.01 * rng.standard_normal(t.size), 3)
+    if tag == "HR":
+        return np.round(70 + 5 * np.sin(t / 30) + rng.standard_normal(t.size), 2)
+    return np.round(rng.standard_normal(t.size), 4)
+
+
+def _write_rows(path, header, columns):
+    """Write equal-length string columns as CSV rows."""
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        for a in range(0, len(columns[0]), 100_000):
+            rows = zip(*(c[a:a + 100_000] for c in columns))
+            f.write("\n".join(",".join(r) for r in rows) + "\n")
+
+
+def _fmt(fmt, x):
+    return np.char.mod(fmt, np.asarray(x)).tolist()
+
+
+def synthetic_session(session_dir, duration_sec=600, tags=DEFAULT_TAGS, seed=0,
+                      drift_ppm=40.0, marker_every=1.0, rates=None):
+    """
+    Write one synthetic EmotiBit session to session_dir (prefix = folder name).
+
+    Channels are sampled at rates ({tag: Hz}, session_rates() by default).
+    Device time drifts by drift_ppm against the host; an LM marker "sync" is
+    sent every marker_every seconds. Returns the number of samples written.
+    """
+    rates = session_rates(tags) if rates is None else rates
+    session_dir = Path(session_dir)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    prefix = session_dir.name
+    rng = np.random.default_rng(seed)
+    te0 = float(rng.integers(50_000, 150_000))
+    scale = 1000 * (1 + drift_ppm * 1e-6)
+
+    def clocks(t):
+        """(lsl, unix, device ms) of host times t (s from session start)."""
+        return _LSL0 + t, _UNIX0 + t, np.round(te0 + t * scale)
+
+    streams = [{"info": {"name": "EmotiBitData", "device_id": f"EM-SYN-{seed:07d}",
+                         "firmware_version": "synthetic", "created_at": prefix}}]
+    total = 0
+    for tag in tags:
+        channel = CHANNELS[tag]
+        fs = rates.get(tag) or channel.fs or 1.0
+        n = int(duration_sec * fs)
+        t = np.arange(n) / fs
+        if not channel.uniform:
+            t = np.sort(rng.uniform(0, duration_sec, n))
+        k = _PACKET.get(tag, 1)
+        lsl, unix, te = clocks(t)
+        # packets of k samples; other TypeTags' packets are numbered in between
+        packet = 1000 + np.arange(n) // k * 16 + list(CHANNELS).index(tag) % 16
+        values = _values(tag, t, fs, rng)
+        _write_rows(session_dir / f"{prefix}_{tag}.csv", f"{_HEADER},{tag}",
+                    [_fmt("%.6f", lsl), _fmt("%.6f", lsl), _fmt("%.6f", unix), _fmt("%.3f", te),
+                     _fmt("%d", packet), [str(k)] * n, [tag] * n, ["1"] * n, ["100"] * n,
+                     _fmt("%.10g", values)])
+        streams.append({"info": {"name": channel.title, "typeTags": [tag], "channel_count": 1,
+                                 "nominal_srate": fs if channel.uniform else None}})
+        total += n
+
+    # markers: LD label plus the LR/LM/LC clock fields
+    mt = np.arange(0.5, duration_sec, marker_every) + rng.uniform(0, 0.01)
+    lsl, unix, te = clocks(mt)
+    m = mt.size
+    _write_rows(session_dir / f"{prefix}_LM.csv", f"{_HEADER},LM",
+                [_fmt("%.6f", lsl), _fmt("%.6f", lsl), _fmt("%.6f", unix), _fmt("%d", te),
+                 _fmt("%d", 1000 + np.arange(m) * 160), ["8"] * m, ["LM"] * m, ["1"] * m, ["100"] * m,
+                 ["LR"] * m, _fmt("%.7f", lsl - 0.04), ["LM"] * m, _fmt("%.7f", lsl - 0.04),
+                 ["LC"] * m, _fmt("%.7f", lsl - 0.03), ["LD"] * m, ["sync"] * m])
+
+    # clock evidence for sync.py: anchors and round-trip exchanges
+    ex = np.arange(5.0, duration_sec, 30.0)
+    lsl, unix, te = clocks(ex)
+    rt = rng.integers(10, 40, ex.size)
+    sent = [datetime.fromtimestamp(u - r / 2000, timezone.utc).strftime("%Y-%m-%d_%H-%M-%S-%f")
+            for u, r in zip(unix, rt)]
+    _write_rows(session_dir / f"{prefix}_timesyncs.csv", "RD,TS_received,TS_sent,AK,RoundTrip,",
+                [_fmt("%d", te - 20), _fmt("%d", te), sent, _fmt("%d", te + 1), _fmt("%d", rt), [""] * ex.size])
+    i0, i1 = 0, max(ex.size - 1, 0)
+    with open(session_dir / f"{prefix}_timeSyncMap.csv", "w") as f:
+        f.write("TE0,TE1,TL0,TL1,LC0,LC1,LM0,LM1,TimeSyncsReceived,EmotiBitStartTime, EmotiBitEndTime, DataParserVersion\n")
+        f.write(f"{te[i0]:.6f},{te[i1]:.6f},{unix[i0]:.6f},{unix[i1]:.6f},{lsl[i0]:.6f},{lsl[i1]:.6f},"
+                f"{lsl[i0]:.6f},{lsl[i1]:.6f},{ex.size},{te0:.0f},{te0 + duration_sec * scale:.0f},synthetic\n")
+    with open(session_dir / f"{prefix}.json", "w") as f:
+        json.dump(streams, f, indent=1)
+    return total
+
+
+def synthetic_study(root, duration_sec=600, devices=3, tags=DEFAULT_TAGS, seed=0, rates=None):
+    """synthetic_session for subject1..subjectN under root; returns {name: folder}."""
+    sessions = {}
+    for i in range(devices):
+        path = Path(root) / f"subject{i + 1}"
+        synthetic_session(path, duration_sec, tags, seed + i, rates=rates)
+        sessions[path.name] = str(path)
+    return sessions
+
+
+def _processing_modules():
+    """combine_ppg_and_markers and utils_emotibit from EmotiBitProcessing.
+
+    combine imports utils_emotibit as a sibling, so the folder is on sys.path
+    only while they are imported.
+    """
+    saved = list(sys.path)
+    sys.path.insert(0, str(ROOT / "EmotiBitProcessing"))
+    try:
+        import combine_ppg_and_markers
+        import utils_emotibit
+    finally:
+        sys.path[:] = saved
+    return combine_ppg_and_markers, utils_emotibit
+
+
+def _stages(sessions, tags, work_dir):
+    """{stage: (callable, samples processed)} for the generated sessions."""
+    from . import cache, dsp, hrv, pipeline
+
+    combine_ppg_and_markers, utils_emotibit = _processing_modules()
+
+    rows = {s: {t: cache.load_channel(d, t)[t].size for t in tags} for s, d in sessions.items()}
+    total = sum(sum(r.values()) for r in rows.values())
+    ppg = [t for t in tags if t in PPG_TAGS]
+    ppg_arrays = [(np.asarray(cache.load_channel(d, t)[t], dtype=float), nominal_rate(d, t))
+                  for d in sessions.values() for t in ppg]
+    lm_paths = [Path(d) / f"{s}_LM.csv" for s, d in sessions.items()]
+    lm_rows = sum(sum(1 for _ in open(p)) - 1 for p in lm_paths)
+
+    def cache_build():
+        for d in sessions.values():
+            for t in tags:
+                cache.load_channel(d, t, refresh=True)
+
+    def cache_load():
+        for d in sessions.values():
+            for t in tags:
+                np.asarray(cache.load_channel(d, t)[t]).sum()
+
+    def bandpass():
+        for x, fs in ppg_arrays:
+            dsp.bandpass_filter(x, fs)
+
+    def run_pipeline():
+        pipeline.run(tags, sessions)
+
+    def parse_lm():
+        for p in lm_paths:
+            utils_emotibit.parse_lm_file(p)
+
+    def combine():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for d in sessions.values():
+                combine_ppg_and_markers.process_subject(d, work_dir)
+
+    def beats():
+        results = pipeline.run(ppg, sessions)
+        for site in sessions:
+            hrv.site_beats(results, site)
+
+    ppg_rows = sum(rows[s][t] for s in sessions for t in ppg)
+    stages = {
+        "cache_build": (cache_build, total),
+        "cache_load": (cache_load, total),
+        "pipeline": (run_pipeline, total),
+        "parse_lm": (parse_lm, lm_rows),
+    }
+    if ppg:
+        stages["bandpass"] = (bandpass, ppg_rows)
+        stages["hrv"] = (beats, ppg_rows)
+    if set(PPG_TAGS) <= set(ppg):
+        stages["combine"] = (combine, ppg_rows + lm_rows)
+    return stages
+
+
+def measure(fn, samples, repeat=3):
+    """Best wall time of repeat runs, then the traced peak of one more."""
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "samples": int(samples),
+            "samples_per_sec": samples / best if best > 0 else np.inf, "peak_mb": peak / 2**20}
+
+
+def environment():
+    import pandas
+    import scipy
+    return {"host": platform.node(), "python": platform.python_version(), "numpy": np.__version__,
+            "scipy": scipy.__version__, "pandas": pandas.__version__}
+
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"runs": []}
+
+
+def compare(run, history, threshold, baseline_runs=BASELINE_RUNS):
+    """
+    Regressions of run against the median of the last matching runs in history.
+
+    A matching run has the same config and host. Returns a list of
+    (stage, metric, baseline, current) that are worse than threshold.
+    """
+    past = [r for r in history["runs"]
+            if r["config"] == run["config"] and r["env"]["host"] == run["env"]["host"]][-baseline_runs:]
+    regressions = []
+    for stage, m in run["stages"].items():
+        rates = [r["stages"][stage]["samples_per_sec"] for r in past if stage in r["stages"]]
+        peaks = [r["stages"][stage]["peak_mb"] for r in past if stage in r["stages"]]
+        if rates and m["samples_per_sec"] < np.median(rates) * (1 - threshold):
+            regressions.append((stage, "samples_per_sec", float(np.median(rates)), m["samples_per_sec"]))
+        if peaks and m["peak_mb"] > np.median(peaks) * (1 + threshold) + 1:   # 1 MB slack for tiny stages
+            regressions.append((stage, "peak_mb", float(np.median(peaks)), m["peak_mb"]))
+    return regressions
+
+
+def run_benchmark(duration_sec=600, devices=3, tags=DEFAULT_TAGS, seed=0, repeat=3, stages=None,
+                  rates=None):
+    """Generate a study in a temporary folder and measure every stage: one history entry."""
+    rates = session_rates(tags) if rates is None else rates
+    work = Path(tempfile.mkdtemp(prefix="emotibit_bench_"))
+    try:
+        t0 = time.perf_counter()
+        sessions = synthetic_study(work / "data", duration_sec, devices, tags, seed, rates)
+        generated = time.perf_counter() - t0
+        (work / "out").mkdir()
+        available = _stages(sessions, list(tags), work / "out")
+        results = {}
+        for name, (fn, samples) in available.items():
+            if stages and name not in stages:
+                continue
+            results[name] = measure(fn, samples, repeat)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {"duration_sec": duration_sec, "devices": devices, "tags": list(tags), "seed": seed,
+                   "rates": rates},
+        "env": environment(),
+        "generate_sec": generated,
+        "stages": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the processing stages on synthetic sessions.")
+    parser.add_argument("--duration", type=float, default=600, help="seconds per session")
+    parser.add_argument("--devices", type=int, default=3)
+    parser.add_argument("--tags", nargs="+", default=list(DEFAULT_TAGS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rates-from", type=Path, default=RATE_SESSION, metavar="SESSION",
+                        help="recorded session whose channel rates are used (default: the Wrist site)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--stages", nargs="+", help="only these stages")
+    parser.add_argument("--history", type=Path, default=Path(HISTORY_FILE))
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative slowdown / memory growth (default 0.2)")
+    parser.add_argument("--no-record", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    unknown = [t for t in args.tags if t not in CHANNELS]
+    if unknown:
+        parser.error(f"unknown tags: {', '.join(unknown)}")
+
+    rates = session_rates(args.tags, args.rates_from)
+    run = run_benchmark(args.duration, args.devices, args.tags, args.seed, args.repeat, args.stages, rates)
+    history = load_history(args.history)
+    regressions = compare(run, history, args.threshold)
+
+    print(f"{args.devices} x {args.duration:.0f} s synthetic sessions "
+          f"({', '.join(f'{t} {r:g} Hz' if r else t for t, r in rates.items())}), "
+          f"generated in {run['generate_sec']:.1f} s")
+    for name, m in run["stages"].items():
+        print(f"  {name:12s} {m['seconds'] * 1000:9.1f} ms  {m['samples_per_sec'] / 1e6:8.2f} M samples/s  "
+              f"peak {m['peak_mb']:7.1f} MB")
+    if not args.no_record:
+        history["runs"].append(run)
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for stage, metric, base, cur in regressions:
+            print(f"  {stage} {metric}: {base:.4g} -> {cur:.4g}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Columnar on-disk cache for the per-tag CSVs of a session directory.
+
+The first load of <session>/<prefix>_<TAG>.csv tokenizes the CSV once and
+stores every column as its own .npy file under <session>/.emotibit_cache/<TAG>/.
+Later loads memory-map those files instead of re-parsing text. An entry is
+rebuilt when the source file's size/mtime change and its content hash no
+longer matches. The CSV is tokenized in blocks of CHUNK_ROWS rows appended
+to the .npy files, so building an entry of an overnight recording takes no
+more memory than a short one.
+"""
+import hashlib
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from . import catalog
+from .trace import span
+
+CACHE_DIR = ".emotibit_cache"
+CACHE_VERSION = 1
+
+TIME_COLUMNS = ("LocalTimestamp", "EmotiBitTimestamp")
+COUNTER_COLUMNS = ("PacketNumber", "DataLength", "DataReliability")
+CHUNK_ROWS = 1 << 18
+
+
+def session_prefix(session_dir):
+    """File prefix of a session ("first" for first.json, "subject1" for subject1.json).
+
+    Folders without the JSON (e.g. subject3) fall back to the prefix their
+    <prefix>_<TypeTag>.csv files share.
+    """
+    record = catalog.lookup(session_dir)
+    if record is not None:
+        return record["prefix"]
+    json_files = sorted(Path(session_dir).glob("*.json"))
+    if json_files:
+        return json_files[0].stem
+    found = catalog.session_files(session_dir) if Path(session_dir).is_dir() else None
+    if found is None:
+        raise FileNotFoundError(f"No session .json file in {session_dir}")
+    return found[0]
+
+
+def channel_path(session_dir, tag):
+    """Path of the DataParser CSV holding one TypeTag of a session."""
+    session_dir = Path(session_dir)
+    return session_dir / f"{session_prefix(session_dir)}_{tag}.csv"
+
+
+def _file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _fingerprint(path):
+    st = Path(path).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class NpyWriter:
+    """
+    A 1-D .npy file written by appending blocks; the length goes into the
+    header on close. Readable with np.load (mmap_mode too) like np.save output.
+    """
+    HEADER_LEN = 128   # what np.save uses for 1-D arrays
+
+    def __init__(self, path, dtype):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._f = open(self.path, "wb")
+        self._f.write(b" " * self.HEADER_LEN)
+
+    def append(self, block):
+        block = np.ascontiguousarray(block, dtype=self.dtype)
+        self._f.write(block.tobytes())
+        self.size += block.size
+
+    def close(self):
+        header = repr({"descr": np.lib.format.dtype_to_descr(self.dtype),
+                       "fortran_order": False, "shape": (self.size,)}).encode("latin1")
+        magic = b"\x93NUMPY\x01\x00"
+        pad = self.HEADER_LEN - len(magic) - 2 - len(header) - 1
+        self._f.seek(0)
+        self._f.write(magic + struct.pack("<H", len(header) + pad + 1) + header + b" " * pad + b"\n")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _csv_chunks(path, tag, chunk_rows=CHUNK_ROWS):
+    """Tokenize one DataParser CSV into typed column arrays, chunk_rows rows at a time.
+
+    Only the cached columns are parsed (TypeTag, ProtocolVersion and the
+    LSL columns are skipped).
+    """
+    import pandas as pd
+
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+    wanted = set(TIME_COLUMNS + COUNTER_COLUMNS + (tag,))
+    usecols = [c for c in header if c in wanted]
+    for df in pd.read_csv(path, chunksize=chunk_rows, usecols=usecols):
+        cols = {}
+        for c in TIME_COLUMNS:
+            if c in df.columns:
+                cols[c] = pd.to_numeric(df[c], errors="coerce").to_numpy(np.float64)
+        for c in COUNTER_COLUMNS:
+            if c in df.columns:
+                cols[c] = pd.to_numeric(df[c], errors="coerce").fillna(-1).to_numpy(np.int32)
+        if tag in df.columns:
+            cols[tag] = pd.to_numeric(df[tag], errors="coerce").to_numpy(np.float32)
+        yield cols
+
+
+def _read_manifest(entry):
+    try:
+        with open(entry / "manifest.json") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == CACHE_VERSION else None
+
+
+def _write_entry(entry, chunks, manifest):
+    """Stream column chunks into <name>.npy files; returns the column names."""
+    entry.mkdir(parents=True, exist_ok=True)
+    # the manifest is written last, so a half-written entry is never trusted
+    (entry / "manifest.json").unlink(missing_ok=True)
+    writers = {}
+    try:
+        for cols in chunks:
+            for name, arr in cols.items():
+                if name not in writers:
+                    writers[name] = NpyWriter(entry / f"{name}.npy", arr.dtype)
+                writers[name].append(arr)
+    finally:
+        for w in writers.values():
+            w.close()
+    manifest["columns"] = list(writers)
+    with open(entry / "manifest.json", "w") as f:
+        json.dump(manifest, f)
+    return manifest["columns"]
+
+
+def _load_entry(entry, manifest, columns=None):
+    names = [c for c in manifest["columns"] if columns is None or c in columns]
+    return {name: np.load(entry / f"{name}.npy", mmap_mode="r") for name in names}
+
+
+def load_channel(session_dir, tag, refresh=False, columns=None):
+    """
+    Load one TypeTag of a session as {column: array} through the columnar cache.
+
+    Timestamps are float64, PacketNumber/DataLength/DataReliability int32 and
+    the value column float32. Cached arrays are read-only memory maps; with
+    columns only those (of the ones present) are opened.
+    """
+    session_dir = Path(session_dir)
+    src = channel_path(session_dir, tag)
+    entry = session_dir / CACHE_DIR / tag
+    fingerprint = _fingerprint(src)
+
+    manifest = None if refresh else _read_manifest(entry)
+    if manifest is not None:
+        if manifest["source"] == fingerprint:
+            return _load_entry(entry, manifest, columns)
+        # touched but not modified: keep the arrays, refresh the fingerprint
+        digest = _file_hash(src)
+        if manifest["blake2b"] == digest:
+            manifest["source"] = fingerprint
+            with open(entry / "manifest.json", "w") as f:
+                json.dump(manifest, f)
+            return _load_entry(entry, manifest, columns)
+    else:
+        digest = _file_hash(src)
+
+    with span("cache.build", session=str(session_dir), tag=tag) as s:
+        names = _write_entry(entry, _csv_chunks(src, tag), {
+            "version": CACHE_VERSION,
+            "source": fingerprint,
+            "blake2b": digest,
+        })
+        data = _load_entry(entry, {"columns": names})
+        s.note(rows=len(data[names[0]]) if names else 0)
+    return {c: a for c, a in data.items() if columns is None or c in columns}
+
+
+def load_session(session_dir, tags, refresh=False):
+    """Load several TypeTags of one session: {tag: {column: array}}."""
+    return {tag: load_channel(session_dir, tag, refresh=refresh) for tag in tags}
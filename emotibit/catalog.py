@@ -0,0 +1,301 @@
+"""
+Catalog of every session under an archive root, kept in one JSON file.
+
+A session is a folder holding <prefix>_<TAG>.csv files, normally next to
+<prefix>.json. Indexing reads each session's JSON once (device, firmware,
+nominal_srate per typeTag) and the first and last line of each CSV
+(time span, where the data starts, row count), and stores it all in
+<root>/.emotibit_catalog.json. Re-indexing only re-reads files whose
+size or mtime changed and drops sessions that disappeared.
+
+    catalog = build("."); catalog.find(site="Wrist", tag="PI")
+    catalog.rate("Wrist-258", "EA")     # 15.0, without opening first.json
+
+    python -m emotibit.catalog            # index the current directory and list it
+    python -m emotibit.catalog --site Finger --tag PI
+
+channels.nominal_rate and cache.session_prefix look sessions up here first
+when <cwd>/.emotibit_catalog.json exists, falling back to the session's
+JSON and a glob.
+"""
+import argparse
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+CATALOG_FILE = ".emotibit_catalog.json"
+CATALOG_VERSION = 1
+# the <TypeTag> suffix of a <prefix>_<TypeTag>.csv channel file
+TYPE_TAG = re.compile(r"^[A-Z][A-Z0-9%]$")
+
+_SKIP_DIRS = {"__pycache__", "output"}
+_SITE_DIR = re.compile(r"^(?P<site>[A-Za-z]+)-(?P<device>\d+)$")
+_SUBJECT_DIR = re.compile(r"^subject\d+$", re.IGNORECASE)
+# <prefix>.json fields copied into the catalog
+_DEVICE_FIELDS = ("device_id", "hardware_version", "firmware_version", "firmware_variant", "created_at")
+# the plot scripts call the Arms-228 folder "Arm"
+_SITE_NAMES = {"Arms": "Arm"}
+
+
+def _stat(path):
+    st = os.stat(path)
+    return {"bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _csv_span(path):
+    """Where data starts, number of data rows, and first/last LocalTimestamp of a CSV."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_offset = f.tell()
+        first = f.readline()
+        f.seek(data_offset)
+        rows, last_byte = 0, b"\n"
+        for block in iter(lambda: f.read(1 << 20), b""):
+            rows += block.count(b"\n")
+            last_byte = block[-1:]
+        rows += last_byte != b"\n"        # no newline after the last row
+        # the last line is within the final few hundred bytes
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(data_offset, size - 4096))
+        lines = f.read().splitlines()
+    last = lines[-1] if lines else b""
+
+    def t(line):
+        try:
+            return float(line.split(b",", 1)[0])
+        except ValueError:
+            return None
+
+    return {"data_offset": data_offset, "rows": rows,
+            "columns": header.decode(errors="replace").strip().split(","),
+            "start": t(first) if first else None, "end": t(last) if last else None}
+
+
+def _streams(json_path):
+    """(device info, {tag: nominal_srate or None}) of a session JSON."""
+    with open(json_path) as f:
+        streams = json.load(f)
+    device, rates = {}, {}
+    for stream in streams:
+        info = stream.get("info", {})
+        for key in _DEVICE_FIELDS:
+            if key in info and key not in device:
+                device[key] = info[key]
+        for tag in info.get("typeTags", []):
+            rates[tag] = float(info["nominal_srate"]) if info.get("nominal_srate") else None
+    return device, rates
+
+
+def session_files(directory):
+    """(prefix, {suffix: filename}) of a session folder, or None if it is not one."""
+    names = [e.name for e in os.scandir(directory) if e.is_file()]
+    jsons = sorted(n[:-5] for n in names if n.endswith(".json"))
+    csvs = [n for n in names if n.endswith(".csv")]
+    prefixes = [p for p in jsons if any(n.startswith(p + "_") for n in csvs)]
+    if not prefixes:
+        # folders written without the JSON (e.g. subject3): the prefix shared
+        # by CSVs named like <prefix>_<TypeTag>.csv
+        stems = {n[:-4].rsplit("_", 1)[0] for n in csvs
+                 if "_" in n and TYPE_TAG.match(n[:-4].rsplit("_", 1)[1])}
+        if len(stems) != 1:
+            return None
+        prefixes = list(stems)
+    prefix = prefixes[0]
+    files = {n[len(prefix) + 1:-4]: n for n in csvs if n.startswith(prefix + "_")}
+    return prefix, files
+
+
+def _describe(directory, name):
+    """Where a session sits: site, device number and subject from its folder name."""
+    m = _SITE_DIR.match(directory.name)
+    site = _SITE_NAMES.get(m["site"], m["site"]) if m else None
+    subject = next((p for p in reversed(Path(name).parts) if _SUBJECT_DIR.match(p)), None)
+    return {"site": site, "device_number": m["device"] if m else None, "subject": subject}
+
+
+def _index_session(root, directory, previous=None):
+    """Catalog record of one session, re-reading only files changed since previous."""
+    found = session_files(directory)
+    if found is None:
+        return None
+    prefix, files = found
+    name = directory.relative_to(root).as_posix()
+    previous = previous if previous and previous.get("prefix") == prefix else {}
+    record = {"name": name, "prefix": prefix, **_describe(directory, name)}
+
+    json_path = directory / f"{prefix}.json"
+    if json_path.exists():
+        stat = _stat(json_path)
+        if previous.get("json") == stat:
+            record.update(json=stat, device=previous["device"], rates=previous["rates"])
+        else:
+            device, rates = _streams(json_path)
+            record.update(json=stat, device=device, rates=rates)
+    else:
+        record.update(json=None, device={}, rates={})
+
+    old_files = previous.get("files", {})
+    record["files"] = {}
+    for suffix, filename in sorted(files.items()):
+        stat = _stat(directory / filename)
+        old = old_files.get(suffix)
+        if old and all(old[k] == stat[k] for k in stat):
+            record["files"][suffix] = old
+        else:
+            record["files"][suffix] = {**stat, **_csv_span(directory / filename)}
+
+    # data channels only (not the sync files), all files when there is no JSON
+    spans = [(f["start"], f["end"]) for s, f in record["files"].items()
+             if (s in record["rates"] or not record["rates"])
+             and f["start"] is not None and f["end"] is not None]
+    record["start"] = min((a for a, _ in spans), default=None)
+    record["end"] = max((b for _, b in spans), default=None)
+    record["duration"] = record["end"] - record["start"] if spans else None
+    return record
+
+
+def _walk(root):
+    for path, dirs, _ in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in _SKIP_DIRS)
+        yield Path(path)
+
+
+class Catalog:
+    """Session records by name (folder path relative to root), with lookups."""
+
+    def __init__(self, root, sessions):
+        self.root = Path(root)
+        self.sessions = sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions.values())
+
+    def path(self, name):
+        return self.root / name
+
+    def find(self, site=None, subject=None, device=None, tag=None):
+        """Records matching every given field; tag matches sessions that have that CSV."""
+        out = []
+        for r in self:
+            if site is not None and r["site"] != site:
+                continue
+            if subject is not None and r["subject"] != subject:
+                continue
+            if device is not None and device not in (r["device"].get("device_id"), r["device_number"]):
+                continue
+            if tag is not None and tag not in r["files"]:
+                continue
+            out.append(r)
+        return out
+
+    def record(self, session_dir):
+        """Record of a session folder given by any path to it; None if not cataloged."""
+        try:
+            name = Path(session_dir).resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return None
+        return self.sessions.get(name)
+
+    def rate(self, session_dir, tag):
+        """nominal_srate of tag in a session, None if the session JSON gives none."""
+        r = self.record(session_dir)
+        return r["rates"].get(tag) if r else None
+
+    def save(self):
+        with open(self.root / CATALOG_FILE, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "sessions": self.sessions}, f, separators=(",", ":"))
+
+
+def load(root="."):
+    """The saved catalog of root, or None if there is none (or it is outdated)."""
+    try:
+        with open(Path(root) / CATALOG_FILE) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("version") != CATALOG_VERSION:
+        return None
+    return Catalog(root, saved["sessions"])
+
+
+def build(root=".", rebuild=False):
+    """Index every session under root, reusing unchanged records, and save the catalog."""
+    root = Path(root)
+    old = None if rebuild else load(root)
+    previous = old.sessions if old else {}
+    sessions = {}
+    for directory in _walk(root):
+        name = directory.relative_to(root).as_posix()
+        record = _index_session(root, directory, previous.get(name))
+        if record is not None:
+            sessions[name] = record
+    catalog = Catalog(root, sessions)
+    catalog.save()
+    _load_current.cache_clear()
+    return catalog
+
+
+@lru_cache(maxsize=4)
+def _load_current(root, mtime_ns):
+    return load(root)
+
+
+def _current():
+    """Catalog of the current directory, re-read after a chdir or a rebuild."""
+    root = Path.cwd()
+    try:
+        mtime_ns = (root / CATALOG_FILE).stat().st_mtime_ns
+    except OSError:
+        return None
+    return _load_current(str(root), mtime_ns)
+
+
+def lookup(session_dir):
+    """
+    Catalog record of session_dir from <cwd>/.emotibit_catalog.json, or None.
+
+    The record is only trusted while the session JSON has the cataloged
+    size and mtime, so editing a session never serves stale rates.
+    """
+    catalog = _current()
+    if catalog is None:
+        return None
+    record = catalog.record(session_dir)
+    if record is None or record["json"] is None:
+        return None
+    try:
+        if _stat(Path(session_dir) / f"{record['prefix']}.json") != record["json"]:
+            return None
+    except OSError:
+        return None
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index EmotiBit sessions and query the catalog.")
+    parser.add_argument("root", nargs="?", default=".", help="archive root (default: .)")
+    parser.add_argument("--rebuild", action="store_true", help="re-read every file")
+    parser.add_argument("--site")
+    parser.add_argument("--subject")
+    parser.add_argument("--device", help="device_id or folder device number")
+    parser.add_argument("--tag", help="sessions with this TypeTag")
+    args = parser.parse_args(argv)
+
+    catalog = build(args.root, args.rebuild)
+    for r in catalog.find(args.site, args.subject, args.device, args.tag):
+        who = r["site"] or r["subject"] or "-"
+        duration = f"{r['duration']:.0f} s" if r["duration"] is not None else "?"
+        rate = f", {args.tag} {r['rates'].get(args.tag)} Hz" if args.tag else ""
+        print(f"{r['name']}: {who}, {r['device'].get('device_id', '?')} "
+              f"fw {r['device'].get('firmware_version', '?')}, {duration}, "
+              f"{len(r['files'])} files{rate}")
+    print(f"{len(catalog)} sessions in {Path(args.root) / CATALOG_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Channel registry: what each TypeTag is, how it is filtered and at what rate.
+
+Rates come from each session's <prefix>.json (nominal_srate per typeTag),
+through the archive catalog when one has been built (see catalog.py); the
+fs stored here is only the fallback for tags the JSON leaves empty and for
+sessions recorded without the JSON.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from . import catalog
+from .cache import session_prefix
+
+SKIP_SEC = 2   # ignore the first seconds of every recording
+
+SITES = {
+    "Finger": "Finger-099",
+    "Wrist": "Wrist-258",
+    "Arm": "Arms-228",
+}
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    btype: str      # "band" or "low"
+    cutoff: tuple   # (low, high) for "band", (cutoff,) for "low"
+    order: int = 3
+
+
+@dataclass(frozen=True)
+class Channel:
+    tag: str
+    title: str
+    ylabel: str
+    fs: float = None
+    filter: FilterSpec = None
+    snr_kernel: int = 5
+    uniform: bool = True   # False for channels emitted per detected event
+
+
+PPG_FILTER = FilterSpec("band", (0.5, 5))
+
+CHANNELS = {c.tag: c for c in [
+    Channel("PI", "PPG Red (PI)", "Normalized Signal (a.u.)", 100, PPG_FILTER),
+    Channel("PG", "PPG Green (PG)", "Normalized Signal (a.u.)", 100, PPG_FILTER),
+    Channel("PR", "PPG Infrared (PR)", "Normalized Signal (a.u.)", 100, PPG_FILTER),
+    Channel("EA", "Electrodermal Activity (EDA)", "Normalized Conductance (a.u.)", 15,
+            FilterSpec("band", (0.05, 2)), snr_kernel=10),
+    Channel("T1", "Skin Temperature (T1)", "Normalized Temperature (a.u.)", 7.5,
+            FilterSpec("low", (0.5,))),
+    Channel("HR", "Heart Rate (HR, bpm)", "HR (bpm)", uniform=False),
+    Channel("SA", "SCR Amplitude", "SCR Amplitude (µS)", 15, uniform=False),
+    Channel("SF", "SCR Frequency", "SCR Frequency (count/min)", 3, uniform=False),
+    Channel("SR", "SCR Rise Time", "SCR Rise Time (s)", 3, uniform=False),
+    Channel("AX", "Accelerometer X (AX)", "Acceleration (g)", 25),
+    Channel("AY", "Accelerometer Y (AY)", "Acceleration (g)", 25),
+    Channel("AZ", "Accelerometer Z (AZ)", "Acceleration (g)", 25),
+    Channel("GX", "Gyroscope X (GX)", "Angular Rate (°/s)", 25),
+    Channel("GY", "Gyroscope Y (GY)", "Angular Rate (°/s)", 25),
+    Channel("GZ", "Gyroscope Z (GZ)", "Angular Rate (°/s)", 25),
+    Channel("MX", "Magnetometer X (MX)", "Magnetic Field (a.u.)", 25),
+    Channel("MY", "Magnetometer Y (MY)", "Magnetic Field (a.u.)", 25),
+    Channel("MZ", "Magnetometer Z (MZ)", "Magnetic Field (a.u.)", 25),
+]}
+
+PPG_TAGS = ("PI", "PG", "PR")
+IMU_TAGS = ("AX", "AY", "AZ", "GX", "GY", "GZ", "MX", "MY", "MZ")
+SCR_TAGS = ("SA", "SF", "SR")
+
+
+@lru_cache(maxsize=None)
+def _nominal_rates(session_dir):
+    path = Path(session_dir) / f"{session_prefix(session_dir)}.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        streams = json.load(f)
+    rates = {}
+    for stream in streams:
+        info = stream.get("info", {})
+        if info.get("nominal_srate"):
+            for tag in info.get("typeTags", []):
+                rates[tag] = float(info["nominal_srate"])
+    return rates
+
+
+def nominal_rate(session_dir, tag):
+    """Sampling rate of tag in a session: first.json first, registry fallback."""
+    record = catalog.lookup(session_dir)
+    rate = record["rates"].get(tag) if record else _nominal_rates(str(session_dir)).get(tag)
+    if rate is None and tag in CHANNELS:
+        rate = CHANNELS[tag].fs
+    return rate
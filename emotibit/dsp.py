@@ -0,0 +1,117 @@
+"""Filtering, normalization and window helpers shared by every channel."""
+from functools import lru_cache
+
+import numpy as np
+
+from .trace import span
+
+
+@lru_cache(maxsize=64)
+def design_sos(btype, fs, cutoff, order):
+    """Butterworth design in second-order sections, cached per (btype, fs, cutoff, order).
+
+    SOS form stays stable for very low normalized cutoffs such as the
+    0.05 Hz EDA band at 15 Hz, where (b, a) coefficients lose precision.
+    """
+    from scipy.signal import butter
+
+    nyquist = 0.5 * fs
+    wn = [c / nyquist for c in cutoff]
+    return butter(order, wn if len(wn) > 1 else wn[0], btype=btype, output="sos")
+
+
+def _filtfilt(sos, signal):
+    from scipy.signal import sosfiltfilt
+
+    return sosfiltfilt(sos, signal, axis=-1)
+
+
+def bandpass_filter(signal, fs=100, low=0.5, high=5, order=3):
+    return _filtfilt(design_sos("band", fs, (low, high), order), signal)
+
+
+def lowpass_filter(signal, fs=7.5, cutoff=0.5, order=3):
+    return _filtfilt(design_sos("low", fs, (cutoff,), order), signal)
+
+
+def apply_filter(signal, fs, spec):
+    """Zero-phase filter signal (1-D, or 2-D with one row per signal) per a FilterSpec."""
+    sos = design_sos(spec.btype, float(fs), tuple(spec.cutoff), spec.order)
+    return _filtfilt(sos, signal)
+
+
+def filter_many(signals, fs, spec):
+    """
+    Detrend and filter a list of 1-D signals that share fs and spec.
+
+    Signals of equal length are stacked into one 2-D array and filtered in a
+    single call (e.g. PI/PG/PR of a site, which share their packets).
+    Signals of different lengths are not padded into the same call:
+    sosfiltfilt's edge handling (odd extension and initial conditions at
+    each end) would see the padding, and the results would change near the
+    ends. Sites recorded for different lengths therefore cost one call each.
+    Returns the filtered signals in input order.
+    """
+    from scipy.signal import detrend
+
+    out = [None] * len(signals)
+    by_length = {}
+    for i, sig in enumerate(signals):
+        by_length.setdefault(len(sig), []).append(i)
+    for idx in by_length.values():
+        with span("dsp.detrend", rows=len(idx) * len(signals[idx[0]])):
+            stacked = detrend(np.stack([signals[i] for i in idx]), axis=-1)
+        with span("dsp.filtfilt", rows=stacked.size, fs=fs, band=list(spec.cutoff)):
+            filtered = apply_filter(stacked, fs, spec)
+        for row, i in zip(filtered, idx):
+            out[i] = row
+    return out
+
+
+def moving_average(sig, kernel):
+    """np.convolve(sig, ones(kernel)/kernel, mode="same"), from one cumulative sum."""
+    n = len(sig)
+    c = np.concatenate(([0.0], np.cumsum(sig, dtype=np.float64)))
+    i = np.arange(n)
+    hi = np.minimum(i + (kernel - 1) // 2 + 1, n)
+    lo = np.maximum(i - kernel // 2, 0)
+    return (c[hi] - c[lo]) / kernel
+
+
+def compute_snr(sig, kernel=5):
+    """SNR (dB) of sig against its residual from a moving-average baseline.
+
+    See quality.py for the same measure per window.
+    """
+    power_signal = np.mean(sig**2)
+    noise = sig - moving_average(sig, kernel)
+    power_noise = np.mean(noise**2)
+    return 10 * np.log10(power_signal / power_noise) if power_noise > 0 else -np.inf
+
+
+def zscore(x):
+    m, s = np.mean(x), np.std(x)
+    if s == 0 or not np.isfinite(s):
+        return x - m
+    return (x - m) / s
+
+
+def trim_start(ts, sig, skip_sec):
+    """Make ts relative to its first sample and drop the first skip_sec seconds."""
+    ts = ts - ts[0]
+    keep = ts >= skip_sec
+    return ts[keep], sig[keep]
+
+
+def common_window(time_axes):
+    """Overlapping (start, end) of several time axes."""
+    start = max(ts[0] for ts in time_axes)
+    end = min(ts[-1] for ts in time_axes)
+    return start, end
+
+
+def crop(ts, sig, start, end):
+    """Samples with start <= ts <= end, as views (ts must be sorted)."""
+    i0 = np.searchsorted(ts, start, side="left")
+    i1 = np.searchsorted(ts, end, side="right")
+    return ts[i0:i1], sig[i0:i1]
@@ -0,0 +1,179 @@
+"""
+Event-related epochs: every channel sliced around LSL markers in one step.
+
+    ep = epochs("subject1", ["PI", "EA"], labels=["sync"], pre=0.5, post=1.0)
+    ep.data.shape                 # (channels, epochs, samples)
+    ep.channel("PI").mean(axis=0) # marker-locked average
+
+Marker onsets are the EmotiBitTimestamp of each LM packet, mapped onto the
+same clock as the channels (see sync.py), so markers and samples share one
+timeline without joining tables (sessions without time-sync information
+fall back to the LocalTimestamp of both, with a warning). All epochs of a
+channel come from one AlignmentIndex over the (epochs x samples) grid of
+onset + relative time: one searchsorted call, whatever the number of
+markers. Grid points outside the recording or inside a gap are NaN.
+
+epoch_arrays does the same for arrays already on a common clock, e.g. the
+combined PPG and cleaned LM tables of EmotiBitProcessing:
+
+    ppg = pd.read_csv("output/subject1_PPG_combined.csv")
+    lm = pd.read_csv("output/subject1_LM_cleaned.csv")
+    ep = epoch_arrays(ppg["LslMarkerSourceTimestamp"], {t: ppg[t] for t in PPG_TAGS},
+                      lm["LslMarkerSourceTimestamp"], pre=0.5, post=1.0, fs=100)
+"""
+import argparse
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from .align import AlignmentIndex, is_event_channel
+from .cache import channel_path, load_channel
+from .channels import CHANNELS, nominal_rate
+from .dsp import filter_many, zscore
+from .pipeline import load_signal
+from .sync import CLOCKS, has_clock, read_marker_fields, to_clock
+
+
+@dataclass
+class Epochs:
+    """data[i, j] is channel tags[i] around marker j, sampled at times (s from onset)."""
+    times: np.ndarray
+    data: np.ndarray
+    tags: list
+    onsets: np.ndarray
+    labels: np.ndarray
+
+    def channel(self, tag):
+        """(epochs, samples) block of one channel."""
+        return self.data[self.tags.index(tag)]
+
+    def select(self, label):
+        """Epochs of one marker label only."""
+        keep = self.labels == label
+        return Epochs(self.times, self.data[:, keep], self.tags, self.onsets[keep], self.labels[keep])
+
+
+def read_markers(session_dir, time_column="EmotiBitTimestamp"):
+    """(time, LD label) of every LM packet of a session, in time order.
+
+    time is the EmotiBitTimestamp (ms) or the LocalTimestamp (s) of the packet.
+    """
+    t, values = read_marker_fields(channel_path(session_dir, "LM"), ["LD"], time_column)
+    order = np.argsort(t, kind="stable")
+    return t[order], values["LD"][order]
+
+
+def relative_times(pre, post, fs):
+    """Sample times of an epoch, from -pre to post (inclusive when it falls on the grid)."""
+    return np.arange(-int(round(pre * fs)), int(round(post * fs)) + 1) / fs
+
+
+def epoch_arrays(ts, channels, onsets, pre, post, fs, kind="linear", max_gap=None):
+    """
+    Slice each channel of channels ({name: values on ts}) around onsets.
+
+    Returns (times, {name: (epochs, samples) array}); kind is "linear" or
+    "hold" (for event channels), max_gap marks grid points in longer gaps
+    as NaN.
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    onsets = np.asarray(onsets, dtype=np.float64)
+    times = relative_times(pre, post, fs)
+    grid = (onsets[:, None] + times[None, :]).ravel()
+    index = AlignmentIndex(ts, grid, max_gap)
+    shape = (onsets.size, times.size)
+    return times, {name: index.apply(values, kind).reshape(shape) for name, values in channels.items()}
+
+
+def _channel(session_dir, tag, clock, processed):
+    """Timestamps on clock and values of one channel, filtered like pipeline.run if processed.
+
+    clock=None keeps the absolute LocalTimestamp, the time base of the markers
+    then. Returns (None, None) if the session has no such channel.
+    """
+    if not channel_path(session_dir, tag).exists():
+        return None, None
+    if clock is None:
+        data = load_channel(session_dir, tag, columns=("LocalTimestamp", tag))
+        if "LocalTimestamp" not in data or tag not in data:
+            return None, None
+        ts = np.asarray(data["LocalTimestamp"], dtype=float)
+        sig = np.asarray(data[tag], dtype=float)
+        keep = np.isfinite(ts) & np.isfinite(sig)
+        ts, sig = ts[keep], sig[keep]
+    else:
+        ts, sig = load_signal(session_dir, tag, 0, clock)
+    if sig is None or sig.size == 0:
+        return None, None
+    spec = CHANNELS[tag].filter if tag in CHANNELS else None
+    if processed and spec is not None:
+        sig = zscore(filter_many([sig], nominal_rate(session_dir, tag), spec)[0])
+    return ts, sig
+
+
+def epochs(session_dir, tags, labels=None, pre=1.0, post=2.0, fs=None, clock="local", processed=True):
+    """
+    Epochs of tags around the session's LM markers (those with an LD in labels, or all).
+
+    fs defaults to the highest nominal rate among the uniform channels; each
+    channel is interpolated (event channels held) onto onset + times. With
+    processed=True filtered channels are detrended, filtered and z-scored
+    over the whole recording first, as in pipeline.run. clock=None, or a
+    clock the session has no time-sync information for (with a warning),
+    puts markers and channels on their LocalTimestamp instead.
+    """
+    if clock is not None and not has_clock(session_dir, clock):
+        warnings.warn(f"No {clock} clock for {session_dir}; using LocalTimestamp", stacklevel=2)
+        clock = None
+    t, marker_labels = read_markers(session_dir, "LocalTimestamp" if clock is None else "EmotiBitTimestamp")
+    if labels is not None:
+        keep = np.isin(marker_labels, list(labels))
+        t, marker_labels = t[keep], marker_labels[keep]
+    onsets = t if clock is None else to_clock(session_dir, t, clock)
+    tags = list(tags)
+    if fs is None:
+        rates = [nominal_rate(session_dir, t) for t in tags if not is_event_channel(t)]
+        fs = max((r for r in rates if r), default=1.0)
+
+    times = relative_times(pre, post, fs)
+    data = np.full((len(tags), onsets.size, times.size), np.nan)
+    for i, tag in enumerate(tags):
+        ts, sig = _channel(session_dir, tag, clock, processed)
+        if ts is None:
+            continue
+        kind = "hold" if is_event_channel(tag) else "linear"
+        _, out = epoch_arrays(ts, {tag: sig}, onsets, pre, post, fs, kind)
+        data[i] = out[tag]
+    return Epochs(times, data, tags, onsets, marker_labels)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cut marker-locked epochs out of a session.")
+    parser.add_argument("session")
+    parser.add_argument("--tags", nargs="+", default=["PI", "PG", "PR", "EA", "T1"])
+    parser.add_argument("--labels", nargs="+", help="LD values to keep (default: all markers)")
+    parser.add_argument("--pre", type=float, default=1.0, help="seconds before each marker")
+    parser.add_argument("--post", type=float, default=2.0, help="seconds after each marker")
+    parser.add_argument("--fs", type=float, help="epoch sampling rate (default: highest channel rate)")
+    parser.add_argument("--clock", choices=[*CLOCKS, "none"], default="local",
+                        help="timeline of markers and channels (default local; none = LocalTimestamp)")
+    parser.add_argument("--save", metavar="NPZ", help="write times/data/tags/onsets/labels to an .npz")
+    args = parser.parse_args(argv)
+
+    clock = None if args.clock == "none" else args.clock
+    ep = epochs(args.session, args.tags, args.labels, args.pre, args.post, args.fs, clock)
+    print(f"{args.session}: {ep.onsets.size} epochs x {ep.times.size} samples, labels "
+          f"{', '.join(sorted(set(ep.labels))) or '-'}")
+    for tag in ep.tags:
+        block = ep.channel(tag)
+        complete = np.isfinite(block).all(axis=1).sum()
+        print(f"  {tag}: {complete}/{block.shape[0]} complete epochs")
+    if args.save:
+        np.savez(args.save, times=ep.times, data=ep.data, tags=np.array(ep.tags),
+                 onsets=ep.onsets, labels=ep.labels)
+        print(f"✅ Saved {args.save}")
+
+
+if __name__ == "__main__":
+    main()
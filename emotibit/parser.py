@@ -0,0 +1,189 @@
+"""
+Single-pass parser for the raw EmotiBit packet log (first.csv / subjectN.csv).
+
+Every line of the raw log is one packet:
+
+    EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability,payload...
+
+The file is read sequentially in large blocks and each numeric TypeTag is
+demultiplexed into NumPy arrays with the same columns the desktop DataParser
+writes to first_<TAG>.csv (everything except LocalTimestamp). All splitting
+and number parsing runs on the raw byte buffer, so no Python object is built
+per row.
+"""
+import warnings
+
+import numpy as np
+
+HEADER_FIELDS = 6           # EmotiBitTimestamp ... DataReliability
+BLOCK_SIZE = 16 * 1024 * 1024
+
+# tags whose payload is text (or mixed), never demultiplexed into arrays
+TEXT_TAGS = frozenset({"AK", "EM", "LM", "RB", "RD", "TL", "TX"})
+
+_NL, _CR, _COMMA, _SPACE, _ZERO = (ord(c) for c in "\n\r, 0")
+
+
+def _tag_code(tag):
+    return (ord(tag[0]) << 8) | ord(tag[1])
+
+
+def _tag_name(code):
+    return chr(code >> 8) + chr(code & 0xFF)
+
+
+def _iter_blocks(path, block_size):
+    """Yield uint8 arrays holding whole lines of path, read sequentially."""
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(block_size)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            cut = chunk.rfind(b"\n") + 1
+            tail = chunk[cut:]
+            if cut:
+                yield np.frombuffer(chunk[:cut], dtype=np.uint8)
+    if tail:
+        yield np.frombuffer(tail + b"\n", dtype=np.uint8)
+
+
+def _index_lines(buf):
+    """Locate every packet line in buf.
+
+    Returns (starts, ends, first_comma, n_fields, tag_codes) for lines with a
+    complete header; ends exclude the line terminator.
+    """
+    nl = np.flatnonzero(buf == _NL)
+    starts = np.concatenate(([0], nl[:-1] + 1))
+    ends = nl.copy()
+    cr = (ends > starts) & (buf[ends - 1] == _CR)
+    ends[cr] -= 1
+
+    commas = np.flatnonzero(buf == _COMMA)
+    first = np.searchsorted(commas, starts)
+    n_commas = np.searchsorted(commas, ends) - first
+
+    ok = n_commas >= HEADER_FIELDS - 1
+    starts, ends, first, n_commas = starts[ok], ends[ok], first[ok], n_commas[ok]
+
+    # TypeTag is the 4th field and always two characters wide
+    c2 = commas[first + 2]
+    ok = commas[first + 3] - c2 == 3
+    starts, ends, first, n_commas, c2 = starts[ok], ends[ok], first[ok], n_commas[ok], c2[ok]
+
+    codes = (buf[c2 + 1].astype(np.uint16) << 8) | buf[c2 + 2]
+    trailing = buf[ends - 1] == _COMMA
+    n_fields = n_commas + 1 - trailing
+    return starts, ends, c2, n_fields, codes
+
+
+def _parse_lines(buf, starts, ends, tag_comma, n_fields):
+    """Parse the selected lines of buf into one flat float64 array.
+
+    The lines are gathered into a single comma separated buffer (the TypeTag
+    is blanked to a 0 placeholder) and converted by NumPy's C tokenizer.
+    """
+    lengths = ends - starts + 1                      # keep one byte for the separator
+    offsets = np.cumsum(lengths) - lengths
+    idx = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    text = buf[idx]
+
+    sep = offsets + lengths - 1
+    text[sep] = _COMMA
+    text[sep[-1]] = _SPACE
+    # a trailing comma would be an empty field
+    trailing = text[np.maximum(sep - 1, 0)] == _COMMA
+    text[sep[trailing] - 1] = _SPACE
+    tag = tag_comma - starts + offsets
+    text[tag + 1] = _ZERO
+    text[tag + 2] = _SPACE
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(text.tobytes(), sep=",")
+        except (ValueError, DeprecationWarning) as e:
+            raise ValueError(f"Non-numeric payload: {e}") from None
+    if values.size != n_fields.sum():
+        raise ValueError("Non-numeric payload: field count mismatch")
+    return values
+
+
+def _expand_timestamps(ts, counts):
+    """Spread each packet's samples between the previous packet and its own time.
+
+    This mirrors the DataParser: the packet timestamp belongs to the last
+    sample and the first packet of a tag repeats its timestamp.
+    """
+    prev = np.concatenate((ts[:1], ts[:-1]))
+    step = (ts - prev) / np.maximum(counts, 1)
+    offsets = np.cumsum(counts) - counts
+    back = np.repeat(offsets + counts - 1, counts) - np.arange(counts.sum())
+    return np.repeat(ts, counts) - back * np.repeat(step, counts)
+
+
+def parse_raw_file(path, tags=None, dtype=np.float64, block_size=BLOCK_SIZE):
+    """
+    Demultiplex a raw EmotiBit packet log into per-TypeTag arrays.
+
+    Only the requested tags are materialized (all numeric tags by default).
+    Multi-sample packets (DataLength > 1) are expanded to one row per sample;
+    packets with DataLength 0 (e.g. ED) keep one row whose value is NaN, where
+    the DataParser CSV repeats the DataReliability field.
+    Returns {tag: {"EmotiBitTimestamp", "PacketNumber", "DataReliability", tag}},
+    with float64 timestamps, int32 counters and values of the given dtype.
+    """
+    wanted = None if tags is None else {_tag_code(t) for t in tags}
+    parts = {}
+
+    for buf in _iter_blocks(path, block_size):
+        starts, ends, tag_comma, n_fields, codes = _index_lines(buf)
+
+        for code in np.unique(codes):
+            code = int(code)
+            tag = _tag_name(code)
+            if tag in TEXT_TAGS or (wanted is not None and code not in wanted):
+                continue
+            sel = codes == code
+            try:
+                values = _parse_lines(buf, starts[sel], ends[sel], tag_comma[sel], n_fields[sel])
+            except ValueError as e:
+                raise ValueError(f"{path}: {tag}: {e}") from None
+
+            nf = n_fields[sel]
+            line_off = np.cumsum(nf) - nf
+            counts = nf - HEADER_FIELDS
+            # drop truncated packets whose payload doesn't match DataLength
+            keep = values[line_off + 2] == counts
+            line_off, counts = line_off[keep], counts[keep]
+
+            sample_off = np.cumsum(counts) - counts
+            payload = np.repeat(line_off + HEADER_FIELDS - sample_off, counts)
+            payload += np.arange(counts.sum())
+
+            # packets without samples keep one row, with a NaN value
+            rows = np.maximum(counts, 1)
+            vals = np.full(rows.sum(), np.nan)
+            at = np.repeat(np.cumsum(rows) - rows - sample_off, counts) + np.arange(counts.sum())
+            vals[at] = values[payload]
+
+            parts.setdefault(tag, []).append((
+                values[line_off],
+                values[line_off + 1],
+                values[line_off + 5],
+                rows,
+                vals,
+            ))
+
+    channels = {}
+    for tag, chunks in parts.items():
+        ts, pkt, rel, rows, vals = (np.concatenate(c) for c in zip(*chunks))
+        channels[tag] = {
+            "EmotiBitTimestamp": _expand_timestamps(ts, rows),
+            "PacketNumber": np.repeat(pkt, rows).astype(np.int32),
+            "DataReliability": np.repeat(rel, rows).astype(np.int32),
+            tag: vals.astype(dtype, copy=False),
+        }
+    return channels
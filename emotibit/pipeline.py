@@ -0,0 +1,120 @@
+"""
+Batch pipeline: load, trim, filter and score every channel of every site.
+
+    results = run(["PI", "PG", "PR", "EA", "T1"])
+    results["EA"]["Wrist"]  # {"ts", "signal", "fs", "snr"}
+
+Sites are put on one timeline through each device's clock model (see
+sync.py), so time 0 is the same instant for every site. Filters are
+designed once per (fs, band, order) and reused across sessions, and nothing
+here imports matplotlib, so many sessions can be processed from one
+interpreter. pandas and scipy are imported on first use, not with the
+module.
+"""
+import warnings
+
+import numpy as np
+
+from .cache import load_channel
+from .channels import CHANNELS, SITES, SKIP_SEC, nominal_rate
+from .dsp import compute_snr, filter_many, trim_start, zscore
+from .sync import has_clock, to_clock
+from .trace import span, traced
+
+
+def load_signal(session_dir, tag, skip_sec=SKIP_SEC, clock=None):
+    """Timestamps and values of one channel without its first skip_sec seconds.
+
+    Without clock, LocalTimestamp is made relative to the first sample. With
+    a clock (see sync.CLOCKS), EmotiBitTimestamp is mapped onto it and kept
+    absolute. Returns (None, None) if the needed columns are missing.
+    """
+    with span("pipeline.load", session=str(session_dir), tag=tag) as s:
+        time_column = "EmotiBitTimestamp" if clock else "LocalTimestamp"
+        data = load_channel(session_dir, tag, columns=(time_column, tag))
+        if time_column not in data or tag not in data:
+            return None, None
+        ts = np.asarray(data[time_column], dtype=float)
+        sig = np.asarray(data[tag], dtype=float)
+        s.note(rows=ts.size)
+        mask = np.isfinite(ts) & np.isfinite(sig)
+        ts, sig = ts[mask], sig[mask]
+        if ts.size == 0:
+            return ts, sig
+        if clock is None:
+            return trim_start(ts, sig, skip_sec)
+        ts = to_clock(session_dir, ts, clock)
+        keep = ts >= ts[0] + skip_sec
+        return ts[keep], sig[keep]
+
+
+def process(session_dir, tag, skip_sec=SKIP_SEC, signal=None):
+    """
+    Run one channel of one session through its registry recipe.
+
+    Filtered channels are detrended, filtered, z-scored and given an SNR;
+    the others are returned as loaded. signal is the (ts, values) pair
+    load_signal already returned, to skip loading it again. Returns None
+    when nothing is left.
+    """
+    channel = CHANNELS[tag]
+    ts, sig = signal if signal is not None else load_signal(session_dir, tag, skip_sec)
+    if sig is None or sig.size == 0:
+        return None
+
+    fs = nominal_rate(session_dir, tag)
+    result = {"ts": ts, "signal": sig, "fs": fs, "snr": None}
+    if channel.filter is not None:
+        sig = zscore(filter_many([sig], fs, channel.filter)[0])
+        result["signal"] = sig
+        result["snr"] = compute_snr(sig, channel.snr_kernel)
+    return result
+
+
+@traced("pipeline.run")
+def run(tags, sites=SITES, skip_sec=SKIP_SEC, clock="local"):
+    """Process every tag at every site: {tag: {site: result}}.
+
+    Timestamps are seconds on clock, relative to the earliest sample kept;
+    clock=None falls back to each file's own LocalTimestamp origin, and so
+    does a clock some site has no time-sync information for (with a warning).
+
+    All signals sharing a rate and filter spec are filtered together (see
+    dsp.filter_many), so the PPG channel x site matrix costs one call per
+    distinct length. Sites whose channel is missing or empty are left out.
+    """
+    if clock is not None:
+        missing = [site for site, session_dir in sites.items() if not has_clock(session_dir, clock)]
+        if missing:
+            warnings.warn(f"No {clock} clock for {', '.join(missing)}; using raw timestamps",
+                          stacklevel=3)
+            clock = None
+
+    results = {tag: {} for tag in tags}
+    groups = {}
+    for site, session_dir in sites.items():
+        for tag in tags:
+            ts, sig = load_signal(session_dir, tag, skip_sec, clock)
+            if sig is None or sig.size == 0:
+                continue
+            fs = nominal_rate(session_dir, tag)
+            results[tag][site] = {"ts": ts, "signal": sig, "fs": fs, "snr": None}
+            spec = CHANNELS[tag].filter
+            if spec is not None:
+                groups.setdefault((fs, spec), []).append((tag, site))
+
+    if clock is not None:
+        starts = [r["ts"][0] for by_site in results.values() for r in by_site.values()]
+        origin = min(starts, default=0.0)
+        for by_site in results.values():
+            for r in by_site.values():
+                r["ts"] = r["ts"] - origin
+
+    for (fs, spec), members in groups.items():
+        filtered = filter_many([results[t][s]["signal"] for t, s in members], fs, spec)
+        with span("pipeline.score", rows=sum(len(sig) for sig in filtered)):
+            for (tag, site), sig in zip(members, filtered):
+                sig = zscore(sig)
+                results[tag][site]["signal"] = sig
+                results[tag][site]["snr"] = compute_snr(sig, CHANNELS[tag].snr_kernel)
+    return results
@@ -0,0 +1,97 @@
+"""
+Comparison figures; matplotlib is only imported when a figure is drawn.
+
+Long series are min/max-decimated before plotting, one bin per pixel column
+of the saved figure (3600 bins at 12 in and 300 dpi): a 100 Hz hour then
+draws 7200 points per line instead of 360 000 and covers the same pixels.
+In headless mode (set_headless() or EMOTIBIT_HEADLESS=1) figures are
+rendered with Agg, saved and closed instead of shown.
+"""
+import os
+
+import numpy as np
+
+from .dsp import common_window, crop
+from .trace import span
+
+DPI = 300
+_headless = os.environ.get("EMOTIBIT_HEADLESS", "") not in ("", "0")
+
+
+def set_headless(flag=True):
+    """Render with Agg and never block on plt.show(); call before the first figure."""
+    global _headless
+    _headless = flag
+    if flag:
+        import matplotlib
+        matplotlib.use("Agg")
+
+
+def minmax_decimate(ts, sig, n_bins):
+    """
+    Keep the min and max sample of each of n_bins equal-count bins, in time order.
+
+    A line through these points covers the same pixels as the full series
+    when the bins are no wider than a pixel. Series shorter than
+    2 * n_bins are returned unchanged.
+    """
+    n = len(sig)
+    if n <= 2 * n_bins:
+        return ts, sig
+    k = -(-n // n_bins)
+    rows = -(-n // k)
+    padded = np.concatenate((sig, np.full(rows * k - n, sig[-1])))
+    blocks = padded.reshape(rows, k)
+    base = np.arange(rows) * k
+    i_min = base + np.argmin(blocks, axis=1)
+    i_max = base + np.argmax(blocks, axis=1)
+    idx = np.stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max)), axis=1).ravel()
+    idx = np.minimum(idx, n - 1)
+    return ts[idx], sig[idx]
+
+
+def save_figure(fig, outfile, dpi=None):
+    """Save fig, then show it (interactive) or close it (headless)."""
+    import matplotlib.pyplot as plt
+
+    with span("plot.save", file=str(outfile), dpi=dpi or DPI):
+        fig.savefig(outfile, dpi=dpi or DPI)
+    if _headless:
+        plt.close(fig)
+    else:
+        plt.show()
+
+
+def plot_comparison(series, title, ylabel, outfile, transform=None):
+    """
+    Overlay several sites on their common time window and save to outfile.
+
+    series maps a legend label to (ts, signal); transform, if given, is
+    applied to each cropped signal before plotting.
+    """
+    import matplotlib.pyplot as plt
+
+    start, end = common_window([ts for ts, _ in series.values()])
+
+    with span("plot.draw", file=str(outfile)) as s:
+        fig = plt.figure(figsize=(12,6))
+        # detail narrower than a pixel of the saved figure cannot show
+        n_bins = int(fig.get_figwidth() * DPI)
+        rows = 0
+        for label, (ts, sig) in series.items():
+            ts_cut, sig_cut = crop(ts, sig, start, end)
+            if ts_cut.size == 0:
+                continue
+            if transform is not None:
+                sig_cut = transform(sig_cut)
+            rows += sig_cut.size
+            plt.plot(*minmax_decimate(ts_cut, sig_cut, n_bins), label=label)
+
+        plt.title(title)
+        plt.xlabel("Time (s)")
+        plt.ylabel(ylabel)
+        plt.legend()
+        plt.grid(True)
+        plt.tight_layout()
+        s.note(rows=rows)
+    save_figure(fig, outfile)
@@ -0,0 +1,195 @@
+"""
+Windowed signal-quality timeline per channel and site, usable as a QA gate.
+
+Every statistic is a windowed sum over a per-sample quantity, so each is
+computed from one cumulative sum in O(n) whatever the window length:
+
+- SNR (dB): power of the processed signal against its residual from a
+  moving-average baseline (the same definition as dsp.compute_snr);
+- clipping: share of raw samples stuck at the recording's min or max for at
+  least min_run samples in a row (a saturated sensor);
+- flatline: share of raw samples in runs of identical values lasting at
+  least flat_sec;
+- reliability: mean DataReliability (%) and share of packets below 100.
+
+    timeline = assess("Wrist-258", "EA")
+    timeline["snr_db"]      # one value per window
+
+    python -m emotibit.quality Finger-099 Wrist-258 --tags PI EA T1
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from .cache import load_channel
+from .channels import CHANNELS, SITES, SKIP_SEC
+from .dsp import moving_average
+from .pipeline import load_signal, process
+
+WINDOW_SEC = 10
+THRESHOLDS = {
+    "snr_db": 0.0,         # minimum median window SNR
+    "clip_frac": 0.01,     # maximum share of clipped samples
+    "flat_frac": 0.05,     # maximum share of flatlined samples
+    "reliability": 95.0,   # minimum mean DataReliability
+}
+
+
+def window_bounds(ts, window_sec, hop_sec=None):
+    """(start, stop) sample indices of windows of window_sec every hop_sec over sorted ts."""
+    hop_sec = hop_sec or window_sec
+    if ts.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    t0 = ts[0] + hop_sec * np.arange(max(int((ts[-1] - ts[0] - window_sec) // hop_sec) + 1, 1))
+    return np.searchsorted(ts, t0), np.searchsorted(ts, t0 + window_sec)
+
+
+def window_sums(x, starts, stops):
+    """Sum of x over every [start, stop) window."""
+    c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    return c[stops] - c[starts]
+
+
+def _run_lengths(same):
+    """Length of the run of identical values each sample belongs to, from diff == 0."""
+    run_id = np.cumsum(np.concatenate(([True], ~same))) - 1
+    return np.bincount(run_id)[run_id]
+
+
+def clipped(raw, min_run=3):
+    """Samples held at the recording's extreme value for at least min_run samples."""
+    if raw.size == 0:
+        return np.zeros(0, dtype=bool)
+    lengths = _run_lengths(np.diff(raw) == 0)
+    at_rail = (raw == raw.max()) | (raw == raw.min())
+    return at_rail & (lengths >= min_run)
+
+
+def flatlined(raw, fs, flat_sec=1.0):
+    """Samples inside runs of one repeated value lasting flat_sec or more."""
+    if raw.size == 0:
+        return np.zeros(0, dtype=bool)
+    return _run_lengths(np.diff(raw) == 0) >= max(2, int(round(flat_sec * fs)))
+
+
+def snr_timeline(sig, starts, stops, kernel=5):
+    """Per-window SNR (dB) of a processed signal; NaN for empty windows."""
+    noise = sig - moving_average(sig, kernel)
+    p_sig = window_sums(sig**2, starts, stops)
+    p_noise = window_sums(noise**2, starts, stops)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        snr = 10 * np.log10(p_sig / p_noise)
+    snr[p_noise <= 0] = -np.inf
+    snr[stops <= starts] = np.nan
+    return snr
+
+
+def assess(session_dir, tag, window_sec=WINDOW_SEC, hop_sec=None, skip_sec=SKIP_SEC,
+           flat_sec=1.0, min_run=3):
+    """
+    Quality timeline of one channel of one session: a dict of per-window arrays
+    (t_start, n, snr_db, clip_frac, flat_frac, reliability, unreliable_frac).
+
+    t_start is relative to the first sample, like pipeline.load_signal. SNR
+    is NaN for channels the registry does not filter. Returns None when the
+    channel is empty.
+    """
+    ts, raw = load_signal(session_dir, tag, skip_sec)
+    if raw is None or raw.size == 0:
+        return None
+    starts, stops = window_bounds(ts, window_sec, hop_sec)
+    n = (stops - starts).astype(np.float64)
+
+    def share(mask):
+        return window_sums(mask, starts, stops) / n
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = process(session_dir, tag, signal=(ts, raw))
+        fs = result["fs"]
+        if CHANNELS[tag].filter is not None:
+            snr = snr_timeline(result["signal"], starts, stops, CHANNELS[tag].snr_kernel)
+        else:
+            snr = np.full(starts.size, np.nan)
+
+        timeline = {
+            "t_start": ts[np.minimum(starts, ts.size - 1)],
+            "n": n,
+            "snr_db": snr,
+            "clip_frac": share(clipped(raw, min_run)),
+            "flat_frac": share(flatlined(raw, fs or 1.0, flat_sec)) if fs else np.full(starts.size, np.nan),
+        }
+
+        # DataReliability is per sample in the CSVs; map the trimmed windows back by time
+        data = load_channel(session_dir, tag, columns=("LocalTimestamp", "DataReliability"))
+        rel = np.asarray(data.get("DataReliability", []), dtype=np.float64)
+        local = np.asarray(data.get("LocalTimestamp", []), dtype=np.float64)
+        if rel.size and rel.size == local.size:
+            ok = np.isfinite(local) & (rel >= 0)
+            rel_ts, rel = local[ok] - local[ok][0], rel[ok]
+            r0 = np.searchsorted(rel_ts, timeline["t_start"])
+            r1 = np.searchsorted(rel_ts, timeline["t_start"] + window_sec)
+            m = (r1 - r0).astype(np.float64)
+            timeline["reliability"] = window_sums(rel, r0, r1) / m
+            timeline["unreliable_frac"] = window_sums(rel < 100, r0, r1) / m
+        else:
+            timeline["reliability"] = timeline["unreliable_frac"] = np.full(starts.size, np.nan)
+    return timeline
+
+
+def summarize(timeline, thresholds=THRESHOLDS):
+    """Collapse a timeline to one row of numbers plus the list of failed checks."""
+    with np.errstate(invalid="ignore"):
+        row = {
+            "windows": int(timeline["n"].size),
+            "snr_db": float(np.nanmedian(timeline["snr_db"])) if np.isfinite(timeline["snr_db"]).any() else np.nan,
+            "clip_frac": float(np.nansum(timeline["clip_frac"] * timeline["n"]) / timeline["n"].sum()),
+            "flat_frac": float(np.nansum(timeline["flat_frac"] * timeline["n"]) / timeline["n"].sum()),
+            "reliability": float(np.nanmean(timeline["reliability"])) if np.isfinite(timeline["reliability"]).any() else np.nan,
+        }
+    failed = []
+    if row["snr_db"] < thresholds["snr_db"]:
+        failed.append("snr")
+    if row["clip_frac"] > thresholds["clip_frac"]:
+        failed.append("clipping")
+    if row["flat_frac"] > thresholds["flat_frac"]:
+        failed.append("flatline")
+    if row["reliability"] < thresholds["reliability"]:
+        failed.append("reliability")
+    row["failed"] = failed
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Windowed quality check of EmotiBit sessions.")
+    parser.add_argument("sessions", nargs="*", default=list(SITES.values()),
+                        help="session folders (default: the three body sites)")
+    parser.add_argument("--tags", nargs="+", default=["PI", "PG", "PR", "EA", "T1"])
+    parser.add_argument("--window", type=float, default=WINDOW_SEC, help="window length (s)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for session_dir in args.sessions:
+        print(f"\n=== {session_dir} ===")
+        for tag in args.tags:
+            try:
+                timeline = assess(session_dir, tag, args.window)
+            except FileNotFoundError as e:
+                print(f"  {tag}: missing ({e})")
+                failures += 1
+                continue
+            if timeline is None:
+                print(f"  {tag}: no samples")
+                failures += 1
+                continue
+            s = summarize(timeline)
+            status = "FAIL " + ",".join(s["failed"]) if s["failed"] else "ok"
+            print(f"  {tag}: {s['windows']} windows, SNR {s['snr_db']:.2f} dB, "
+                  f"clip {100 * s['clip_frac']:.1f}%, flat {100 * s['flat_frac']:.1f}%, "
+                  f"reliability {s['reliability']:.1f}% -> {status}")
+            failures += bool(s["failed"])
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
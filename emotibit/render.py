@@ -0,0 +1,116 @@
+"""
+Regenerate every comparison figure headless, one plot script per process.
+
+    python -m emotibit.render                # all figures, one worker per script
+    python -m emotibit.render PPG HR --dpi 150
+
+Each worker switches matplotlib to Agg before the script imports pyplot,
+runs the script's main() from the repository root (where the session
+folders are) and returns its console output, which is printed in script
+order once everything is done. The session caches the scripts read are
+built in the parent first (warm_cache), so the workers only memory-map them
+instead of parsing the same CSVs side by side.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import plotting
+from .channels import PPG_TAGS, SCR_TAGS, SITES
+from .trace import span
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# figure group -> plot script module (run from ROOT)
+SCRIPTS = {
+    "PPG": "plot_emotibit",
+    "EDA": "plot_emotibit_EDA",
+    "T1": "plot_emotibit_Temp",
+    "HR": "plot_emotibit_HR",
+    "SCR": "plot_emotibit_SCR",
+}
+
+# figure group -> channels its script loads at every site
+TAGS = {
+    "PPG": PPG_TAGS,
+    "EDA": ("EA",),
+    "T1": ("T1",),
+    "HR": ("HR", *PPG_TAGS),
+    "SCR": SCR_TAGS,
+}
+
+
+def warm_cache(groups, root=ROOT, sites=SITES):
+    """Build the columnar cache and clock models the given figure groups will read."""
+    from .cache import channel_path, load_channel
+    from .sync import has_clock
+
+    tags = list(dict.fromkeys(t for g in groups for t in TAGS[g]))
+    for session_dir in sites.values():
+        path = Path(root) / session_dir
+        with span("render.warm_cache", session=str(path)):
+            for tag in tags:
+                if channel_path(path, tag).exists():
+                    load_channel(path, tag)
+            has_clock(path)
+
+
+def render(group, dpi=None, root=ROOT):
+    """Run one plot script headless; returns (group, seconds, console output)."""
+    plotting.set_headless(True)
+    if dpi:
+        plotting.DPI = dpi
+    os.chdir(root)
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    module = importlib.import_module(SCRIPTS[group])
+
+    t0 = time.perf_counter()
+    out = io.StringIO()
+    argv = sys.argv
+    sys.argv = [module.__name__]
+    try:
+        with contextlib.redirect_stdout(out), span(f"render.{group}"):
+            module.main()
+    finally:
+        sys.argv = argv
+    return group, time.perf_counter() - t0, out.getvalue()
+
+
+def render_all(groups=None, dpi=None, workers=None, root=ROOT):
+    """Render the given figure groups (default: all) in a process pool, in order."""
+    groups = list(groups or SCRIPTS)
+    warm_cache(groups, root)
+    with ProcessPoolExecutor(max_workers=workers or len(groups)) as pool:
+        futures = [pool.submit(render, g, dpi, root) for g in groups]
+        return [f.result() for f in futures]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render all comparison figures headless, in parallel.")
+    parser.add_argument("groups", nargs="*", default=list(SCRIPTS),
+                        help=f"figure groups among {', '.join(SCRIPTS)} (default: all)")
+    parser.add_argument("--dpi", type=int, default=None, help=f"override the {plotting.DPI} dpi default")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print script output")
+    args = parser.parse_args(argv)
+    unknown = [g for g in args.groups if g not in SCRIPTS]
+    if unknown:
+        parser.error(f"unknown figure groups: {', '.join(unknown)}")
+
+    t0 = time.perf_counter()
+    for group, seconds, output in render_all(args.groups, args.dpi, args.jobs):
+        if not args.quiet:
+            print(output, end="")
+        print(f"[{group}] {seconds:.1f} s")
+    print(f"Rendered {len(args.groups)} figure groups in {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
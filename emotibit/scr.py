@@ -0,0 +1,293 @@
+"""
+Skin conductance responses (SCR) detected from raw EA, as SA/SF/SR streams.
+
+The device writes its own SA (amplitude, µS), SF (SCRs per minute) and SR
+(rise time, s) files, with thresholds fixed in firmware. This module rebuilds
+them from <prefix>_EA.csv so old sessions can be reprocessed with other
+parameters:
+
+1. tonic level: EA low-passed at tonic_cutoff; phasic = EA - tonic,
+   low-passed at smooth_cutoff to drop quantization steps;
+2. every rising run of the phasic trace is a candidate: onset where the
+   slope turns positive, peak where it turns back;
+3. candidates with amplitude >= min_amplitude and a rise time in
+   [min_rise, max_rise] are SCRs. SA and SR are emitted at each peak, SF
+   every 1/sf_rate s as the count in the trailing sf_window seconds.
+
+Steps 2-3 are array operations on the whole recording, and a parameter grid
+only redoes step 1 per distinct (tonic_cutoff, smooth_cutoff).
+
+    streams = detect_session("Wrist-258", ScrParams(min_amplitude=5e-5))
+    streams["SA"]       # {"ts", "signal"} like a pipeline.run() result
+
+    python -m emotibit.scr Finger-099 Wrist-258 --min-amplitude 1e-5 3e-5 -j 4
+"""
+import argparse
+import itertools
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+
+import numpy as np
+
+from .cache import load_channel, session_prefix
+from .channels import SCR_TAGS, SITES, SKIP_SEC, FilterSpec, nominal_rate
+from .dsp import apply_filter
+from .sync import has_clock, to_clock
+from .trace import span
+
+
+@dataclass(frozen=True)
+class ScrParams:
+    tonic_cutoff: float = 0.05    # Hz, below this EA is tonic level
+    smooth_cutoff: float = 2.0    # Hz, phasic low-pass (below the 7.5 Hz Nyquist of EA)
+    min_amplitude: float = 1e-5   # µS, smallest onset-to-peak rise counted
+    min_rise: float = 0.0         # s
+    max_rise: float = 5.0         # s
+    sf_window: float = 60.0       # s, trailing window of the SF count
+    sf_rate: float = 3.0          # Hz, SF output rate (the device's)
+
+
+def decompose(ea, fs, params=ScrParams()):
+    """(tonic, phasic) of an EA trace."""
+    ea = np.asarray(ea, dtype=np.float64)
+    tonic = apply_filter(ea, fs, FilterSpec("low", (params.tonic_cutoff,)))
+    phasic = ea - tonic
+    if params.smooth_cutoff and params.smooth_cutoff < fs / 2:
+        phasic = apply_filter(phasic, fs, FilterSpec("low", (params.smooth_cutoff,)))
+    return tonic, phasic
+
+
+def candidates(phasic):
+    """(onset, peak) sample indices of every rising run of phasic."""
+    rising = np.diff(phasic) > 0
+    edge = np.diff(rising.astype(np.int8))
+    onsets = np.flatnonzero(edge == 1) + 1
+    peaks = np.flatnonzero(edge == -1) + 1
+    if rising.size and rising[0]:
+        onsets = np.concatenate(([0], onsets))
+    # each peak closes the rise that started at the last onset before it
+    j = np.searchsorted(onsets, peaks, side="right") - 1
+    ok = j >= 0
+    return onsets[j[ok]], peaks[ok]
+
+
+def accept(amplitude, rise, params):
+    """Which candidates count as SCRs under params."""
+    return ((amplitude >= params.min_amplitude)
+            & (rise >= params.min_rise) & (rise <= params.max_rise))
+
+
+def frequency(peak_ts, start, end, window, rate):
+    """(ts, per-minute count) of peaks in the trailing window, every 1/rate s."""
+    ts = start + np.arange(int(np.floor((end - start) * rate)) + 1) / rate
+    count = np.searchsorted(peak_ts, ts, side="right") - np.searchsorted(peak_ts, ts - window, side="right")
+    # before a full window has elapsed, scale by the time actually covered
+    span = np.clip(ts - start, 1.0 / rate, window)
+    return ts, count * 60.0 / span
+
+
+def detect(ts, ea, fs, params=ScrParams()):
+    """
+    SA/SF/SR streams of one EA recording: {tag: {"ts", "signal"}}.
+
+    ts are the EA sample times in seconds; SA and SR share the peak times.
+    Also returns "onset" (s) of every SCR under "SR".
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    with span("scr.detect", rows=ts.size):
+        _, phasic = decompose(ea, fs, params)
+        onset, peak = candidates(phasic)
+        amplitude = phasic[peak] - phasic[onset]
+        rise = ts[peak] - ts[onset]
+        keep = accept(amplitude, rise, params)
+        peak_ts = ts[peak[keep]]
+        sf_ts, sf = frequency(peak_ts, ts[0], ts[-1], params.sf_window, params.sf_rate)
+    return {
+        "SA": {"ts": peak_ts, "signal": amplitude[keep]},
+        "SF": {"ts": sf_ts, "signal": sf},
+        "SR": {"ts": peak_ts, "signal": rise[keep], "onset": ts[onset[keep]]},
+    }
+
+
+def _usable_clock(session_dir, clock):
+    """clock, or None (with a warning) if the session has no time-sync information for it."""
+    if clock is not None and not has_clock(session_dir, clock):
+        warnings.warn(f"No {clock} clock for {session_dir}; using raw timestamps", stacklevel=3)
+        return None
+    return clock
+
+
+def _load_ea(session_dir, skip_sec, clock, absolute=False):
+    """
+    EA time axis on clock (absolute s), its EmotiBitTimestamp and values, trimmed.
+
+    Without clock the axis is EmotiBitTimestamp in s from the first sample,
+    or from that sample's LocalTimestamp if absolute.
+    """
+    data = load_channel(session_dir, "EA")
+    te = np.asarray(data["EmotiBitTimestamp"], dtype=np.float64)
+    ea = np.asarray(data["EA"], dtype=np.float64)
+    packet = np.asarray(data["PacketNumber"])
+    ok = np.isfinite(te) & np.isfinite(ea)
+    local = np.asarray(data["LocalTimestamp"], dtype=np.float64)[ok] if absolute else None
+    te, ea, packet = te[ok], ea[ok], packet[ok]
+    if te.size == 0:
+        return te, te, ea, packet
+    if clock:
+        ts = to_clock(session_dir, te, clock)
+    else:
+        ts = (te - te[0]) / 1000 + (local[0] if absolute else 0.0)
+    keep = ts >= ts[0] + skip_sec
+    return ts[keep], te[keep], ea[keep], packet[keep]
+
+
+def detect_session(session_dir, params=ScrParams(), skip_sec=SKIP_SEC, clock="local"):
+    """
+    detect() on a session's EA, with times on clock (see sync.CLOCKS).
+
+    Without time-sync information for clock the times are seconds from the
+    first EA sample, with a warning.
+    """
+    ts, _, ea, _ = _load_ea(session_dir, skip_sec, _usable_clock(session_dir, clock))
+    if ts.size < 2:
+        return None
+    return detect(ts, ea, nominal_rate(session_dir, "EA"), params)
+
+
+def run_scr(sites=SITES, params=ScrParams(), skip_sec=SKIP_SEC, clock="local"):
+    """
+    SA/SF/SR re-derived from EA at every site, shaped like pipeline.run(SCR_TAGS).
+
+    Times are relative to the earliest EA sample kept across sites. As in
+    pipeline.run, a clock some site has no time-sync information for falls
+    back to each site's own origin (with a warning).
+    """
+    if clock is not None:
+        missing = [site for site, session_dir in sites.items() if not has_clock(session_dir, clock)]
+        if missing:
+            warnings.warn(f"No {clock} clock for {', '.join(missing)}; using raw timestamps",
+                          stacklevel=2)
+            clock = None
+    results = {tag: {} for tag in SCR_TAGS}
+    origin = np.inf
+    for site, session_dir in sites.items():
+        ts, _, ea, _ = _load_ea(session_dir, skip_sec, clock)
+        if ts.size < 2:
+            continue
+        origin = min(origin, ts[0])
+        streams = detect(ts, ea, nominal_rate(session_dir, "EA"), params)
+        for tag in SCR_TAGS:
+            results[tag][site] = {"ts": streams[tag]["ts"], "signal": streams[tag]["signal"],
+                                  "fs": nominal_rate(session_dir, tag), "snr": None}
+    for by_site in results.values():
+        for r in by_site.values():
+            r["ts"] = r["ts"] - origin
+    return results
+
+
+def write_streams(session_dir, out_dir, params=ScrParams(), skip_sec=SKIP_SEC):
+    """
+    Write <prefix>_SA/SF/SR.csv to out_dir in the DataParser layout.
+
+    EmotiBitTimestamp is interpolated from the EA samples and PacketNumber is
+    that of the last EA sample at or before each value. LocalTimestamp comes
+    from the session's local clock model, or (with a warning) from the first
+    EA LocalTimestamp plus device time if the session has none. Returns the
+    written paths.
+    """
+    ts, te, ea, packet = _load_ea(session_dir, skip_sec, _usable_clock(session_dir, "local"),
+                                  absolute=True)
+    streams = detect(ts, ea, nominal_rate(session_dir, "EA"), params)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for tag in SCR_TAGS:
+        s = streams[tag]
+        i = np.clip(np.searchsorted(ts, s["ts"], side="right") - 1, 0, ts.size - 1)
+        te_out = np.interp(s["ts"], ts, te)
+        path = out_dir / f"{session_prefix(session_dir)}_{tag}.csv"
+        with open(path, "w") as f:
+            f.write(f"LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,"
+                    f"ProtocolVersion,DataReliability,{tag}\n")
+            for t, e, p, v in zip(s["ts"], te_out, packet[i], s["signal"]):
+                f.write(f"{t:.6f},{e:.3f},{p},1,{tag},1,100,{v:.6g}\n")
+        paths.append(path)
+    return paths
+
+
+def param_grid(**values):
+    """Every ScrParams combination of the given per-field value lists."""
+    names = list(values)
+    return [replace(ScrParams(), **dict(zip(names, combo)))
+            for combo in itertools.product(*(values[n] for n in names))]
+
+
+def _sweep_session(session_dir, grid, skip_sec):
+    """Summary rows of one session for every ScrParams in grid."""
+    ts, _, ea, _ = _load_ea(session_dir, skip_sec, None)
+    if ts.size < 2:
+        return []
+    fs = nominal_rate(session_dir, "EA")
+    minutes = (ts[-1] - ts[0]) / 60
+    rows = []
+    # decomposition depends on two fields only; thresholds are cheap masks
+    by_filter = {}
+    for params in grid:
+        by_filter.setdefault((params.tonic_cutoff, params.smooth_cutoff), []).append(params)
+    for group in by_filter.values():
+        _, phasic = decompose(ea, fs, group[0])
+        onset, peak = candidates(phasic)
+        amplitude = phasic[peak] - phasic[onset]
+        rise = ts[peak] - ts[onset]
+        for params in group:
+            keep = accept(amplitude, rise, params)
+            n = int(keep.sum())
+            rows.append({"session": str(session_dir), **asdict(params), "n_scr": n,
+                         "per_min": n / minutes if minutes > 0 else np.nan,
+                         "median_amplitude": float(np.median(amplitude[keep])) if n else np.nan,
+                         "median_rise": float(np.median(rise[keep])) if n else np.nan})
+    return rows
+
+
+def sweep(sessions, grid, skip_sec=SKIP_SEC, workers=None):
+    """
+    Summary rows for every (session, ScrParams) pair, one process per session.
+
+    Each row holds the parameters plus n_scr, per_min, median_amplitude and
+    median_rise, in session order then grid order.
+    """
+    sessions = list(sessions)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        per_session = pool.map(_sweep_session, sessions, itertools.repeat(grid),
+                               itertools.repeat(skip_sec))
+        return [row for rows in per_session for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect SCRs from EA and sweep their parameters.")
+    parser.add_argument("sessions", nargs="*", default=list(SITES.values()),
+                        help="session folders (default: the three body sites)")
+    for f in fields(ScrParams):
+        parser.add_argument("--" + f.name.replace("_", "-"), type=float, nargs="+", default=[f.default])
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--write", metavar="DIR",
+                        help="write SA/SF/SR CSVs per session under DIR (first grid point)")
+    args = parser.parse_args(argv)
+
+    grid = param_grid(**{f.name: getattr(args, f.name) for f in fields(ScrParams)})
+    for row in sweep(args.sessions, grid, workers=args.jobs):
+        varied = ", ".join(f"{k}={row[k]:g}" for k in (f.name for f in fields(ScrParams))
+                           if len(getattr(args, k)) > 1)
+        print(f"{row['session']}{' [' + varied + ']' if varied else ''}: {row['n_scr']} SCRs "
+              f"({row['per_min']:.1f}/min), median amplitude {row['median_amplitude']:.2g} µS, "
+              f"median rise {row['median_rise']:.2f} s")
+    if args.write:
+        for session_dir in args.sessions:
+            for path in write_streams(session_dir, Path(args.write) / Path(session_dir).name, grid[0]):
+                print(f"✅ Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
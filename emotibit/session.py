@@ -0,0 +1,151 @@
+"""
+Lazy view of one session folder: channels are found up front, loaded on first access.
+
+    s = Session("Wrist-258")
+    s.tags                    # ("EA", "HR", "PG", ...) from the file names
+    s.rate("EA")              # 15.0, from first.json or the catalog
+    ts, hr = s.signal("HR")   # opens LocalTimestamp and HR only
+    s["PI"]["PacketNumber"]   # every cached column of PI
+
+Making a Session reads nothing. Channels are discovered by listing the
+folder (or from the catalog record, see catalog.py), and each column is
+memory-mapped from the columnar cache (see cache.py) the first time it is
+asked for, building the channel's cache entry if needed. Importing this
+module only pulls in numpy; pandas is imported when a cache entry has to
+be built, scipy and matplotlib never.
+
+    python -m emotibit.session Wrist-258              # channels, rates, rows, duration
+    python -m emotibit.session Wrist-258 HR --head 5  # first rows of a channel
+"""
+import argparse
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from . import catalog
+from .cache import load_channel
+from .channels import nominal_rate
+from .parser import TEXT_TAGS
+
+
+class Session:
+    """One session folder; arrays are loaded per (channel, column) on first use."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._arrays = {}       # tag -> {column: array} loaded so far
+        self._complete = set()  # tags whose every column is loaded
+
+    def __repr__(self):
+        return f"Session({str(self.path)!r})"
+
+    @cached_property
+    def record(self):
+        """Catalog record of the session, None without a (current) catalog."""
+        return catalog.lookup(self.path)
+
+    @cached_property
+    def prefix(self):
+        return self._layout[0]
+
+    @cached_property
+    def _layout(self):
+        if self.record is not None:
+            return self.record["prefix"], {s: f"{self.record['prefix']}_{s}.csv" for s in self.record["files"]}
+        found = catalog.session_files(self.path)
+        if found is None:
+            raise FileNotFoundError(f"No session CSVs in {self.path}")
+        return found
+
+    @cached_property
+    def files(self):
+        """{suffix: path} of every <prefix>_<suffix>.csv, sync files and markers included."""
+        return {suffix: self.path / name for suffix, name in sorted(self._layout[1].items())}
+
+    @cached_property
+    def tags(self):
+        """Numeric TypeTags of the session, i.e. the channels load() can open."""
+        return tuple(s for s in self.files if catalog.TYPE_TAG.match(s) and s not in TEXT_TAGS)
+
+    def __contains__(self, tag):
+        return tag in self.tags
+
+    def __iter__(self):
+        return iter(self.tags)
+
+    def __getitem__(self, tag):
+        return self.load(tag)
+
+    def rate(self, tag):
+        """Nominal sampling rate of tag (session JSON, then the channel registry)."""
+        return nominal_rate(self.path, tag)
+
+    def columns(self, tag):
+        """CSV header of a channel, read from the catalog or the file's first line."""
+        if self.record is not None and tag in self.record["files"]:
+            return self.record["files"][tag]["columns"]
+        with open(self.files[tag]) as f:
+            return f.readline().strip().split(",")
+
+    def load(self, tag, columns=None):
+        """{column: array} of a channel: the given columns (those present), or all cached ones."""
+        if tag not in self.tags:
+            raise KeyError(f"{self.path} has no {tag} channel")
+        have = self._arrays.setdefault(tag, {})
+        if columns is None:
+            if tag not in self._complete:
+                have.update(load_channel(self.path, tag))
+                self._complete.add(tag)
+            return dict(have)
+        need = [c for c in columns if c not in have]
+        if need and tag not in self._complete:
+            have.update(load_channel(self.path, tag, columns=need))
+        return {c: have[c] for c in columns if c in have}
+
+    def signal(self, tag, clock=None, skip_sec=0):
+        """(ts, values) of a channel as pipeline.load_signal returns them."""
+        from .pipeline import load_signal
+
+        return load_signal(self.path, tag, skip_sec, clock)
+
+    def rows(self, tag):
+        """Number of samples of a channel, without loading it when the catalog knows."""
+        if self.record is not None and tag in self.record["files"]:
+            return self.record["files"][tag]["rows"]
+        return len(self.load(tag, ["LocalTimestamp"])["LocalTimestamp"])
+
+    def duration(self):
+        """Seconds between the first and last LocalTimestamp over all channels."""
+        if self.record is not None and self.record["duration"] is not None:
+            return self.record["duration"]
+        spans = [self.load(t, ["LocalTimestamp"]).get("LocalTimestamp") for t in self.tags]
+        spans = [(np.nanmin(ts), np.nanmax(ts)) for ts in spans if ts is not None and len(ts)]
+        return max(b for _, b in spans) - min(a for a, _ in spans) if spans else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the channels of a session or print some rows.")
+    parser.add_argument("session")
+    parser.add_argument("tags", nargs="*", help="channels to print (default: list them all)")
+    parser.add_argument("--head", type=int, default=5, help="rows to print per channel")
+    args = parser.parse_args(argv)
+
+    s = Session(args.session)
+    if not args.tags:
+        duration = s.duration()
+        print(f"{s.path} ({s.prefix}): {len(s.tags)} channels"
+              + (f", {duration:.0f} s" if duration is not None else ""))
+        for tag in s.tags:
+            rate = s.rate(tag)
+            print(f"  {tag}: {s.rows(tag)} rows" + (f" @ {rate:g} Hz" if rate else ""))
+        return
+    for tag in args.tags:
+        data = s.load(tag, ["LocalTimestamp", tag])
+        print(f"{tag}:")
+        for t, v in zip(data["LocalTimestamp"][:args.head], data[tag][:args.head]):
+            print(f"  {t:.3f}  {v:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Clock models that put EmotiBitTimestamp (device ms) on a host timeline.
+
+Every session carries its own time-sync evidence:
+
+- <prefix>_timeSyncMap.csv: the two anchor pairs DataParser used (TE0/TE1
+  against TL0/TL1, plus LC0/LC1 and LM0/LM1 when an LSL marker stream was
+  recorded);
+- <prefix>_timesyncs.csv: every sync exchange, with its round trip;
+- <prefix>_LM.csv / _TX_LC_LM.csv: LSL clock values (LR/LM/LC) stamped
+  into markers on arrival.
+
+fit_clock fits offset + drift to all usable exchanges once per session and
+keeps the result in <session>/.emotibit_cache/sync.json; to_clock maps a whole
+EmotiBitTimestamp array with one multiply-add. Devices recorded side by side
+on one host end up on the same timeline, so windows can be intersected in
+absolute time instead of from each file's first sample.
+
+    ts = to_clock("Wrist-258", data["EmotiBitTimestamp"])          # unix s
+    ts = to_clock("subject1", data["EmotiBitTimestamp"], "lsl")    # LSL s
+"""
+import io
+import json
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .cache import CACHE_DIR, _fingerprint, session_prefix
+from .trace import span
+
+CLOCKS = ("local", "lsl", "marker")   # TL (unix), LC (LSL local_clock), LM (marker source)
+SYNC_VERSION = 1
+MAX_ROUND_TRIP_MS = 100   # slower exchanges say little about when TL was read
+
+# clock -> timeSyncMap columns holding that clock at TE0/TE1
+_MAP_COLUMNS = {"local": ("TL0", "TL1"), "lsl": ("LC0", "LC1"), "marker": ("LM0", "LM1")}
+# clock -> LM/TX field carrying it
+_MARKER_FIELD = {"lsl": "LC", "marker": "LM"}
+# time columns of an LM/TX row, before the TypeTag block
+_MARKER_TIME_COLUMNS = {"LocalTimestamp": 2, "EmotiBitTimestamp": 3}
+
+
+@dataclass(frozen=True)
+class ClockModel:
+    """t = t_ref + (te - te_ref) * slope, te in device ms and t in seconds."""
+    clock: str
+    te_ref: float
+    t_ref: float
+    slope: float
+    n_points: int
+    rms_ms: float
+
+    @property
+    def drift_ppm(self):
+        """Device clock rate error against the host clock."""
+        return (self.slope * 1000 - 1) * 1e6
+
+    def apply(self, te):
+        te = np.asarray(te, dtype=np.float64)
+        return self.t_ref + (te - self.te_ref) * self.slope
+
+
+def _session_file(session_dir, suffix):
+    return Path(session_dir) / f"{session_prefix(session_dir)}_{suffix}.csv"
+
+
+def _read_map(session_dir):
+    import pandas as pd
+
+    df = pd.read_csv(_session_file(session_dir, "timeSyncMap"))
+    df.columns = df.columns.str.strip()
+    return df.iloc[0]
+
+
+def _host_seconds(stamps):
+    """Naive seconds since the epoch of DataParser time strings (2025-10-02_16-34-09-700774)."""
+    import pandas as pd
+
+    parsed = pd.to_datetime(pd.Series(stamps), format="%Y-%m-%d_%H-%M-%S-%f", errors="coerce")
+    return (parsed - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+
+
+def _exchange_points(session_dir, anchors):
+    """
+    (te_ms, tl_s) of every sync exchange with a usable round trip.
+
+    The host read TL halfway through the round trip. The time strings are in
+    the host's local zone, so the zone offset is taken from the anchor pairs
+    and rounded to the quarter hour.
+    """
+    import pandas as pd
+
+    path = _session_file(session_dir, "timesyncs")
+    if not path.exists():
+        return np.zeros(0), np.zeros(0)
+    df = pd.read_csv(path)
+    te = pd.to_numeric(df["TS_received"], errors="coerce").to_numpy(np.float64)
+    rt = pd.to_numeric(df["RoundTrip"], errors="coerce").to_numpy(np.float64)
+    tl = _host_seconds(df["TS_sent"]) + rt / 2000
+    ok = np.isfinite(te) & np.isfinite(tl) & (rt <= MAX_ROUND_TRIP_MS)
+    te, tl = te[ok], tl[ok]
+    if te.size == 0:
+        return te, tl
+    zone = np.median(anchors.apply(te) - tl)
+    return te, tl + np.round(zone / 900) * 900
+
+
+def read_marker_fields(path, fields, time_column="EmotiBitTimestamp"):
+    """
+    Timestamps and named values of every packet of an LM/TX file.
+
+    Rows are the nine header fields followed by name,value pairs (LR, LM, LC,
+    LD, ...). Returns (t, {field: str array}) with t the time_column
+    (EmotiBitTimestamp in ms or LocalTimestamp in s) and the first value of
+    each field per row, "" where a row lacks it; rows without a numeric time
+    are dropped. The whole file is parsed column-wise.
+    """
+    import pandas as pd
+
+    raw = Path(path).read_bytes()
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    line_ends = np.append(np.flatnonzero(buf == ord("\n")), buf.size)
+    per_line = np.diff(np.searchsorted(np.flatnonzero(buf == ord(",")), line_ends), prepend=0)
+    width = int(per_line[1:].max(initial=0)) + 1        # widest row after the header
+    if width < 10 or line_ends.size < 2:
+        return np.zeros(0), {f: np.zeros(0, dtype=str) for f in fields}
+
+    df = pd.read_csv(io.BytesIO(raw), header=None, skiprows=1, names=range(width),
+                     dtype=str, keep_default_na=False, skip_blank_lines=True)
+    te = pd.to_numeric(df[_MARKER_TIME_COLUMNS[time_column]].str.strip(), errors="coerce").to_numpy(np.float64)
+    n_pairs = (width - 9) // 2
+    keys = np.char.strip(df.iloc[:, 9:9 + 2 * n_pairs:2].to_numpy(dtype=str))
+    values = np.char.strip(df.iloc[:, 10:10 + 2 * n_pairs:2].to_numpy(dtype=str))
+
+    ok = np.isfinite(te)
+    out = {}
+    for field in fields:
+        hit = keys == field
+        first = hit.argmax(axis=1)
+        found = values[np.arange(len(df)), first]
+        out[field] = np.where(hit.any(axis=1), found, "")[ok]
+    return te[ok], out
+
+
+def _marker_points(session_dir, field):
+    """(te_ms, t_s) from LM/TX packets carrying field.
+
+    These are one-way (host send time against device receive time), so they
+    are only used when the timeSyncMap lacks the clock.
+    """
+    import pandas as pd
+
+    te, t = [np.zeros(0)], [np.zeros(0)]
+    for suffix in ("LM", "TX_LC_LM"):
+        path = _session_file(session_dir, suffix)
+        if not path.exists():
+            continue
+        te_f, values = read_marker_fields(path, [field])
+        t_f = pd.to_numeric(pd.Series(values[field], dtype=object), errors="coerce").to_numpy(np.float64)
+        keep = np.isfinite(t_f)
+        te.append(te_f[keep])
+        t.append(t_f[keep])
+    te, t = np.concatenate(te), np.concatenate(t)
+    order = np.argsort(te, kind="stable")
+    return te[order], t[order]
+
+
+def _fit(clock, te, t):
+    te_ref = float(te[0])
+    slope, t_ref = np.polyfit(te - te_ref, t, 1)
+    resid = t - (t_ref + (te - te_ref) * slope)
+    return ClockModel(clock, te_ref, float(t_ref), float(slope), int(te.size),
+                      float(np.sqrt(np.mean(resid**2)) * 1000))
+
+
+def _shifted(model, clock, offset):
+    return ClockModel(clock, model.te_ref, model.t_ref + offset, model.slope,
+                      model.n_points, model.rms_ms)
+
+
+def _fit_all(session_dir):
+    """Fit every clock the session has evidence for: {clock: ClockModel}."""
+    import pandas as pd
+
+    # the anchors of every clock come from the timeSyncMap
+    if not _session_file(session_dir, "timeSyncMap").exists():
+        return {}
+    row = _read_map(session_dir)
+    anchor_te = np.array([row["TE0"], row["TE1"]], dtype=np.float64)
+    anchors = _fit("local", anchor_te, np.array([row["TL0"], row["TL1"]], dtype=np.float64))
+
+    te, tl = _exchange_points(session_dir, anchors)
+    models = {"local": _fit("local", te, tl) if te.size >= 2 else anchors}
+
+    # the other clocks run on the same host as TL, so they share its drift
+    for clock, (c0, c1) in _MAP_COLUMNS.items():
+        if clock == "local":
+            continue
+        if c0 in row and c1 in row and pd.notna(row[c0]) and pd.notna(row[c1]):
+            offset = np.mean([row[c0] - row["TL0"], row[c1] - row["TL1"]])
+        else:
+            te_m, t_m = _marker_points(session_dir, _MARKER_FIELD[clock])
+            if te_m.size == 0:
+                continue
+            # markers arrive late, never early: the fastest one bounds the offset best
+            offset = np.max(t_m - models["local"].apply(te_m))
+        models[clock] = _shifted(models["local"], clock, float(offset))
+    return models
+
+
+def _sources(session_dir):
+    names = ["timeSyncMap", "timesyncs", "LM", "TX_LC_LM"]
+    paths = [_session_file(session_dir, n) for n in names]
+    return {p.name: _fingerprint(p) for p in paths if p.exists()}
+
+
+@lru_cache(maxsize=None)
+def _session_models(session_dir):
+    """Clock models of a session, read from or written to the session cache."""
+    entry = Path(session_dir) / CACHE_DIR / "sync.json"
+    sources = _sources(session_dir)
+    try:
+        with open(entry) as f:
+            cached = json.load(f)
+        if cached.get("version") == SYNC_VERSION and cached.get("sources") == sources:
+            return {c: ClockModel(**m) for c, m in cached["models"].items()}
+    except (OSError, ValueError, TypeError):
+        pass
+
+    models = _fit_all(session_dir)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    with open(entry, "w") as f:
+        json.dump({"version": SYNC_VERSION, "sources": sources,
+                   "models": {c: asdict(m) for c, m in models.items()}}, f, indent=2)
+    return models
+
+
+def fit_clock(session_dir, clock="local"):
+    """ClockModel mapping a session's EmotiBitTimestamp to clock (see CLOCKS)."""
+    if clock not in CLOCKS:
+        raise ValueError(f"Unknown clock {clock!r}, expected one of {CLOCKS}")
+    models = _session_models(str(session_dir))
+    if clock not in models:
+        raise ValueError(f"{session_dir} has no {clock} clock information")
+    return models[clock]
+
+
+def has_clock(session_dir, clock="local"):
+    """True if the session has the time-sync information fit_clock needs for clock."""
+    if clock not in CLOCKS:
+        raise ValueError(f"Unknown clock {clock!r}, expected one of {CLOCKS}")
+    return clock in _session_models(str(session_dir))
+
+
+def to_clock(session_dir, emotibit_ts, clock="local"):
+    """Map an array of EmotiBitTimestamp (ms) onto clock, in seconds."""
+    with span("sync.to_clock", rows=len(emotibit_ts), clock=clock):
+        return fit_clock(session_dir, clock).apply(emotibit_ts)
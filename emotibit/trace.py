@@ -0,0 +1,241 @@
+"""
+Stage spans: wall and CPU time, rows and allocation peaks of pipeline stages.
+
+    with span("dsp.filter", fs=fs) as s:
+        out = sosfiltfilt(sos, x)
+        s.note(rows=x.size)
+
+    @traced("hrv.beats")
+    def site_beats(...): ...
+
+Tracing is off unless EMOTIBIT_TRACE names a log file (or enable() is
+called). While off, span() hands back one shared do-nothing object and a
+traced function costs one flag test, so the spans can stay in hot paths.
+While on, every finished span is appended to the log as one JSON line:
+
+    {"name": "dsp.filter", "ts": 1760781234.512, "wall_ms": 12.3, "cpu_ms": 12.1,
+     "rows": 90000, "fs": 100.0, "pid": 4242, "tid": 4242, "depth": 2}
+
+ts is the Unix start time, cpu_ms the CPU time of the calling thread and
+depth the nesting level. With EMOTIBIT_TRACE_ALLOC=1 tracemalloc runs too and
+alloc_mb is the peak memory allocated inside the span (numpy arrays
+included; it is process-wide, so threads tracing at once share it, and it
+slows allocation-heavy code down noticeably). Worker processes inherit the
+environment and append to the same log.
+
+    EMOTIBIT_TRACE=trace.jsonl python plot_emotibit.py
+    python -m emotibit.trace trace.jsonl                      # totals per stage
+    python -m emotibit.trace trace.jsonl --chrome trace.json  # for Perfetto / chrome://tracing
+
+The module imports nothing outside the standard library: the standalone
+scripts (combine_ppg_and_markers.py, multi_emotibit_lsl.py) load it by file
+path instead of importing the package.
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+ENV_PATH = "EMOTIBIT_TRACE"
+ENV_ALLOC = "EMOTIBIT_TRACE_ALLOC"
+
+_path = None
+_alloc = False
+_out = None          # (pid, open log), reopened after a fork
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NullSpan:
+    """What span() returns while tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **fields):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+def enable(path, alloc=False):
+    """Append spans to path from now on, in this process and the ones it starts."""
+    global _path, _alloc
+    disable()
+    _path, _alloc = str(path), alloc
+    os.environ[ENV_PATH] = _path
+    os.environ[ENV_ALLOC] = "1" if alloc else "0"
+    if alloc and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _path, _alloc, _out
+    with _lock:
+        if _out is not None and _out[0] == os.getpid():
+            _out[1].close()
+        _out = None
+    if _alloc and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _path, _alloc = None, False
+    os.environ.pop(ENV_PATH, None)
+    os.environ.pop(ENV_ALLOC, None)
+
+
+def enabled():
+    return _path is not None
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _write(record):
+    global _out
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _out is None or _out[0] != os.getpid():
+            _out = (os.getpid(), open(_path, "a", buffering=1))
+        _out[1].write(line)
+
+
+class Span:
+    """One timed stage; note() attaches fields (rows, tag, ...) to its record."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def note(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = _stack()
+        self.depth = len(stack)
+        if _alloc:
+            self.base, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # the enclosing span's peak so far, before it is reset for this one
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.peak = self.base
+        stack.append(self)
+        self.ts = time.time()
+        self.cpu0 = time.thread_time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.t0
+        cpu = time.thread_time() - self.cpu0
+        stack = _stack()
+        stack.pop()
+        record = {"name": self.name, "ts": round(self.ts, 6),
+                  "wall_ms": round(1e3 * wall, 3), "cpu_ms": round(1e3 * cpu, 3), **self.fields}
+        if _alloc and tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record["alloc_mb"] = round((self.peak - self.base) / 1e6, 3)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(pid=os.getpid(), tid=threading.get_native_id(), depth=self.depth)
+        if _path is not None:
+            _write(record)
+        return False
+
+
+def span(name, **fields):
+    """Context manager timing one stage; fields go into its record as they are."""
+    if _path is None:
+        return _NULL
+    return Span(name, fields)
+
+
+def traced(name=None):
+    """Decorator running each call of a function inside span(name), module.qualname by default."""
+    def wrap(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _path is None:
+                return fn(*args, **kwargs)
+            with Span(label, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def read(path):
+    """Span records of a log, skipping a torn last line."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def summarize(records):
+    """{name: {"calls", "wall_ms", "cpu_ms", "rows", "alloc_mb"}}: sums, alloc_mb is the max."""
+    out = {}
+    for r in records:
+        s = out.setdefault(r["name"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "rows": 0, "alloc_mb": None})
+        s["calls"] += 1
+        s["wall_ms"] += r["wall_ms"]
+        s["cpu_ms"] += r["cpu_ms"]
+        s["rows"] += r.get("rows") or 0
+        if "alloc_mb" in r:
+            s["alloc_mb"] = max(s["alloc_mb"] or 0.0, r["alloc_mb"])
+    return out
+
+
+def chrome_trace(records):
+    """Trace Event Format dict: one complete ("X") event per span, args holding the rest."""
+    skip = {"name", "ts", "wall_ms", "pid", "tid"}
+    events = [{"name": r["name"], "ph": "X", "ts": r["ts"] * 1e6, "dur": r["wall_ms"] * 1e3,
+               "pid": r["pid"], "tid": r["tid"], "args": {k: v for k, v in r.items() if k not in skip}}
+              for r in records]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize an EMOTIBIT_TRACE span log.")
+    parser.add_argument("log")
+    parser.add_argument("--chrome", metavar="JSON", help="also write a Chrome trace file")
+    args = parser.parse_args(argv)
+
+    records = read(args.log)
+    stats = summarize(records)
+    print(f"{len(records)} spans from {len({r['pid'] for r in records})} process(es)")
+    print(f"  {'stage':<24}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'rows':>12}{'M rows/s':>10}{'alloc MB':>10}")
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1]["wall_ms"]):
+        rate = f"{s['rows'] / s['wall_ms'] / 1e3:.2f}" if s["rows"] and s["wall_ms"] else "-"
+        alloc = f"{s['alloc_mb']:.1f}" if s["alloc_mb"] is not None else "-"
+        print(f"  {name:<24}{s['calls']:>7}{s['wall_ms'] / 1e3:>10.3f}{s['cpu_ms'] / 1e3:>10.3f}"
+              f"{s['rows'] or '-':>12}{rate:>10}{alloc:>10}")
+    if args.chrome:
+        with open(args.chrome, "w") as f:
+            json.dump(chrome_trace(records), f)
+        print(f"✅ Saved {args.chrome}")
+
+
+if os.environ.get(ENV_PATH):
+    enable(os.environ[ENV_PATH], os.environ.get(ENV_ALLOC, "") not in ("", "0"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,74 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-
-files = {
-    "Finger": "Finger-099/first_HR.csv",
-    "Wrist": "Wrist-258/first_HR.csv",
-    "Arm":   "Arms-228/first_HR.csv"
-}
-
-skip_sec = 2
-signals = {}
-time_axes = {}
-hr_stats = {}
-
-print("\n=== Heart Rate (HR, bpm) ===")
-
-for name, path in files.items():
-    df = pd.read_csv(path)
-
-    if "LocalTimestamp" not in df.columns or "HR" not in df.columns:
-        print(f"⚠️ Missing HR data in {path}")
-        continue
-
-    ts = df["LocalTimestamp"].astype(float).values
-    sig = df["HR"].astype(float).values
-    ts = ts - ts[0]
-
-    mask = ts >= skip_sec
-    ts, sig = ts[mask], sig[mask]
-
-    if sig.size == 0:
-        print(f"⚠️ {name}: No HR samples after trimming")
-        continue
-
-    mean_hr = np.mean(sig)
-    median_hr = np.median(sig)
-    hr_stats[name] = (mean_hr, median_hr)
-
-    print(f"{name}: mean={mean_hr:.1f} bpm, median={median_hr:.1f} bpm")
-
-    signals[name] = sig
-    time_axes[name] = ts
-
-# --- Plot scatter of HR over time ---
-plt.figure(figsize=(12,6))
-for name in signals:
-    plt.scatter(time_axes[name], signals[name], label=f"{name}")
-
-plt.title("Heart Rate (HR, bpm) – Finger vs Wrist vs Arm (Discrete Samples)")
-plt.xlabel("Time (s)")
-plt.ylabel("HR (bpm)")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("HR_scatter.png", dpi=300)
-plt.show()
-
-# --- Plot bar summary (mean & median) ---
-labels = list(hr_stats.keys())
-means = [hr_stats[n][0] for n in labels]
-medians = [hr_stats[n][1] for n in labels]
-
-x = np.arange(len(labels))
-width = 0.35
-
-plt.figure(figsize=(8,5))
-plt.bar(x - width/2, means, width, label="Mean HR")
-plt.bar(x + width/2, medians, width, label="Median HR")
-
-plt.xticks(x, labels)
-plt.ylabel("HR (bpm)")
-plt.title("Summary of Heart Rate (Mean vs Median)")
-plt.legend()
-plt.tight_layout()
-plt.savefig("HR_summary.png", dpi=300)
-plt.show()
\ No newline at end of file
+from emotibit.channels import PPG_TAGS, SITES
+from emotibit.hrv import hrv_windows, site_beats
+from emotibit.pipeline import run
+from emotibit.plotting import save_figure
+
+
+def main():
+    import matplotlib.pyplot as plt
+
+    print("\n=== Heart Rate (HR, bpm) ===")
+
+    all_results = run(["HR", *PPG_TAGS])
+    results = all_results["HR"]
+    hr_stats = {}
+    for name in SITES:
+        if name not in results:
+            print(f"⚠️ {name}: No HR samples after trimming")
+            continue
+        sig = results[name]["signal"]
+        hr_stats[name] = (np.mean(sig), np.median(sig))
+        print(f"{name}: mean={hr_stats[name][0]:.1f} bpm, median={hr_stats[name][1]:.1f} bpm")
+
+    # --- HR and HRV from the PPG beats ---
+    print("\n=== PPG beats (fused PI/PG/PR) ===")
+    ppg = {}
+    for name in SITES:
+        b = site_beats(all_results, name)
+        if b is None or b["ibi"].size < 2:
+            print(f"⚠️ {name}: No usable PPG beats")
+            continue
+        ppg[name] = b
+        w = hrv_windows(b["ibi_t"], b["ibi"], window_sec=60, hop_sec=30)
+        print(f"{name}: {b['beats'].size} beats, median HR={np.median(b['hr_bpm']):.1f} bpm, "
+              f"SDNN={np.nanmedian(w['sdnn_ms']):.1f} ms, RMSSD={np.nanmedian(w['rmssd_ms']):.1f} ms, "
+              f"LF/HF={np.nanmedian(w['lf_hf']):.2f}")
+
+    # --- Plot scatter of HR over time ---
+    fig = plt.figure(figsize=(12,6))
+    for name, r in results.items():
+        plt.scatter(r["ts"], r["signal"], label=f"{name}")
+    for name, b in ppg.items():
+        plt.plot(b["ibi_t"], b["hr_bpm"], linewidth=0.8, alpha=0.7, label=f"{name} (PPG beats)")
+
+    plt.title("Heart Rate (HR, bpm) – Finger vs Wrist vs Arm (Device Samples and PPG Beats)")
+    plt.xlabel("Time (s)")
+    plt.ylabel("HR (bpm)")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    save_figure(fig, "HR_scatter.png")
+
+    # --- Plot bar summary (mean & median) ---
+    labels = list(hr_stats.keys())
+    means = [hr_stats[n][0] for n in labels]
+    medians = [hr_stats[n][1] for n in labels]
+
+    x = np.arange(len(labels))
+    width = 0.35
+
+    fig = plt.figure(figsize=(8,5))
+    plt.bar(x - width/2, means, width, label="Mean HR")
+    plt.bar(x + width/2, medians, width, label="Median HR")
+
+    plt.xticks(x, labels)
+    plt.ylabel("HR (bpm)")
+    plt.title("Summary of Heart Rate (Mean vs Median)")
+    plt.legend()
+    plt.tight_layout()
+    save_figure(fig, "HR_summary.png")
+
+
+if __name__ == "__main__":
+    main()
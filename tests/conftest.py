@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# the package from the repo root; the standalone script folders for their modules
+sys.path.insert(0, str(ROOT))
+for folder in ("BrainFlow", "EmotiBitProcessing"):
+    sys.path.append(str(ROOT / folder))
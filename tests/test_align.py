@@ -0,0 +1,44 @@
+import numpy as np
+
+from emotibit.align import AlignmentIndex, align
+
+
+def _result(ts, sig, fs):
+    return {"ts": np.asarray(ts, dtype=float), "signal": np.asarray(sig, dtype=float), "fs": fs, "snr": None}
+
+
+def test_axes_with_equal_ends_do_not_share_an_index():
+    # same size, first and last time, different samples in between
+    ts_a = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    ts_b = np.array([0.0, 0.5, 1.0, 3.5, 4.0])
+    results = {"HR": {"Wrist": _result(ts_a, ts_a * 10, None)},
+               "SA": {"Wrist": _result(ts_b, ts_b * 10, None)}}
+    aligned = align(results, fs=2)
+    np.testing.assert_allclose(aligned.grid, np.arange(9) / 2)
+    np.testing.assert_array_equal(aligned.channel("HR")[0], np.floor(aligned.grid) * 10)
+    np.testing.assert_array_equal(aligned.channel("SA")[0], [0, 5, 10, 10, 10, 10, 10, 35, 40])
+
+
+def test_max_gap_blanks_gaps_of_resampled_channels():
+    fs = 25.0
+    ts = np.concatenate((np.arange(0, 10, 1 / fs), np.arange(14, 24, 1 / fs)))
+    results = {"EA": {"Wrist": _result(ts, np.sin(ts), fs)}}
+
+    aligned = align(results, fs=5, max_gap=0.5)
+    row = aligned.channel("EA")[0]
+    in_gap = (aligned.grid > 10) & (aligned.grid < 14)
+    assert np.isnan(row[in_gap]).all()
+    assert np.isfinite(row[aligned.grid < 9.5]).all()
+    # the gap does not shift the samples on either side of it (filter edges aside)
+    g = aligned.grid
+    for side in ((g > 1) & (g < 9), (g > 15) & (g < 23)):
+        np.testing.assert_allclose(row[side], np.sin(g[side]), atol=0.01)
+
+    assert np.isfinite(align(results, fs=5).channel("EA")[0]).all()
+
+
+def test_alignment_index_hold_and_linear():
+    index = AlignmentIndex([0.0, 1.0, 3.0], [-1.0, 0.5, 2.0, 4.0], max_gap=1.5)
+    np.testing.assert_array_equal(index.apply([0, 10, 30]), [np.nan, 5, np.nan, np.nan])
+    np.testing.assert_array_equal(AlignmentIndex([0.0, 1.0, 3.0], [0.5, 2.0]).apply([0, 10, 30], "hold"),
+                                  [0, 10])
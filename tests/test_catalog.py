@@ -0,0 +1,38 @@
+import json
+
+from emotibit import catalog
+
+
+def _archive(root, site="Wrist-001", rate=15.0):
+    folder = root / site
+    folder.mkdir(parents=True)
+    (folder / "first.json").write_text(json.dumps([{"info": {
+        "typeTags": ["EA"], "nominal_srate": rate, "device_id": "MD-V5-0000001"}}]))
+    (folder / "first_EA.csv").write_text(
+        "LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability,EA\n"
+        "1.0,1000,1,1,EA,1,100,0.5\n2.0,2000,2,1,EA,1,100,0.6\n")
+    return folder
+
+
+def test_session_files_finds_prefix_and_tags(tmp_path):
+    folder = _archive(tmp_path)
+    (folder / "notes.csv").write_text("x\n")
+    prefix, files = catalog.session_files(folder)
+    assert prefix == "first"
+    assert files == {"EA": "first_EA.csv"}
+    assert catalog.TYPE_TAG.match("EA") and not catalog.TYPE_TAG.match("notes")
+
+
+def test_lookup_follows_the_working_directory(tmp_path, monkeypatch):
+    a, b = tmp_path / "a", tmp_path / "b"
+    _archive(a, rate=15.0)
+    _archive(b, rate=25.0)
+    catalog.build(a)
+    catalog.build(b)
+
+    monkeypatch.chdir(a)
+    assert catalog.lookup("Wrist-001")["rates"]["EA"] == 15.0
+    monkeypatch.chdir(b)
+    assert catalog.lookup("Wrist-001")["rates"]["EA"] == 25.0
+    monkeypatch.chdir(tmp_path)
+    assert catalog.lookup("a/Wrist-001") is None
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from emotibit.chunked import blocks, process_chunked
+from emotibit.pipeline import process
+
+HEADER = "LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability"
+
+
+def _write_channel(folder, tag, fs, n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    sig = 1000 + 50 * np.sin(2 * np.pi * 1.2 * t) + 20 * t / t[-1] + rng.normal(0, 5, n)
+    lines = [f"{HEADER},{tag}"]
+    lines += [f"{1.76e9 + ti:.6f},{1000 * ti:.3f},{i},1,{tag},1,100,{v:.4f}" for i, (ti, v) in enumerate(zip(t, sig))]
+    (folder / f"subjectC_{tag}.csv").write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("subjectC")
+    _write_channel(folder, "PI", 100, 20000)
+    _write_channel(folder, "EA", 15, 3000, seed=1)
+    _write_channel(folder, "HR", 1, 200, seed=2)
+    return folder
+
+
+@pytest.mark.parametrize("tag", ["PI", "EA"])
+@pytest.mark.parametrize("block", [1500, 4096])
+def test_chunked_matches_in_memory(session, tmp_path, tag, block):
+    ref = process(session, tag)
+    r = process_chunked(session, tag, tmp_path, block=block)
+    np.testing.assert_array_equal(r["ts"], ref["ts"])
+    np.testing.assert_allclose(r["signal"], ref["signal"], rtol=0, atol=1e-9)
+    assert r["snr"] == pytest.approx(ref["snr"], abs=1e-9)
+
+
+def test_unfiltered_channel_is_copied(session, tmp_path):
+    ref = process(session, "HR")
+    r = process_chunked(session, "HR", tmp_path, block=64)
+    np.testing.assert_array_equal(r["signal"], ref["signal"])
+    assert r["snr"] is None and not (tmp_path / "HR_raw.npy").exists()
+
+
+def test_blocks_cover_the_range():
+    assert blocks(10, 4) == [(0, 4), (4, 8), (8, 10)]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from emotibit.epochs import epochs, read_markers
+
+HEADER = "LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability"
+LM_HEADER = ("LslMarkerSourceTimestamp,LslLocalTimestamp,LocalTimestamp,EmotiBitTimestamp,"
+             "PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability,LM")
+
+
+def _write_session(folder, onsets, fs=25.0, n=1500):
+    """A PI ramp (value = seconds since start) and LM markers at onsets, without time sync."""
+    folder.mkdir()
+    t = np.arange(n) / fs
+    lines = [f"{HEADER},PI"]
+    lines += [f"{1.76e9 + ti:.6f},{1000 * ti + 5000:.3f},{i},1,PI,1,100,{ti:.6f}" for i, ti in enumerate(t)]
+    (folder / "subjectE_PI.csv").write_text("\n".join(lines) + "\n")
+    lines = [LM_HEADER]
+    for i, o in enumerate(onsets):
+        lines.append(f"{o},{o},{1.76e9 + o:.6f},{1000 * o + 5000:.3f},{i},8,LM,1,100,"
+                     f"LR,{o},LM,{o},LC,{o},LD,{'start' if i % 2 == 0 else 'stop'}")
+    lines.append("1.0,1.0,1760000001.0,x,99,8,LM,1,100,LD,bad")   # no EmotiBitTimestamp
+    lines.append("1.0,1.0,1760000002.0,6000,98,8")                  # short row, no label
+    (folder / "subjectE_LM.csv").write_text("\n".join(lines) + "\n")
+    return folder
+
+
+def test_read_markers_keeps_labels_and_drops_bad_rows(tmp_path):
+    session = _write_session(tmp_path / "subjectE", [20.0, 10.0, 30.0])
+    te, labels = read_markers(session)
+    np.testing.assert_allclose(te, [6000, 15000, 25000, 35000])
+    assert labels.tolist() == ["", "stop", "start", "start"]
+    t, _ = read_markers(session, "LocalTimestamp")
+    assert t.size == 5
+
+
+def test_epochs_without_time_sync_use_local_timestamps(tmp_path):
+    session = _write_session(tmp_path / "subjectE", [10.0, 20.0, 30.0])
+    with pytest.warns(UserWarning, match="No local clock"):
+        ep = epochs(session, ["PI", "EA"], labels=["start", "stop"], pre=0.4, post=0.4, processed=False)
+    assert ep.labels.tolist() == ["start", "stop", "start"]
+    # the ramp around each marker is its onset plus the relative time
+    expected = np.array([10.0, 20.0, 30.0])[:, None] + ep.times[None, :]
+    np.testing.assert_allclose(ep.channel("PI"), expected, atol=1e-6)
+    assert np.isnan(ep.channel("EA")).all()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from emotibit.hrv import hrv_windows
+
+
+def _ibis(seed=0, n=400, removed=(30, 31, 150, 275)):
+    """IBIs of a beat train with some intervals removed, as the outlier filter would."""
+    rng = np.random.default_rng(seed)
+    ibi = 0.8 + 0.05 * np.sin(np.arange(n) / 5) + rng.normal(0, 0.04, n)
+    ibi_t = np.cumsum(ibi)
+    keep = np.ones(n, dtype=bool)
+    keep[list(removed)] = False
+    return ibi_t[keep], ibi[keep]
+
+
+def _direct(ibi_t, ibi, t0, window_sec):
+    a, b = np.searchsorted(ibi_t, [t0, t0 + window_sec])
+    nn = ibi[a:b] * 1000
+    # a pair is successive only if no interval was removed between the two
+    successive = np.abs(np.diff(ibi_t[a:b]) - ibi[a + 1:b]) <= 1e-6
+    d = np.diff(nn)[successive]
+    return {"n_beats": nn.size, "mean_nn_ms": nn.mean(), "sdnn_ms": nn.std(ddof=1),
+            "rmssd_ms": np.sqrt(np.mean(d**2)), "pnn50": np.mean(np.abs(d) > 50)}
+
+
+@pytest.mark.parametrize("window_sec, hop_sec", [(60, None), (60, 10), (30, 7.5)])
+def test_windows_match_direct_computation(window_sec, hop_sec):
+    ibi_t, ibi = _ibis()
+    out = hrv_windows(ibi_t, ibi, window_sec, hop_sec, frequency=False)
+    assert out["t_start"].size > 1
+    for i, t0 in enumerate(out["t_start"]):
+        expected = _direct(ibi_t, ibi, t0, window_sec)
+        for key, value in expected.items():
+            assert out[key][i] == pytest.approx(value, rel=1e-9), (key, i)
+
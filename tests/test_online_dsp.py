@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from online_dsp import DeviceDSP, OnlineFilter, RingBuffer
+
+
+def _chunks(x, sizes):
+    out, i = [], 0
+    while i < x.shape[1]:
+        for n in sizes:
+            out.append(x[:, i:i + n])
+            i += n
+    return out
+
+
+@pytest.mark.parametrize("sizes", [[1], [7], [100], [3, 250, 1, 64], [2000]])
+def test_online_filter_any_chunk_size(sizes):
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.normal(size=(3, 2000)), axis=1) + 50
+    whole = OnlineFilter(100, (0.5, 5), "band", n_channels=3).process(x)
+
+    f = OnlineFilter(100, (0.5, 5), "band", n_channels=3)
+    chunked = np.concatenate([f.process(c) for c in _chunks(x, sizes)], axis=1)
+    np.testing.assert_allclose(chunked, whole, rtol=0, atol=1e-9)
+
+
+def test_online_filter_empty_chunk_keeps_state():
+    x = np.sin(np.linspace(0, 20, 300))[None, :]
+    whole = OnlineFilter(15, 0.5, "low").process(x)
+
+    f = OnlineFilter(15, 0.5, "low")
+    parts = [f.process(x[:, :100]), f.process(x[:, :0]), f.process(x[:, 100:])]
+    np.testing.assert_allclose(np.concatenate(parts, axis=1), whole, atol=1e-12)
+
+
+def test_ring_buffer_keeps_last_samples():
+    x = np.arange(50, dtype=float)[None, :]
+    buf = RingBuffer(12)
+    for c in _chunks(x, [5, 1, 20]):
+        buf.extend(c)
+    np.testing.assert_array_equal(buf.view(), x[:, -12:])
+
+
+def test_device_dsp_metrics_row():
+    # the EmotiBit auxiliary preset: PPG at 25 Hz
+    t = np.arange(1000) / 25
+    ppg = np.vstack([np.sin(2 * np.pi * 1.2 * t)] * 3) + 100
+    dsp = DeviceDSP(ppg_fs=25)
+    for c in _chunks(ppg, [25]):
+        filtered, metrics = dsp.process_ppg(c)
+    assert filtered.shape == (3, 25)
+    assert len(metrics) == len(DeviceDSP.METRICS)
+    assert metrics[3] == pytest.approx(72, abs=3)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from emotibit.parser import parse_raw_file
+
+from conftest import ROOT
+
+RAW = """\
+1000,1,2,PI,1,100,5,6
+1010,2,1,EA,1,100,0.25
+1040,3,2,PI,1,100,7,8
+1050,4,0,ED,1,100,
+1060,5,1,LM,1,100,LC,12
+1070,6,3,PI,1,100,9,10
+"""
+
+
+def test_multi_sample_packets_are_spread_back_from_their_timestamp(tmp_path):
+    path = tmp_path / "raw.csv"
+    path.write_text(RAW)
+    pi = parse_raw_file(path)["PI"]
+    assert pi["PI"].tolist() == [5, 6, 7, 8]
+    assert pi["EmotiBitTimestamp"].tolist() == [1000, 1000, 1020, 1040]
+    assert pi["PacketNumber"].tolist() == [1, 1, 3, 3]
+
+
+def test_truncated_and_text_packets_are_skipped(tmp_path):
+    path = tmp_path / "raw.csv"
+    path.write_text(RAW)
+    channels = parse_raw_file(path)
+    assert "LM" not in channels
+    # DataLength 3 with two values: dropped
+    assert 6 not in channels["PI"]["PacketNumber"]
+
+
+def test_zero_length_packets_keep_a_row(tmp_path):
+    path = tmp_path / "raw.csv"
+    path.write_text(RAW)
+    ed = parse_raw_file(path, tags=["ED"])["ED"]
+    assert ed["EmotiBitTimestamp"].tolist() == [1050]
+    assert np.isnan(ed["ED"]).all()
+
+
+@pytest.mark.parametrize("site", ["Wrist-258", "Finger-099", "Arms-228"])
+def test_matches_dataparser_csvs(site):
+    raw = ROOT / site / "first.csv"
+    if not raw.exists():
+        pytest.skip(f"{site} not present")
+    for tag, d in parse_raw_file(raw).items():
+        csv = ROOT / site / f"first_{tag}.csv"
+        if not csv.exists():
+            continue
+        df = pd.read_csv(csv)
+        assert len(df) == len(d[tag]), tag
+        np.testing.assert_allclose(df["EmotiBitTimestamp"], d["EmotiBitTimestamp"], atol=1e-3)
+        np.testing.assert_array_equal(df["PacketNumber"], d["PacketNumber"])
+        # DataParser fills the value of zero-length packets with DataReliability
+        ok = ~np.isnan(d[tag])
+        np.testing.assert_allclose(df[tag].to_numpy(float)[ok], d[tag][ok])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from emotibit.pipeline import run
+from emotibit.sync import has_clock
+
+
+def _write_session(folder, prefix, n=1500, fs=25.0):
+    folder.mkdir()
+    t = np.arange(n) / fs
+    sig = np.sin(2 * np.pi * 1.1 * t) + 0.1 * np.cos(2 * np.pi * 7 * t)
+    lines = ["LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability,PI"]
+    lines += [f"{1.76e9 + ti:.6f},{1000 * ti + 5000:.3f},{i},1,PI,1,100,{v:.6f}" for i, (ti, v) in enumerate(zip(t, sig))]
+    (folder / f"{prefix}_PI.csv").write_text("\n".join(lines) + "\n")
+    return folder
+
+
+def test_run_without_time_sync_falls_back_to_raw_timestamps(tmp_path):
+    session = _write_session(tmp_path / "subjectX", "subjectX")
+    assert not has_clock(session)
+    with pytest.warns(UserWarning, match="No local clock"):
+        results = run(["PI"], sites={"X": session}, skip_sec=2)
+    r = results["PI"]["X"]
+    assert r["ts"][0] == pytest.approx(2.0, abs=0.05)
+    assert r["snr"] is not None and np.isfinite(r["signal"]).all()
+
+
+def test_has_clock_rejects_unknown_clock(tmp_path):
+    session = _write_session(tmp_path / "subjectY", "subjectY")
+    with pytest.raises(ValueError):
+        has_clock(session, "gps")
+
+
+def test_assess_loads_the_signal_once(tmp_path, monkeypatch):
+    from emotibit import pipeline, quality
+
+    session = _write_session(tmp_path / "subjectZ", "subjectZ")
+    calls = []
+    load = pipeline.load_signal
+    monkeypatch.setattr(pipeline, "load_signal", lambda *a, **k: calls.append(a) or load(*a, **k))
+    monkeypatch.setattr(quality, "load_signal", pipeline.load_signal)
+    timeline = quality.assess(session, "PI", window_sec=10, skip_sec=2)
+    assert len(calls) == 1
+    assert timeline["n"].size == 5 and np.isfinite(timeline["snr_db"]).all()
+    assert (timeline["reliability"] == 100).all()
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from recorder import INDEX_DTYPE, PresetWriter, Recording, recording_paths
+
+HEADER = {"board_id": -1, "preset": "aux", "serial": "EM-TEST", "rows": 4, "timestamp_row": 3}
+
+
+def _blocks(n_blocks=6, samples=50, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n_blocks):
+        block = rng.normal(size=(4, samples)).cumsum(axis=1)
+        block[0] = np.arange(i * samples, (i + 1) * samples)                 # package counter
+        block[3] = 1.76e9 + np.arange(i * samples, (i + 1) * samples) / 25  # timestamps
+        out.append(block)
+    return out
+
+
+def _record(path, blocks):
+    # flush_sec=0: every block becomes one chunk
+    with PresetWriter(path, HEADER, flush_sec=0) as w:
+        for b in blocks:
+            w.append(b)
+    return np.concatenate(blocks, axis=1)
+
+
+def test_round_trip_is_exact(tmp_path):
+    path = tmp_path / "dev_aux.ebr"
+    data = _record(path, _blocks())
+    with Recording(path) as rec:
+        assert len(rec) == data.shape[1] and len(rec.index) == 6
+        assert rec.header["serial"] == "EM-TEST"
+        np.testing.assert_array_equal(rec.read(), data)
+        np.testing.assert_array_equal(rec.chunk(2), data[:, 100:150])
+
+
+def test_time_range_read(tmp_path):
+    path = tmp_path / "dev_aux.ebr"
+    data = _record(path, _blocks())
+    start, end = data[3, 70], data[3, 180]
+    with Recording(path) as rec:
+        np.testing.assert_array_equal(rec.read(start, end), data[:, 70:181])
+        assert rec.read(end=data[3, 0] - 1).shape == (4, 0)
+
+
+def test_torn_index_is_recovered_from_the_chunks(tmp_path):
+    path = tmp_path / "dev_aux.ebr"
+    data = _record(path, _blocks())
+    idx = path.with_name(path.name + ".idx")
+    # crash while writing the index: two records lost, a third half written
+    idx.write_bytes(idx.read_bytes()[:int(3.5 * INDEX_DTYPE.itemsize)])
+    with Recording(path) as rec:
+        assert len(rec.index) == 6
+        np.testing.assert_array_equal(rec.index["first"], np.arange(6) * 50)
+        np.testing.assert_array_equal(rec.read(), data)
+
+
+def test_torn_last_chunk_is_dropped(tmp_path):
+    path = tmp_path / "dev_aux.ebr"
+    data = _record(path, _blocks())
+    # crash in the middle of writing the last chunk, before its index record
+    path.write_bytes(path.read_bytes()[:-10])
+    idx = path.with_name(path.name + ".idx")
+    idx.write_bytes(idx.read_bytes()[:5 * INDEX_DTYPE.itemsize])
+    with Recording(path) as rec:
+        np.testing.assert_array_equal(rec.read(), data[:, :250])
+
+
+def test_existing_recordings_are_not_overwritten(tmp_path):
+    paths = recording_paths(tmp_path, "dev", ["aux", "anc"])
+    assert paths == {"aux": tmp_path / "dev_aux.ebr", "anc": tmp_path / "dev_anc.ebr"}
+    _record(paths["aux"], _blocks(1))
+    with pytest.raises(FileExistsError):
+        PresetWriter(paths["aux"], HEADER)
+
+
+def test_wrong_row_count_is_rejected(tmp_path):
+    with PresetWriter(tmp_path / "dev_aux.ebr", HEADER) as w, pytest.raises(ValueError):
+        w.append(np.zeros((3, 10)))
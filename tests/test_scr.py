@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from emotibit.scr import detect_session, run_scr, write_streams
+
+HEADER = "LocalTimestamp,EmotiBitTimestamp,PacketNumber,DataLength,TypeTag,ProtocolVersion,DataReliability"
+
+
+def _write_session(folder, fs=15.0, n=3000):
+    """EA with an SCR-shaped bump every 20 s, without time-sync files."""
+    folder.mkdir()
+    t = np.arange(n) / fs
+    phase = t % 20
+    ea = 0.5 + 0.001 * t + 0.05 * np.where(phase > 5, np.exp(-(phase - 5) / 3) * (1 - np.exp(-(phase - 5) / 0.5)), 0)
+    lines = [f"{HEADER},EA"]
+    lines += [f"{1.76e9 + ti:.6f},{1000 * ti + 5000:.3f},{i // 3},3,EA,1,100,{v:.6f}" for i, (ti, v) in enumerate(zip(t, ea))]
+    (folder / "subjectS_EA.csv").write_text("\n".join(lines) + "\n")
+    return folder
+
+
+def test_sessions_without_time_sync_fall_back_to_raw_timestamps(tmp_path):
+    session = _write_session(tmp_path / "subjectS")
+    with pytest.warns(UserWarning, match="No local clock"):
+        streams = detect_session(session, skip_sec=2)
+    assert streams["SA"]["ts"].size >= 8
+    assert 2 <= streams["SA"]["ts"][0] < 200
+
+    with pytest.warns(UserWarning, match="No local clock for S"):
+        results = run_scr({"S": session}, skip_sec=2)
+    np.testing.assert_allclose(results["SA"]["S"]["signal"], streams["SA"]["signal"])
+
+    with pytest.warns(UserWarning, match="No local clock"):
+        paths = write_streams(session, tmp_path / "out", skip_sec=2)
+    rows = np.loadtxt(paths[0], delimiter=",", skiprows=1, usecols=(0, 1))
+    # LocalTimestamp stays on the host clock, EmotiBitTimestamp on the device's
+    np.testing.assert_allclose(rows[:, 0] - 1.76e9, (rows[:, 1] - 5000) / 1000, atol=1e-3)
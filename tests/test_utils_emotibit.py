@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from utils_emotibit import align_ppg, parse_lm_file, write_ppg_csv
+
+from conftest import ROOT
+
+
+def _channel(tag, ts, values, packets):
+    ts = np.asarray(ts, dtype=float)
+    return {"LslMarkerSourceTimestamp": ts / 1000 + 0.5, "EmotiBitTimestamp": ts,
+            "PacketNumber": np.asarray(packets, dtype=float), tag: np.asarray(values, dtype=float)}
+
+
+def test_align_pairs_samples_in_order_and_keeps_unmatched_rows():
+    pi = _channel("PI", [0, 10, 20, 30, 40], [1, 2, 3, 4, 5], [1, 1, 2, 2, 3])
+    # PG lost its second packet and is 1 ms late
+    pg = _channel("PG", [1, 11, 41], [10, 20, 50], [1, 1, 3])
+    table = align_ppg({"PI": pi, "PG": pg})
+    assert table["PI"].tolist() == [1, 2, 3, 4, 5]
+    np.testing.assert_array_equal(table["PG"], [10, 20, np.nan, np.nan, 50])
+
+    far = _channel("PR", [100], [7], [9])
+    table = align_ppg({"PI": pi, "PR": far})
+    assert table["EmotiBitTimestamp"].tolist() == [0, 10, 20, 30, 40, 100]
+    np.testing.assert_array_equal(table["PI"], [1, 2, 3, 4, 5, np.nan])
+
+
+def test_write_ppg_csv_formats_columns(tmp_path):
+    table = {"LslMarkerSourceTimestamp": np.array([12.5, 3.000001, np.nan]),
+             "EmotiBitTimestamp": np.array([1000.1234, 2.0, 3.0]),
+             "PI": np.array([7.0, np.nan, -2.0])}
+    path = tmp_path / "ppg.csv"
+    write_ppg_csv(table, path)
+    assert path.read_text().splitlines() == [
+        "LslMarkerSourceTimestamp,EmotiBitTimestamp,PI",
+        "12.5,1000.123,7",
+        "3.000001,2.000,",
+        ",3.000,-2",
+    ]
+
+
+@pytest.mark.parametrize("subject", ["subject1", "subject2", "subject3"])
+def test_combined_output_reproduces(tmp_path, subject):
+    import combine_ppg_and_markers
+
+    expected = ROOT / "EmotiBitProcessing" / "output" / f"{subject}_PPG_combined.csv"
+    if not (ROOT / subject).is_dir() or not expected.exists():
+        pytest.skip(f"{subject} not available")
+    combine_ppg_and_markers.process_subject(ROOT / subject, tmp_path)
+    assert (tmp_path / expected.name).read_bytes() == expected.read_bytes()
+
+
+@pytest.mark.parametrize("subject", ["subject1", "subject2", "subject3"])
+@pytest.mark.parametrize("chunk_bytes", [97, 8 * 1024 * 1024])
+def test_parse_lm_file_reproduces_cleaned_markers(tmp_path, subject, chunk_bytes):
+    expected = ROOT / "EmotiBitProcessing" / "output" / f"{subject}_LM_cleaned.csv"
+    lm_path = ROOT / subject / f"{subject}_LM.csv"
+    if not lm_path.exists() or not expected.exists():
+        pytest.skip(f"{subject} not available")
+    # small blocks split rows across block boundaries
+    lm = parse_lm_file(lm_path, chunk_bytes=chunk_bytes)
+    out = tmp_path / expected.name
+    lm[["LslMarkerSourceTimestamp", "EmotiBitTimestamp", "Marker"]].to_csv(out, index=False)
+    assert out.read_bytes() == expected.read_bytes()
+
+
+def test_parse_lm_file_skips_malformed_rows(tmp_path):
+    path = tmp_path / "x_LM.csv"
+    path.write_bytes(
+        b"LslMarkerSourceTimestamp,LslLocalTimestamp,LocalTimestamp,EmotiBitTimestamp,...\n"
+        b"1.5,1.5,1760000000.0,100,1,8,LM,1,100,LR,1.4,LM,1.41,LC,1.45,LD,start\r\n"
+        b"2.5,2.5,1760000001.0,200,2,8\n"                      # short row
+        b"\n"
+        b"3.5,3.5,1760000002.0,300,3,8,LM,1,100, stop \n"      # no LD key
+        b"x,4.5,1760000003.0,400,4,8,LM,1,100,LD,bad\n"        # timestamp is not a number
+        b"5.5,5.5,1760000004.0,500,5,8,LM,1,100,LR,5.4,LD")     # LD without value, no newline
+    lm = parse_lm_file(path)
+    assert lm["LslMarkerSourceTimestamp"].tolist() == [1.5, 3.5, 5.5]
+    assert lm["EmotiBitTimestamp"].tolist() == [100, 300, 500]
+    assert lm["Marker"].tolist() == ["start", "stop", "LD"]
+    np.testing.assert_array_equal(lm["LR"], [1.4, np.nan, 5.4])
+    np.testing.assert_array_equal(lm["LC"], [1.45, np.nan, np.nan])
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import xdf_to_csv
+
+
+def _stream(name, stype, n_channels, n, fmt="float32"):
+    info = {"name": [name], "type": [stype], "source_id": [f"{stype.lower()}_EM-TEST"],
+            "channel_count": [str(n_channels)], "channel_format": [fmt]}
+    if fmt == "string":
+        series = [[f"m{i}"] for i in range(n)]
+    else:
+        series = np.arange(n * n_channels, dtype=np.float32).reshape(n, n_channels)
+    return {"info": info, "time_series": series, "time_stamps": 100 + np.arange(n) / 25}
+
+
+def test_empty_streams_are_written(tmp_path, monkeypatch):
+    xdf = tmp_path / "session.xdf"
+    xdf.write_bytes(b"XDF:")
+    streams = [_stream("PPG_EmotiBit_1", "PPG", 3, 50),
+               _stream("EDA_EmotiBit_1", "EDA", 1, 0),
+               _stream("Markers", "Markers", 1, 0, fmt="string")]
+    monkeypatch.setattr(xdf_to_csv.pyxdf, "load_xdf", lambda path, select_streams=None: (streams, {}))
+
+    summary = xdf_to_csv.convert_file(str(xdf), str(tmp_path / "out"))
+    assert summary["streams"] == 3 and summary["samples"] == 50
+    ppg, eda, markers = (np.load(p) for p in summary["outputs"])
+    assert ppg["data"].shape == (50, 3)
+    assert eda["data"].shape == (0, 1) and eda["timestamps"].shape == (0,)
+    assert list(eda["columns"]) == ["EDA"] and markers["data"].shape == (0,)
+
+
+def test_same_stem_in_one_output_root_is_refused(tmp_path):
+    paths = [str(tmp_path / "a" / "session.xdf"), str(tmp_path / "b" / "session.xdf")]
+    xdf_to_csv.check_collisions(paths)  # next to each input: no collision
+    with pytest.raises(ValueError, match="session.xdf"):
+        xdf_to_csv.check_collisions(paths, str(tmp_path / "out"))